@@ -0,0 +1,45 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+def run_read_view(view, request, *args, **kwargs):
+    """Run a sync view and render its response in a worker thread."""
+    close_old_connections()
+
+    try:
+        response = view(request, *args, **kwargs)
+
+        if hasattr(response, 'render'):
+            response.render()
+
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """
+    Wrap a sync DRF view for serving under ASGI.
+
+    Safe-method requests run in the thread pool concurrently
+    with each other, so a slow request does not hold up other reads.
+    Other methods go through the default thread-sensitive bridge.
+    """
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await sync_to_async(
+                run_read_view, thread_sensitive=False
+            )(view, request, *args, **kwargs)
+
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def async_route(viewset, actions, basename, detail):
+    """Build an async view for the given viewset actions."""
+    return async_read_view(
+        viewset.as_view(actions, basename=basename, detail=detail)
+    )
@@ -0,0 +1,105 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from caching.constants import TOKENS, USERS
+from caching.generations import generations
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+
+
+class LocalTokenCache:
+    """
+    Bounded in-process LRU cache of resolved tokens with a TTL.
+
+    Entries stored with other users and tokens generations are stale.
+    """
+
+    def __init__(self):
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, generation):
+        with self.lock:
+            item = self.items.get(key)
+
+            if item is None:
+                return None
+
+            if item[0] < time.monotonic() or item[1] != generation:
+                del self.items[key]
+                return None
+
+            self.items.move_to_end(key)
+            return item[2]
+
+    def set(self, key, value, generation):
+        with self.lock:
+            self.items[key] = (
+                time.monotonic() + settings.AUTH_TOKEN_LOCAL_CACHE_TIMEOUT,
+                generation,
+                value,
+            )
+            self.items.move_to_end(key)
+
+            while len(self.items) > settings.AUTH_TOKEN_LOCAL_CACHE_SIZE:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+local_token_cache = LocalTokenCache()
+
+
+def get_token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_token(key):
+    """Drop a token from the local and the shared cache."""
+    cache_key = get_token_cache_key(key)
+    local_token_cache.delete(cache_key)
+    caches[settings.AUTH_TOKEN_CACHE].delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with cached token resolution.
+
+    Resolved tokens are kept in an in-process LRU cache
+    in front of the shared cache, so most requests skip the token query.
+    Entries are dropped on logout, token removal and user changes;
+    other workers notice them through the users and tokens generations.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        generation = (generations.get(USERS), generations.get(TOKENS))
+        credentials = local_token_cache.get(cache_key, generation)
+
+        if credentials is None:
+            shared_cache = caches[settings.AUTH_TOKEN_CACHE]
+            cached = shared_cache.get(cache_key)
+
+            if cached is not None and cached[0] == generation:
+                credentials = cached[1]
+            else:
+                credentials = super().authenticate_credentials(key)
+                shared_cache.set(
+                    cache_key,
+                    (generation, credentials),
+                    settings.AUTH_TOKEN_CACHE_TIMEOUT
+                )
+
+            local_token_cache.set(cache_key, credentials, generation)
+
+        user, token = credentials
+        return copy.copy(user), token
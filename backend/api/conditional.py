@@ -0,0 +1,48 @@
+from calendar import timegm
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts, weak=False):
+    """Return a quoted ETag hashed from the string form of the parts."""
+    digest = md5('|'.join(map(str, parts)).encode()).hexdigest()
+    etag = quote_etag(digest)
+
+    return f'W/{etag}' if weak else etag
+
+
+def get_not_modified(request, etag, last_modified=None):
+    """
+    Return a 304 response if the client has the current version.
+
+    last_modified is a datetime; it is only compared when the request
+    has no If-None-Match header.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            timegm(last_modified.utctimetuple()) if last_modified else None
+        ),
+    )
+
+    if response is not None:
+        set_validators(response, etag, last_modified)
+
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add ETag and Last-Modified headers to the response."""
+    response['ETag'] = etag
+
+    if last_modified:
+        response['Last-Modified'] = http_date(
+            timegm(last_modified.utctimetuple())
+        )
+
+    patch_vary_headers(response, ('Authorization',))
+
+    return response
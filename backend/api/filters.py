@@ -1,10 +1,32 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import F, Max, Q
 from django_filters.rest_framework import (
-    CharFilter, FilterSet, NumberFilter, ModelMultipleChoiceFilter
+    CharFilter,
+    ChoiceFilter,
+    FilterSet,
+    NumberFilter,
+    ModelMultipleChoiceFilter,
 )
 
+from caching.cache import catalog_cache
+from caching.constants import CATALOG
+from recipes.constants import TAG_MASK_ENUMERATION_BITS
 from recipes.models import Ingredient, Recipe, Tag
 
 
+def get_tag_mask_bits():
+    """Return the number of tag mask bits taken by tags, cached."""
+    return catalog_cache.get_or_set(
+        'tag_mask_bits',
+        lambda: Tag.objects.aggregate(max_bit=Max('bit'))['max_bit'] + 1,
+        settings.CATALOG_CACHE_TIMEOUT,
+        (CATALOG,),
+    )
+
+
 class IngredientFilter(FilterSet):
     """FilterSet for the Ingredient model, allowing filtering by name."""
 
@@ -28,6 +50,10 @@ class RecipeFilter(FilterSet):
         requires a numerical value (1 for in shopping cart).
     - author: Filters recipes by author's user ID.
     - tags: Filters recipes by tags, allowing multiple values.
+        Matches recipes having any of the given tags
+        using the precomputed Recipe.tags_mask instead of joins.
+    - ordering: 'trending' orders recipes by the time-decayed
+        popularity score, most popular first.
     """
 
     is_favorited = NumberFilter(method='filter_is_favorited')
@@ -35,12 +61,18 @@ class RecipeFilter(FilterSet):
     tags = ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         to_field_name='slug',
-        field_name='tags__slug',
+        method='filter_tags',
+    )
+    ordering = ChoiceFilter(
+        choices=(('trending', 'По популярности'),),
+        method='order_recipes',
     )
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags', 'ordering'
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         current_user = self.request.user
@@ -57,3 +89,29 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=current_user)
 
         return queryset
+
+    def filter_tags(self, queryset, name, value):
+        mask = reduce(or_, (tag.mask for tag in value), 0)
+
+        if not mask:
+            return queryset
+
+        # The cached width may predate the newest tags of this process.
+        mask_bits = max(get_tag_mask_bits(), mask.bit_length())
+        queryset = queryset.alias(matched_tags=F('tags_mask').bitand(mask))
+
+        if mask_bits <= TAG_MASK_ENUMERATION_BITS:
+            # Masks with bits past the width are matched by the range,
+            # which is empty unless the width is out of date.
+            return queryset.filter(
+                Q(tags_mask__in=[
+                    tags_mask for tags_mask in range(1, 1 << mask_bits)
+                    if tags_mask & mask
+                ])
+                | Q(tags_mask__gte=1 << mask_bits, matched_tags__gt=0)
+            )
+
+        return queryset.filter(matched_tags__gt=0)
+
+    def order_recipes(self, queryset, name, value):
+        return queryset.order_by('-trending_score', '-pub_date')
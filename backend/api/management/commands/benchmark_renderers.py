@@ -0,0 +1,81 @@
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeGetSerializer
+from api.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    """
+    Compare the orjson renderer with the DRF JSONRenderer.
+
+    The payload is a recipe list page serialized
+    by RecipeGetSerializer from the current database.
+    """
+
+    help = 'Сравнивает скорость JSON-рендереров на странице рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Число рецептов на странице.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Число повторов рендеринга.'
+        )
+
+    def handle(self, *args, **options):
+        data = self.get_payload(options['limit'])
+        results = {}
+
+        for renderer in (JSONRenderer(), ORJSONRenderer()):
+            output = renderer.render(data)
+            seconds = timeit.timeit(
+                lambda: renderer.render(data), number=options['repeat']
+            )
+            results[type(renderer).__name__] = (output, seconds)
+            self.stdout.write(
+                f'{type(renderer).__name__}: '
+                f'{seconds / options["repeat"] * 1000:.3f} мс, '
+                f'{len(output)} байт'
+            )
+
+        (json_output, json_time), (orjson_output, orjson_time) = (
+            results.values()
+        )
+
+        if json_output != orjson_output:
+            raise CommandError('Результаты рендереров отличаются.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Вывод совпадает, ускорение {json_time / orjson_time:.1f}x'
+        ))
+
+    @staticmethod
+    def get_payload(limit):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        recipes = RecipeViewSet.queryset[:limit]
+
+        if not recipes:
+            raise CommandError('В базе нет рецептов.')
+
+        return {
+            'count': len(recipes),
+            'next': None,
+            'previous': None,
+            'results': RecipeGetSerializer(
+                recipes, many=True, context={'request': request}
+            ).data,
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.loadtools import (
+    HTTPClient, get_free_port, percentile, run_gunicorn
+)
+from recipes.models import Recipe
+
+SERVER_MODES = {
+    'wsgi': ('foodgram.wsgi',),
+    'asgi': (
+        '--worker-class', 'uvicorn.workers.UvicornWorker', 'foodgram.asgi'
+    ),
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare WSGI and ASGI serving modes under concurrent reads.
+
+    Both modes run under gunicorn with the same number of workers
+    against the current database, with throttling disabled.
+    """
+
+    help = 'Сравнивает режимы WSGI и ASGI под конкурентной нагрузкой.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Число одновременных соединений.'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Число запросов в каждом режиме.'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Запрашиваемый путь, можно указать несколько раз.'
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.get_default_paths()
+
+        for mode, arguments in SERVER_MODES.items():
+            port = get_free_port()
+
+            with run_gunicorn(
+                port,
+                ('--workers', str(options['workers']), *arguments),
+                env={'SERVER_MODE': mode, 'THROTTLING_ENABLED': 'False'},
+            ):
+                latencies, errors, elapsed = asyncio.run(self.run_load(
+                    port,
+                    paths,
+                    options['concurrency'],
+                    options['requests'],
+                ))
+
+            self.stdout.write(
+                f'{mode}: {len(latencies) / elapsed:.1f} запр/с, '
+                f'ошибок {errors}, '
+                f'p50 {percentile(latencies, 50) * 1000:.1f} мс, '
+                f'p95 {percentile(latencies, 95) * 1000:.1f} мс, '
+                f'p99 {percentile(latencies, 99) * 1000:.1f} мс'
+            )
+
+    @staticmethod
+    def get_default_paths():
+        recipe = Recipe.objects.first()
+
+        if recipe is None:
+            raise CommandError('В базе нет рецептов.')
+
+        return (
+            '/api/tags/',
+            '/api/ingredients/?name=%D0%B0',
+            '/api/recipes/',
+            f'/api/recipes/{recipe.pk}/',
+        )
+
+    @staticmethod
+    async def run_load(port, paths, concurrency, total):
+        latencies = []
+        errors = 0
+        remaining = iter(range(total))
+
+        async def user():
+            nonlocal errors
+            client = HTTPClient('127.0.0.1', port)
+
+            for number in remaining:
+                started = time.perf_counter()
+
+                try:
+                    status, _, _ = await client.request(
+                        'GET', paths[number % len(paths)]
+                    )
+                except (OSError, asyncio.IncompleteReadError):
+                    status = None
+
+                if status != 200:
+                    errors += 1
+                    continue
+
+                latencies.append(time.perf_counter() - started)
+
+            await client.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - started
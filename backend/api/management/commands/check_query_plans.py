@@ -0,0 +1,260 @@
+import json
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import (
+    FoodgramUserViewSet, IngredientReadOnlyViewSet, RecipeViewSet
+)
+from recipes.ingredient_index import IngredientIndex
+from recipes.models import Tag
+
+DEFAULT_ROWS_THRESHOLD = 1000
+SQLITE_SCAN = re.compile(
+    r'\bSCAN (?:TABLE )?(\w+)\b( USING (?:COVERING )?INDEX)?'
+)
+SQLITE_SORT = 'USE TEMP B-TREE'
+POSTGRESQL_INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+# Nodes reading all of their input, a Limit above them does not stop
+# the scans below.
+POSTGRESQL_BLOCKING_NODES = ('Sort', 'Hash', 'Aggregate')
+
+
+class Command(BaseCommand):
+    """
+    Run EXPLAIN for the hot ORM queries of the API.
+
+    Queries are built through the real viewsets and filtersets
+    against the seeded database. The command fails when a plan contains
+    a sequential scan, a full index scan or a sort over more rows than
+    the threshold. A full index scan under a LIMIT that stops it early,
+    such as a feed page read in index order, is fine.
+    """
+
+    help = 'Проверяет планы выполнения основных запросов API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=DEFAULT_ROWS_THRESHOLD,
+            help='Допустимое число строк для полных сканирований и сортировки.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя для персональных запросов.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(
+                f'СУБД {connection.vendor} не поддерживается.'
+            )
+
+        self.threshold = options['threshold']
+        user = self.get_user(options['user'])
+        failed = 0
+
+        for name, queryset, paginated in self.get_hot_queries(user):
+            issues = self.check_plan(queryset, paginated)
+
+            if issues:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'FAIL {name}'))
+
+                for issue in issues:
+                    self.stdout.write(f'    {issue}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK   {name}'))
+
+        if failed:
+            raise CommandError(f'Проблемных запросов: {failed}.')
+
+    @staticmethod
+    def get_user(email):
+        users = get_user_model().objects.all()
+
+        if email:
+            return users.get(email=email)
+
+        user = users.annotate(
+            cart_size=Count('shopping_cart')
+        ).order_by('-cart_size').first()
+
+        if user is None:
+            raise CommandError('В базе нет пользователей.')
+
+        return user
+
+    @staticmethod
+    def make_request(user, path, params=None):
+        request = Request(APIRequestFactory().get(path, params))
+        request.user = user
+        return request
+
+    def get_recipes(self, user, params=None):
+        view = RecipeViewSet(
+            request=self.make_request(user, '/api/recipes/', params),
+            action='list',
+            format_kwarg=None,
+            kwargs={},
+        )
+        return view.filter_queryset(view.get_queryset())
+
+    def get_ingredients(self, params):
+        view = IngredientReadOnlyViewSet(
+            request=self.make_request(
+                AnonymousUser(), '/api/ingredients/', params
+            ),
+            action='list',
+            format_kwarg=None,
+            kwargs={},
+        )
+        return view.filter_queryset(view.get_queryset())
+
+    def get_hot_queries(self, user):
+        anonymous = AnonymousUser()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        author = get_user_model().objects.annotate(
+            recipes_count=Count('recipes')
+        ).order_by('-recipes_count').first()
+
+        return (
+            ('Лента рецептов (гость)', self.get_recipes(anonymous), True),
+            ('Лента рецептов', self.get_recipes(user), True),
+            (
+                'Лента рецептов по тегам',
+                self.get_recipes(anonymous, {'tags': tags}),
+                True
+            ),
+            (
+                'Популярные рецепты',
+                self.get_recipes(anonymous, {'ordering': 'trending'}),
+                True
+            ),
+            (
+                'Рецепты автора',
+                self.get_recipes(anonymous, {'author': author.pk}),
+                True
+            ),
+            (
+                'Избранное',
+                self.get_recipes(user, {'is_favorited': 1}),
+                True
+            ),
+            (
+                'Рецепты в списке покупок',
+                self.get_recipes(user, {'is_in_shopping_cart': 1}),
+                True
+            ),
+            (
+                'Скачивание списка покупок',
+                RecipeViewSet.get_shopping_cart_ingredients(user),
+                False
+            ),
+            (
+                'Поиск ингредиентов',
+                self.get_ingredients({'name': 'а'}),
+                False
+            ),
+            (
+                'Подписки',
+                FoodgramUserViewSet.get_subscribed_authors(user),
+                True
+            ),
+            (
+                'Синхронизация индекса ингредиентов',
+                IngredientIndex.get_changed_recipes(timezone.now() - timedelta(
+                    seconds=settings.INGREDIENT_INDEX_SYNC_OVERLAP
+                )),
+                False
+            ),
+        )
+
+    def check_plan(self, queryset, paginated):
+        page = queryset
+
+        if paginated:
+            page = queryset[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+
+        if connection.vendor == 'postgresql':
+            return self.check_postgresql_plan(
+                json.loads(page.explain(format='json'))[0]['Plan']
+            )
+
+        return self.check_sqlite_plan(page.explain(), queryset, paginated)
+
+    def check_postgresql_plan(self, plan, limited=False):
+        issues = []
+        node_type = plan['Node Type']
+        full_index_scan = (
+            node_type in POSTGRESQL_INDEX_SCANS
+            and 'Index Cond' not in plan
+            and not limited
+        )
+
+        if (
+            node_type in ('Seq Scan', 'Sort') or full_index_scan
+        ) and plan['Plan Rows'] > self.threshold:
+            issues.append(
+                f'{"Full " if full_index_scan else ""}{node_type} '
+                f'{plan.get("Relation Name", plan.get("Index Name", ""))} '
+                f'(~{plan["Plan Rows"]} строк)'
+            )
+
+        if node_type == 'Limit':
+            limited = True
+        elif node_type in POSTGRESQL_BLOCKING_NODES:
+            limited = False
+
+        for subplan in plan.get('Plans', ()):
+            issues.extend(self.check_postgresql_plan(subplan, limited))
+
+        return issues
+
+    def check_sqlite_plan(self, plan, queryset, paginated):
+        """
+        Check SQLite plan lines.
+
+        SQLite gives no row estimates, so scans are measured
+        by the table size and sorts by the number of matching rows.
+        A SCAN using an index reads the whole index too, unless the page
+        is read in index order without a sort and stops at the limit.
+        """
+        issues = []
+        ordered_page = paginated and SQLITE_SORT not in plan
+
+        with connection.cursor() as cursor:
+            for line in plan.splitlines():
+                match = SQLITE_SCAN.search(line)
+
+                if match and not (match.group(2) and ordered_page):
+                    table = match.group(1)
+                    cursor.execute(
+                        'SELECT COUNT(*) FROM '
+                        f'{connection.ops.quote_name(table)}'
+                    )
+                    rows = cursor.fetchone()[0]
+
+                    if rows > self.threshold:
+                        issues.append(
+                            f'SCAN {table}{match.group(2) or ""} '
+                            f'({rows} строк)'
+                        )
+
+                if SQLITE_SORT in line:
+                    rows = queryset.count()
+
+                    if rows > self.threshold:
+                        issues.append(f'{line.strip()} ({rows} строк)')
+
+        return issues
@@ -0,0 +1,448 @@
+import asyncio
+import base64
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from api.management.loadtools import (
+    HTTPClient, get_free_port, percentile, run_gunicorn
+)
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+PASSWORD = 'loadtest-password'
+EMAIL = 'loadtest{}@example.com'
+PNG = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA'
+    '60e6kgAAAABJRU5ErkJggg=='
+)
+DEFAULT_MIX = {
+    'browse': 50,
+    'autocomplete': 20,
+    'login': 5,
+    'favorite': 10,
+    'cart': 10,
+    'create': 5,
+}
+ANONYMOUS_SCENARIOS = ('browse', 'autocomplete')
+SAMPLE_SIZE = 1000
+FEED_PAGE_SIZE = 6
+FEED_MAX_PAGE = 5
+
+
+class LoadStats:
+    """Latencies and errors of the requests, grouped by action."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_statuses = defaultdict(int)
+
+    def add(self, action, latency, status, expected):
+        if status == expected:
+            self.latencies[action].append(latency)
+        else:
+            self.errors[action] += 1
+            self.error_statuses[action, status] += 1
+
+
+class VirtualUser:
+    """One simulated client with its own connection and account."""
+
+    def __init__(self, port, email, catalog, stats):
+        self.client = HTTPClient('127.0.0.1', port)
+        self.email = email
+        self.catalog = catalog
+        self.stats = stats
+        self.token = None
+
+    async def call(
+        self, action, method, path, data=None, expected=200, auth=True
+    ):
+        headers = {}
+        body = b''
+
+        if data is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(data).encode()
+        if self.token and auth:
+            headers['Authorization'] = f'Token {self.token}'
+
+        started = time.perf_counter()
+        try:
+            status, _, content = await self.client.request(
+                method, path, headers, body
+            )
+        except (OSError, asyncio.IncompleteReadError):
+            status, content = None, b''
+
+        self.stats.add(
+            action, time.perf_counter() - started, status, expected
+        )
+        return content if status == expected else None
+
+    async def login(self):
+        content = await self.call(
+            'login',
+            'POST',
+            '/api/auth/token/login/',
+            {'email': self.email, 'password': PASSWORD},
+            auth=False,
+        )
+        if content:
+            self.token = json.loads(content)['auth_token']
+
+    def get_recipe_id(self):
+        return random.choice(self.catalog['recipes'])
+
+    def get_page_count(self, tags):
+        """Return the number of feed pages of recipes with any of the tags."""
+        mask = sum(self.catalog['tag_masks'][slug] for slug in tags)
+        count = sum(
+            recipes for tags_mask, recipes in self.catalog['mask_counts']
+            if not mask or tags_mask & mask
+        )
+        return max(1, math.ceil(count / FEED_PAGE_SIZE))
+
+    async def browse(self):
+        tags = random.sample(
+            self.catalog['tags'],
+            random.randint(0, min(2, len(self.catalog['tags'])))
+        )
+        query = ''.join(f'&tags={slug}' for slug in tags)
+        page = random.randint(
+            1, min(FEED_MAX_PAGE, self.get_page_count(tags))
+        )
+        await self.call(
+            'feed',
+            'GET',
+            f'/api/recipes/?page={page}&limit={FEED_PAGE_SIZE}{query}',
+            auth=False,
+        )
+        await self.call(
+            'recipe',
+            'GET',
+            f'/api/recipes/{self.get_recipe_id()}/',
+            auth=False,
+        )
+
+    async def autocomplete(self):
+        name = random.choice(self.catalog['ingredient_names'])
+        for length in range(1, min(3, len(name)) + 1):
+            await self.call(
+                'autocomplete',
+                'GET',
+                f'/api/ingredients/?name={quote(name[:length])}',
+                auth=False,
+            )
+
+    async def favorite(self):
+        path = f'/api/recipes/{self.get_recipe_id()}/favorite/'
+        if await self.call('favorite', 'POST', path, expected=201):
+            await self.call('unfavorite', 'DELETE', path, expected=204)
+
+    async def cart(self):
+        paths = [
+            f'/api/recipes/{recipe_id}/shopping_cart/'
+            for recipe_id in set(
+                self.get_recipe_id() for _ in range(random.randint(1, 5))
+            )
+        ]
+        for path in paths:
+            await self.call('cart_add', 'POST', path, expected=201)
+        await self.call(
+            'download_shopping_cart',
+            'GET',
+            '/api/recipes/download_shopping_cart/'
+        )
+        for path in paths:
+            await self.call('cart_remove', 'DELETE', path, expected=204)
+
+    async def create(self):
+        content = await self.call(
+            'create_recipe',
+            'POST',
+            '/api/recipes/',
+            {
+                'name': f'Нагрузочный рецепт {random.randint(1, 10 ** 6)}',
+                'text': 'Создан нагрузочным тестом.',
+                'cooking_time': random.randint(5, 120),
+                'image': f'data:image/png;base64,{PNG}',
+                'tags': random.sample(self.catalog['tag_ids'], 1),
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': random.randint(1, 500)}
+                    for ingredient_id in random.sample(
+                        self.catalog['ingredient_ids'],
+                        min(5, len(self.catalog['ingredient_ids']))
+                    )
+                ],
+            },
+            expected=201,
+        )
+        if content:
+            await self.call(
+                'delete_recipe',
+                'DELETE',
+                f'/api/recipes/{json.loads(content)["id"]}/',
+                expected=204,
+            )
+
+    async def run(self, mix, deadline):
+        await self.login()
+        scenarios = list(mix)
+        weights = list(mix.values())
+
+        while time.monotonic() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            if self.token is None and scenario not in ANONYMOUS_SCENARIOS:
+                scenario = 'login'
+            await getattr(self, scenario)()
+
+        await self.client.close()
+
+
+class Command(BaseCommand):
+    """
+    Run the application under gunicorn and replay a weighted traffic mix.
+
+    Virtual users are asyncio tasks with keep-alive connections,
+    each logged in as its own seeded account. Throttling is disabled
+    for the server. Run it against a development database: test users
+    and recipes are added to it.
+    """
+
+    help = (
+        'Нагрузочный тест: запускает gunicorn и воспроизводит смесь '
+        'запросов, выводит пропускную способность, ошибки и задержки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Число виртуальных пользователей.'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Длительность теста в секундах.'
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--server-mode', choices=('wsgi', 'asgi'), default='wsgi'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=200,
+            help='Досоздать рецепты, если в базе их меньше.'
+        )
+        parser.add_argument(
+            '--mix',
+            help='Веса сценариев, например browse=50,create=5. '
+                 f'Сценарии: {", ".join(DEFAULT_MIX)}.'
+        )
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        emails = self.seed_users(options['users'])
+        self.seed_recipes(options['recipes'], emails)
+        catalog = self.get_catalog()
+        port = get_free_port()
+        stats = LoadStats()
+
+        self.stdout.write(
+            f'Пользователей: {options["users"]}, '
+            f'длительность: {options["duration"]} с.'
+        )
+        with run_gunicorn(
+            port,
+            (
+                '-c', 'python:foodgram.gunicorn',
+                '--workers', str(options['workers']),
+                '--threads', str(options['threads']),
+            ),
+            env={
+                'SERVER_MODE': options['server_mode'],
+                'THROTTLING_ENABLED': 'False',
+                'ALLOWED_HOSTS': ' '.join(
+                    (*settings.ALLOWED_HOSTS, '127.0.0.1')
+                ),
+            },
+        ):
+            elapsed = asyncio.run(self.run_load(
+                port, emails, catalog, stats, mix, options['duration']
+            ))
+
+        self.report(stats, elapsed)
+
+    @staticmethod
+    def parse_mix(value):
+        if not value:
+            return DEFAULT_MIX
+
+        mix = {}
+        for item in value.split(','):
+            name, _, weight = item.partition('=')
+            if name not in DEFAULT_MIX or not weight.isdigit():
+                raise CommandError(f'Неверный вес сценария: {item}.')
+            mix[name] = int(weight)
+
+        if not any(mix.values()):
+            raise CommandError('Хотя бы один сценарий должен иметь вес.')
+
+        return mix
+
+    @staticmethod
+    def seed_users(count):
+        """Create the load test accounts that do not exist yet."""
+        user_model = get_user_model()
+        emails = [EMAIL.format(number) for number in range(count)]
+        existing = set(user_model.objects.filter(
+            email__in=emails
+        ).values_list('email', flat=True))
+        password = make_password(PASSWORD)
+
+        user_model.objects.bulk_create(
+            user_model(
+                email=email,
+                username=email.split('@')[0],
+                first_name='Нагрузка',
+                last_name='Тест',
+                password=password,
+            )
+            for email in emails if email not in existing
+        )
+        return emails
+
+    @staticmethod
+    def seed_recipes(count, emails):
+        """Add recipes until the database has at least count of them."""
+        missing = count - Recipe.objects.count()
+        tags = list(Tag.objects.all())
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+
+        if not tags or not ingredients:
+            raise CommandError(
+                'Нет тегов или ингредиентов, выполните load_foodgram_data.'
+            )
+        if missing <= 0:
+            return
+
+        authors = list(get_user_model().objects.filter(email__in=emails))
+        image = None
+
+        for number in range(missing):
+            recipe = Recipe(
+                name=f'Рецепт для нагрузки {number}',
+                text='Создан нагрузочным тестом.',
+                cooking_time=random.randint(5, 120),
+                author=random.choice(authors),
+            )
+            if image is None:
+                recipe.image.save(
+                    'loadtest.png',
+                    ContentFile(base64.b64decode(PNG)),
+                    save=False
+                )
+                image = recipe.image.name
+            else:
+                recipe.image = image
+            recipe.save()
+            recipe.tags.set(
+                random.sample(tags, random.randint(1, min(3, len(tags))))
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=random.randint(1, 500),
+                )
+                for ingredient_id in random.sample(
+                    ingredients, min(len(ingredients), random.randint(3, 8))
+                )
+            )
+
+    @staticmethod
+    def get_catalog():
+        recipes = Recipe.objects.filter(is_hidden=False)
+        return {
+            'recipes': list(recipes.values_list('id', flat=True)[
+                :SAMPLE_SIZE
+            ]),
+            # Numbers of recipes by tags mask give the feed page counts.
+            'mask_counts': list(recipes.order_by().values_list(
+                'tags_mask'
+            ).annotate(recipes=Count('id'))),
+            'tags': list(Tag.objects.values_list('slug', flat=True)),
+            'tag_masks': {
+                tag.slug: tag.mask for tag in Tag.objects.only('slug', 'bit')
+            },
+            'tag_ids': list(Tag.objects.values_list('id', flat=True)),
+            'ingredient_ids': list(Ingredient.objects.values_list(
+                'id', flat=True
+            )[:SAMPLE_SIZE]),
+            'ingredient_names': list(Ingredient.objects.values_list(
+                'name', flat=True
+            )[:SAMPLE_SIZE]),
+        }
+
+    @staticmethod
+    async def run_load(port, emails, catalog, stats, mix, duration):
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            VirtualUser(port, email, catalog, stats).run(mix, deadline)
+            for email in emails
+        ))
+        return time.monotonic() - started
+
+    def report(self, stats, elapsed):
+        actions = sorted(set(stats.latencies) | set(stats.errors))
+        total_requests = total_errors = 0
+
+        self.stdout.write(
+            f'{"действие":<24}{"запросов":>9}{"запр/с":>9}{"ошибок":>9}'
+            f'{"p50 мс":>9}{"p90 мс":>9}{"p99 мс":>9}'
+        )
+        for action in actions:
+            latencies = stats.latencies[action]
+            errors = stats.errors[action]
+            requests = len(latencies) + errors
+            total_requests += requests
+            total_errors += errors
+            self.stdout.write(
+                f'{action:<24}{requests:>9}{requests / elapsed:>9.1f}'
+                f'{errors / requests:>9.1%}'
+                f'{percentile(latencies, 50) * 1000:>9.1f}'
+                f'{percentile(latencies, 90) * 1000:>9.1f}'
+                f'{percentile(latencies, 99) * 1000:>9.1f}'
+            )
+
+        if not total_requests:
+            raise CommandError('Не выполнено ни одного запроса.')
+
+        for (action, status), count in sorted(
+            stats.error_statuses.items(), key=str
+        ):
+            self.stdout.write(
+                f'{action}: ответ {status or "нет соединения"} - {count}'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего: {total_requests} запросов за {elapsed:.1f} с, '
+            f'{total_requests / elapsed:.1f} запр/с, '
+            f'ошибок {total_errors / total_requests:.1%}.'
+        ))
@@ -0,0 +1,87 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(
+    r'^import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|'
+    r'(?P<indent>\s+)(?P<module>\S+)$'
+)
+
+STARTUP_CODE = '''
+from foodgram.wsgi import application
+from django.urls import get_resolver
+get_resolver().reverse_dict
+'''
+
+WARMUP_CODE = '''
+from foodgram.warmup import warm_up
+warm_up()
+'''
+
+
+class Command(BaseCommand):
+    """Report Django startup cost by module using python -X importtime."""
+
+    help = (
+        'Запускает приложение в отдельном процессе с -X importtime и '
+        'показывает самые долгие импорты по модулям и пакетам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25)
+        parser.add_argument(
+            '--warmup',
+            action='store_true',
+            help='Учитывать и прогрев, выполняемый gunicorn при запуске.'
+        )
+
+    def handle(self, *args, **options):
+        code = STARTUP_CODE + (WARMUP_CODE if options['warmup'] else '')
+        process = subprocess.run(
+            (sys.executable, '-X', 'importtime', '-c', code),
+            capture_output=True,
+            text=True,
+            env=dict(os.environ),
+        )
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+
+        modules = []
+        packages = defaultdict(int)
+        for line in process.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            module = match['module']
+            modules.append((
+                int(match['cumulative']),
+                int(match['self']),
+                len(match['indent']) == 1,
+                module,
+            ))
+            packages[module.split('.')[0]] += int(match['self'])
+
+        total = sum(packages.values())
+        limit = options['limit']
+        self.stdout.write(
+            f'Импорт модулей: {total / 1000:.0f} мс, '
+            f'модулей: {len(modules)}.'
+        )
+
+        self.stdout.write('\nПакеты (собственное время):')
+        for package, spent in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[:limit]:
+            self.stdout.write(
+                f'{spent / 1000:9.1f} мс {spent / total:6.1%}  {package}'
+            )
+
+        self.stdout.write('\nИмпорты верхнего уровня (с зависимостями):')
+        for cumulative, _, _, module in sorted(
+            (item for item in modules if item[2]), reverse=True
+        )[:limit]:
+            self.stdout.write(f'{cumulative / 1000:9.1f} мс  {module}')
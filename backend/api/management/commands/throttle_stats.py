@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.throttling import get_rejected_counts
+
+
+class Command(BaseCommand):
+    """Print the number of throttled requests by scope."""
+
+    help = 'Показывает число отклонённых запросов по областям ограничений.'
+
+    def handle(self, *args, **options):
+        for scope, rejected in get_rejected_counts().items():
+            self.stdout.write(f'{scope}: {rejected}')
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+
+SERVER_START_TIMEOUT = 30
+
+
+class HTTPClient:
+    """
+    Minimal asyncio HTTP/1.1 client for load testing the local server.
+
+    Keeps the connection alive while the server allows it.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        """Send a request and return (status, headers, body)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Content-Length: {len(body)}',
+        ]
+        lines.extend(
+            f'{name}: {value}' for name, value in (headers or {}).items()
+        )
+        self.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+        )
+
+        try:
+            status, response_headers, response_body = (
+                await self.read_response()
+            )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+
+        return status, response_headers, response_body
+
+    async def read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+
+        while True:
+            line = (await self.reader.readuntil(b'\r\n')).decode('latin-1')
+
+            if line == '\r\n':
+                break
+
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            body = b''
+
+            while True:
+                size = int(await self.reader.readuntil(b'\r\n'), 16)
+                chunk = await self.reader.readexactly(size + 2)
+
+                if not size:
+                    return status, headers, body
+
+                body += chunk[:-2]
+
+        if 'content-length' in headers:
+            return status, headers, await self.reader.readexactly(
+                int(headers['content-length'])
+            )
+
+        return status, headers, await self.reader.read()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def percentile(values, percent):
+    """Return the percentile of the values by the nearest-rank method."""
+    if not values:
+        return 0
+
+    ordered = sorted(values)
+    return ordered[
+        max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    ]
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске.')
+
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+
+    raise CommandError('Сервер не запустился.')
+
+
+@contextmanager
+def run_gunicorn(port, arguments, env=None):
+    """Run gunicorn on localhost for the duration of the block."""
+    process = subprocess.Popen(
+        (
+            sys.executable, '-m', 'gunicorn',
+            '--bind', f'127.0.0.1:{port}',
+            *arguments,
+        ),
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        wait_for_port(port, process)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
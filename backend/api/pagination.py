@@ -1,4 +1,163 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.lookups import Exact
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from caching import constants as cache_constants
+from caching.cache import count_cache
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+# Counts over these tables are cached until their generation changes.
+# Counts involving other tables (favourites, cart, subscriptions)
+# are per-user and change too often to cache.
+COUNT_GENERATIONS = {
+    model._meta.db_table: generation
+    for model, generation in (
+        (Recipe, cache_constants.RECIPES),
+        (Recipe.tags.through, cache_constants.RECIPES),
+        (IngredientInRecipe, cache_constants.RECIPES),
+        (Tag, cache_constants.RECIPES),
+        (Ingredient, cache_constants.RECIPES),
+        (get_user_model(), cache_constants.USERS),
+    )
+}
+
+
+def get_query_tables(sql):
+    """Return the tables of the project models referenced in the SQL."""
+    return {
+        model._meta.db_table for model in apps.get_models(
+            include_auto_created=True
+        )
+        if f'"{model._meta.db_table}"' in sql
+    }
+
+
+def counts_table(query):
+    """
+    Return whether the query counts the whole table of its model.
+
+    Leaving out hidden rows counts as the whole table: they are few,
+    as they are purged in the background.
+    """
+    if query.distinct:
+        return False
+    if not query.where:
+        return True
+
+    lookups = query.where.children
+    return (
+        not query.where.negated
+        and len(lookups) == 1
+        and isinstance(lookups[0], Exact)
+        and getattr(lookups[0].lhs, 'target', None) is not None
+        and lookups[0].lhs.target.name == 'is_hidden'
+        and lookups[0].lhs.alias == query.get_initial_alias()
+        and lookups[0].rhs is False
+    )
+
+
+def estimate_count(queryset):
+    """
+    Return the planner estimate of the number of rows or None.
+
+    Queries counting the whole table, see counts_table(), use
+    pg_class.reltuples, other queries the row estimate of EXPLAIN.
+    Only PostgreSQL is supported.
+    """
+    connection = connections[queryset.db]
+
+    if connection.vendor != 'postgresql':
+        return None
+
+    query = queryset.order_by().query
+
+    with connection.cursor() as cursor:
+        if counts_table(query):
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+
+            if row is not None and row[0] >= 0:
+                return int(row[0])
+
+        sql, params = query.get_compiler(queryset.db).as_sql()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CountingPaginator(Paginator):
+    """
+    Paginator with cached and estimated counts.
+
+    Counts of queries over recipe and user tables are cached for
+    PAGINATION_COUNT_CACHE_TIMEOUT seconds per SQL query and dropped
+    when the recipes or users change. With PAGINATION_ESTIMATE_THRESHOLD
+    set, planner estimates at least that large are used instead of
+    COUNT(*), and count_is_exact becomes False.
+    """
+
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        try:
+            sql, params = queryset.order_by().query.get_compiler(
+                queryset.db
+            ).as_sql()
+        except EmptyResultSet:
+            return 0
+
+        tables = get_query_tables(sql)
+
+        if not tables.issubset(COUNT_GENERATIONS):
+            count, self.count_is_exact = self.get_count(queryset)
+            return count
+
+        key = hashlib.sha256(f'{queryset.db}:{sql}:{params}'.encode())
+        count, self.count_is_exact = count_cache.get_or_set(
+            key.hexdigest(),
+            lambda: self.get_count(queryset),
+            settings.PAGINATION_COUNT_CACHE_TIMEOUT,
+            sorted({COUNT_GENERATIONS[table] for table in tables}),
+        )
+        return count
+
+    @staticmethod
+    def get_count(queryset):
+        """Return the count and whether it is exact."""
+        threshold = settings.PAGINATION_ESTIMATE_THRESHOLD
+
+        if threshold:
+            estimate = estimate_count(queryset)
+
+            if estimate is not None and estimate >= threshold:
+                return estimate, False
+
+        return queryset.count(), True
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -7,6 +166,24 @@ class PageLimitPagination(PageNumberPagination):
 
     Allowing clients to specify
     the number of items per page using the 'limit' query parameter.
+    Counts are cached or estimated, see CountingPaginator.
     """
 
     page_size_query_param = 'limit'
+    django_paginator_class = CountingPaginator
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        )))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {
+            'type': 'boolean',
+        }
+        return response_schema
@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import Subscriptions
+
+RECIPE_FIELDS = ('id', 'author_id', 'name', 'image', 'text', 'cooking_time')
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+FLAG_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+OUTPUT_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+)
+
+
+class RecipeProjection:
+    """
+    Build RecipeGetSerializer output directly from .values() rows.
+
+    Related tags, authors and ingredients are fetched
+    with one query each for the whole page,
+    no model or serializer instances are created.
+    Only the given output fields are built and the related
+    data of the other fields is not queried.
+    """
+
+    def __init__(self, request, fields=None):
+        self.request = request
+        self.fields = set(OUTPUT_FIELDS if fields is None else fields)
+        self.image_storage = Recipe._meta.get_field('image').storage
+
+    def get_rows(self, queryset):
+        """Turn the annotated recipe queryset into a values queryset."""
+        return queryset.prefetch_related(None).values(
+            *(
+                field for field in RECIPE_FIELDS
+                if field != 'text' or 'text' in self.fields
+            ),
+            'updated_at',
+            *(
+                field for field in (*FLAG_FIELDS, 'is_subscribed')
+                if field in queryset.query.annotations
+            )
+        )
+
+    def represent(self, rows):
+        recipe_ids = [row['id'] for row in rows]
+        tags = ingredients = authors = {}
+
+        if 'tags' in self.fields:
+            tags = self.get_tags(recipe_ids)
+        if 'ingredients' in self.fields:
+            ingredients = self.get_ingredients(recipe_ids)
+        if 'author' in self.fields:
+            authors = self.get_authors({row['author_id'] for row in rows})
+
+        return [
+            self.prune({
+                'id': row['id'],
+                'tags': tags.get(row['id'], []),
+                'author': authors.get(row['author_id']),
+                'ingredients': ingredients.get(row['id'], []),
+                'is_favorited': bool(row.get('is_favorited', False)),
+                'is_in_shopping_cart': bool(
+                    row.get('is_in_shopping_cart', False)
+                ),
+                'name': row['name'],
+                'image': (
+                    self.image_storage.url(row['image'])
+                    if row['image'] else None
+                ),
+                'text': row.get('text'),
+                'cooking_time': row['cooking_time'],
+            })
+            for row in rows
+        ]
+
+    def prune(self, recipe):
+        if len(self.fields) == len(OUTPUT_FIELDS):
+            return recipe
+
+        return {
+            name: value for name, value in recipe.items()
+            if name in self.fields
+        }
+
+    @staticmethod
+    def get_tags(recipe_ids):
+        tags = defaultdict(list)
+
+        for row in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values(
+            'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+        ).order_by('tag__name'):
+            tags[row['recipe_id']].append({
+                'id': row['tag__id'],
+                'name': row['tag__name'],
+                'color': row['tag__color'],
+                'slug': row['tag__slug'],
+            })
+
+        return tags
+
+    @staticmethod
+    def get_ingredients(recipe_ids):
+        ingredients = defaultdict(list)
+
+        for row in IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values(
+            'recipe_id',
+            'ingredient__id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount',
+        ).order_by('ingredient__name'):
+            ingredients[row['recipe_id']].append({
+                'id': row['ingredient__id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+
+        return ingredients
+
+    def get_authors(self, author_ids):
+        user = self.request.user
+        subscribed = set()
+
+        if user.is_authenticated:
+            subscribed = set(Subscriptions.objects.filter(
+                subscriber=user, author_id__in=author_ids
+            ).values_list('author_id', flat=True))
+
+        return {
+            row['id']: {**row, 'is_subscribed': row['id'] in subscribed}
+            for row in get_user_model().objects.filter(
+                pk__in=author_ids
+            ).values(*USER_FIELDS)
+        }
@@ -0,0 +1,95 @@
+import re
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+# orjson writes floats outside of this range unlike json, e.g. 1e16
+# instead of 1e+16, and NaN and infinity as null instead of failing.
+MIN_EXACT_FLOAT = 1e-4
+MAX_EXACT_FLOAT = 1e16
+# Floats orjson writes with an exponent, as values or as keys, and the
+# start of the ones it writes without it below MIN_EXACT_FLOAT.
+EXPONENT_PATTERN = re.compile(rb'e-?[0-9]+[,}\]"]')
+SMALL_FLOAT_PREFIX = b'0.0000'
+
+
+def has_inexact_floats(data):
+    """Return whether the data holds floats orjson writes unlike json."""
+    stack = [data]
+
+    while stack:
+        value = stack.pop()
+
+        if isinstance(value, dict):
+            stack.extend(value)
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float) and not (
+            value == 0 or MIN_EXACT_FLOAT <= abs(value) < MAX_EXACT_FLOAT
+        ):
+            return True
+
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson.
+
+    Output matches JSONRenderer: non-ASCII characters are kept,
+    dates, decimals and other types go through the DRF encoder.
+    Indented output, data orjson cannot encode and data with floats
+    it writes differently fall back to the standard renderer. Such
+    floats are found in the output. NaN and infinity, written as null,
+    make the output decode to other data; only then the data is
+    searched for them.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        encode = self.encoder_class().default
+
+        def default(value):
+            value = encode(value)
+
+            if has_inexact_floats(value):
+                raise TypeError('Число будет записано иначе, чем в json.')
+
+            return value
+
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        if (
+            SMALL_FLOAT_PREFIX in ret
+            or EXPONENT_PATTERN.search(ret)
+            or b'null' in ret
+            and orjson.loads(ret) != data
+            and has_inexact_floats(data)
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
@@ -1,12 +1,63 @@
 from django.contrib.auth import get_user_model
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.validators import UniqueTogetherValidator
 
 from recipes import constants, models
 from users.models import Subscriptions
 
 
+def get_query_names(request, param):
+    return {
+        name.strip()
+        for name in request.query_params.get(param, '').split(',')
+        if name.strip()
+    }
+
+
+def get_sparse_fields(request, names):
+    """
+    Return the names kept by the ?fields= and ?omit= query parameters.
+
+    Both take comma separated field names, unknown names are ignored.
+    """
+    requested = get_query_names(request, 'fields')
+    omitted = get_query_names(request, 'omit')
+
+    return [
+        name for name in names
+        if (not requested or name in requested) and name not in omitted
+    ]
+
+
+class SparseFieldsetMixin:
+    """
+    Prune fields of read responses with ?fields= and ?omit=.
+
+    Only the top-level serializer of a response is pruned,
+    serializers nested in it keep all their fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        root = self.parent if isinstance(
+            self.parent, serializers.ListSerializer
+        ) else self
+
+        if (
+            request is None
+            or root.parent is not None
+            or request.method not in SAFE_METHODS
+        ):
+            return fields
+
+        return {
+            name: fields[name] for name in get_sparse_fields(request, fields)
+        }
+
+
 class CustomBase64ImageField(Base64ImageField):
     """Custom ImageField for handling base64-encoded images."""
 
@@ -16,7 +67,9 @@ class CustomBase64ImageField(Base64ImageField):
         return None
 
 
-class FoodgramUserSerializer(serializers.ModelSerializer):
+class FoodgramUserSerializer(
+    SparseFieldsetMixin, serializers.ModelSerializer
+):
     """Custom user serializer."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -101,7 +154,7 @@ class IngredientInRecipePostSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for retrieving recipe data."""
 
     tags = TagSerializer(many=True, read_only=True)
@@ -245,7 +298,7 @@ class UserWithRecipesSerializer(FoodgramUserSerializer):
     """Serializer for retrieving user data with their recipes."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta(FoodgramUserSerializer.Meta):
         fields = (
@@ -261,7 +314,7 @@ class UserWithRecipesSerializer(FoodgramUserSerializer):
 
     def get_recipes(self, user):
         """Retrieve user's recipes with an optional limit."""
-        recipes = user.recipes.all()
+        recipes = user.recipes.filter(is_hidden=False)
         recipes_limit = self.context[
             'request'
         ].query_params.get('recipes_limit')
@@ -276,6 +329,9 @@ class UserWithRecipesSerializer(FoodgramUserSerializer):
             recipes, many=True, context=self.context
         ).data
 
+    def get_recipes_count(self, user):
+        return user.recipes.filter(is_hidden=False).count()
+
 
 class SubscriptionsSerializer(serializers.ModelSerializer):
     """Serializer for managing user subscriptions."""
@@ -301,6 +357,8 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Вы не можете подписаться на самого себя.'
             )
+        if data['author'].is_hidden:
+            raise serializers.ValidationError('Пользователь удалён.')
 
         return data
 
@@ -322,6 +380,8 @@ class BaseFavouritesSerializer(serializers.ModelSerializer):
         ).data
 
     def validate(self, data):
+        if data['recipe'].is_hidden:
+            raise serializers.ValidationError('Рецепт удалён.')
         if self.Meta.model.objects.filter(
             recipe=data.get('recipe'),
             user=data.get('user')
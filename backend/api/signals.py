@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token
+from caching.constants import TOKENS
+from caching.generations import bump
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop the cached token on logout and token removal everywhere."""
+    invalidate_token(instance.key)
+    bump(TOKENS)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, update_fields, **kwargs):
+    """Drop cached tokens when the user changes, e.g. is deactivated."""
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
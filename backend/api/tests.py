@@ -0,0 +1,714 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from api.pagination import counts_table
+from api.renderers import ORJSONRenderer
+from api.throttling import ActionCostThrottle, get_rejected_counts
+from caching.cache import registry
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    Favourites,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    RecipeActivity,
+    ShoppingCart,
+    SimilarRecipe,
+    Tag,
+)
+from recipes.similarity import build_similar_recipes
+from tasks.queue import claim_tasks, run_task
+from users.models import Subscriptions
+
+User = get_user_model()
+
+
+def clear_caches():
+    caches['shared'].clear()
+    caches['throttle'].clear()
+    for cache in registry.values():
+        cache.local.items.clear()
+
+
+class RecipeProjectionParityTest(TestCase):
+    """The projection fast path renders the same bytes as the serializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.other_author, cls.reader = (
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name=username.title(),
+                last_name='Тестов',
+                password='password-123',
+            )
+            for username in ('author', 'other', 'reader')
+        )
+        # Names are not in ID order, so the order of tags
+        # and ingredients in the output is checked as well.
+        tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Ужин', '#0000FF', 'dinner'),
+                ('Завтрак', '#FFFF00', 'breakfast'),
+                ('Обед', '#00FF00', 'lunch'),
+            )
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('яйца', 'шт.'),
+                ('молоко', 'мл'),
+                ('соль', 'г'),
+                ('масло', 'г'),
+            )
+        ]
+        cls.recipes = []
+
+        for number, (author, tag_numbers, ingredient_numbers) in enumerate((
+            (cls.author, (0, 1, 2), (0, 1, 2, 3)),
+            (cls.author, (1,), (3, 0)),
+            (cls.other_author, (2, 0), (2,)),
+            (cls.other_author, (), (1, 3)),
+        )):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}',
+                text=f'Описание рецепта {number}.',
+                cooking_time=number + 5,
+                image=f'recipes/images/{number}.png',
+                author=author,
+            )
+            recipe.tags.set([tags[index] for index in tag_numbers])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient=ingredients[index],
+                    amount=(index + 1) * 10,
+                )
+                for index in ingredient_numbers
+            )
+            cls.recipes.append(recipe)
+
+        Favourites.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        Favourites.objects.create(user=cls.reader, recipe=cls.recipes[2])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[2])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[3])
+        Subscriptions.objects.create(
+            author=cls.other_author, subscriber=cls.reader
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def get_content(self, client, url, fast_path):
+        clear_caches()
+
+        with override_settings(RECIPE_PROJECTION_FAST_PATH=fast_path):
+            response = client.get(url)
+
+        self.assertEqual(response.status_code, 200, url)
+        return response.content
+
+    def assertParity(self, url, clients=None):
+        for name, client in clients or (
+            ('anonymous', self.anonymous),
+            ('authenticated', self.authenticated),
+        ):
+            with self.subTest(url=url, client=name):
+                self.assertEqual(
+                    self.get_content(client, url, fast_path=True),
+                    self.get_content(client, url, fast_path=False),
+                )
+
+    def test_list(self):
+        self.assertParity('/api/recipes/?limit=10')
+
+    def test_list_pages(self):
+        self.assertParity('/api/recipes/?limit=3&page=2')
+
+    def test_list_filtered_by_tags(self):
+        self.assertParity('/api/recipes/?tags=lunch&tags=breakfast')
+
+    def test_list_filtered_by_flags(self):
+        clients = (('authenticated', self.authenticated),)
+        self.assertParity('/api/recipes/?is_favorited=1', clients)
+        self.assertParity('/api/recipes/?is_in_shopping_cart=1', clients)
+
+    @override_settings(USER_RECIPE_SET_MAX_SIZE=0)
+    def test_list_with_flag_subqueries(self):
+        self.assertParity(
+            '/api/recipes/?limit=10',
+            (('authenticated', self.authenticated),),
+        )
+
+    def test_detail(self):
+        for recipe in self.recipes:
+            self.assertParity(f'/api/recipes/{recipe.pk}/')
+
+    def test_batch(self):
+        ids = ','.join(str(recipe.pk) for recipe in reversed(self.recipes))
+        self.assertParity(f'/api/recipes/?ids={ids},999999')
+
+    def test_sparse_fields(self):
+        self.assertParity('/api/recipes/?fields=id,name,is_favorited')
+        self.assertParity('/api/recipes/?omit=text,author')
+
+    def test_flags_are_covered(self):
+        results = {
+            recipe['id']: recipe
+            for recipe in self.authenticated.get(
+                '/api/recipes/?limit=10'
+            ).json()['results']
+        }
+
+        self.assertEqual(
+            {pk for pk, recipe in results.items() if recipe['is_favorited']},
+            {self.recipes[0].pk, self.recipes[2].pk},
+        )
+        self.assertEqual(
+            {
+                pk for pk, recipe in results.items()
+                if recipe['is_in_shopping_cart']
+            },
+            {self.recipes[2].pk, self.recipes[3].pk},
+        )
+        self.assertTrue(
+            results[self.recipes[2].pk]['author']['is_subscribed']
+        )
+        self.assertEqual(len(results[self.recipes[0].pk]['tags']), 3)
+        self.assertEqual(len(results[self.recipes[0].pk]['ingredients']), 4)
+
+
+class TagFilterTest(TestCase):
+    """Filtering by tags sees the tag mask bits of new tags."""
+
+    def setUp(self):
+        clear_caches()
+        self.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Тестов',
+            password='password-123',
+        )
+
+    def create_recipe(self, name, tags):
+        recipe = Recipe.objects.create(
+            name=name,
+            text='Описание.',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+            author=self.author,
+        )
+        recipe.tags.set(tags)
+        return recipe
+
+    def get_names(self, query):
+        return sorted(
+            recipe['name'] for recipe in
+            self.client.get(f'/api/recipes/?{query}').json()['results']
+        )
+
+    def test_new_tag_bit(self):
+        breakfast = Tag.objects.create(
+            name='Завтрак', color='#FFFF00', slug='breakfast'
+        )
+        self.create_recipe('Омлет', [breakfast])
+        self.assertEqual(self.get_names('tags=breakfast'), ['Омлет'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lunch = Tag.objects.create(
+                name='Обед', color='#00FF00', slug='lunch'
+            )
+        self.create_recipe('Суп', [breakfast, lunch])
+
+        self.assertEqual(self.get_names('tags=breakfast'), ['Омлет', 'Суп'])
+        self.assertEqual(self.get_names('tags=lunch'), ['Суп'])
+
+    def test_stale_tag_mask_bits(self):
+        breakfast, lunch = (
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#FFFF00', 'breakfast'),
+                ('Обед', '#00FF00', 'lunch'),
+            )
+        )
+        self.create_recipe('Омлет', [breakfast])
+        self.create_recipe('Суп', [breakfast, lunch])
+
+        # A process that has not seen the new tag yet.
+        with mock.patch('api.filters.get_tag_mask_bits', return_value=1):
+            self.assertEqual(
+                self.get_names('tags=breakfast'), ['Омлет', 'Суп']
+            )
+            self.assertEqual(self.get_names('tags=lunch'), ['Суп'])
+
+
+class RendererParityTest(SimpleTestCase):
+    """ORJSONRenderer output matches JSONRenderer."""
+
+    def test_output_matches(self):
+        for data in (
+            {'count': 1, 'next': None, 'results': [{'name': 'Суп'}]},
+            [0.0, -0.0, 0.1, 1e-4, 123.456, 1e15, 9999999999999998.0],
+            [1e16, -1e16, 1.5e300, 1e-5, 0.00001, 5e-5, 1.5e-7, 5e-324],
+            {'score': 1e16, 'nested': [{'value': 1e-5}]},
+            {1e16: 'ключ', 1: 'один'},
+            {'text': 'e5, 0.00001 и null', 'separator': '\u2028'},
+            {'price': Decimal('1.5'), 'large': Decimal('1e20')},
+            {'day': date(2024, 1, 2), 'time': datetime(2024, 1, 2, 3, 4, 5)},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(
+                    ORJSONRenderer().render(data), JSONRenderer().render(data)
+                )
+
+    def test_out_of_range_floats_fail(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            for data in (
+                {'value': value}, [None, value], {'value': Decimal(value)}
+            ):
+                with self.subTest(data=data):
+                    for renderer in (JSONRenderer(), ORJSONRenderer()):
+                        with self.assertRaises(ValueError):
+                            renderer.render(data)
+
+
+class CountsTableTest(SimpleTestCase):
+    """Counts of visible recipes and users use the table estimate."""
+
+    def test_counts_table(self):
+        for queryset, expected in (
+            (Recipe.objects.all(), True),
+            (Recipe.objects.filter(is_hidden=False), True),
+            (User.objects.filter(is_hidden=False), True),
+            (Recipe.objects.filter(is_hidden=True), False),
+            (Recipe.objects.exclude(is_hidden=False), False),
+            (Recipe.objects.filter(is_hidden=False, cooking_time=5), False),
+            (Recipe.objects.filter(author__is_hidden=False), False),
+            (Recipe.objects.filter(is_hidden=False).distinct(), False),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                self.assertIs(
+                    counts_table(queryset.order_by().query), expected
+                )
+
+
+class WhatCanICookTest(TestCase):
+    """Recipes hidden after the index was synced are not counted."""
+
+    def setUp(self):
+        clear_caches()
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Тестов',
+            password='password-123',
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='яйца', measurement_unit='шт'
+        )
+        self.recipes = []
+
+        for name in ('Омлет', 'Глазунья', 'Яйцо всмятку'):
+            recipe = Recipe.objects.create(
+                name=name,
+                text='Описание.',
+                cooking_time=5,
+                image='recipes/images/recipe.png',
+                author=author,
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=2
+            )
+            self.recipes.append(recipe)
+
+        Recipe.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        ingredient_index.build()
+        self.addCleanup(setattr, ingredient_index, 'postings', None)
+
+    def test_hidden_recipes_are_not_counted(self):
+        # Hidden without a change of updated_at, so the index keeps it.
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(is_hidden=True)
+        url = (
+            '/api/recipes/what_can_i_cook/'
+            f'?ingredients={self.ingredient.pk}&limit=1'
+        )
+
+        pages = [self.client.get(url).data]
+        pages.append(self.client.get(pages[0]['next']).data)
+
+        self.assertEqual([page['count'] for page in pages], [2, 2])
+        self.assertIsNone(pages[1]['next'])
+        self.assertCountEqual(
+            [page['results'][0]['id'] for page in pages],
+            [recipe.pk for recipe in self.recipes[1:]],
+        )
+
+
+class ConditionalGetTest(TestCase):
+    """Recipe responses carry validators and 304 the current version."""
+
+    def setUp(self):
+        clear_caches()
+        self.author, self.reader = (
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name=username.title(),
+                last_name='Тестов',
+                password='password-123',
+            )
+            for username in ('author', 'reader')
+        )
+        self.recipe = Recipe.objects.create(
+            name='Омлет',
+            text='Описание.',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+            author=self.author,
+        )
+        self.recipe.tags.add(
+            Tag.objects.create(name='Завтрак', color='#FFFF00', slug='b')
+        )
+        IngredientInRecipe.objects.create(
+            recipe=self.recipe,
+            ingredient=Ingredient.objects.create(
+                name='яйца', measurement_unit='шт.'
+            ),
+            amount=2,
+        )
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.reader)
+
+    def get(self, client, url, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.get(url, **headers)
+
+    def assertNotModified(self, client, url, **headers):
+        response = self.get(client, url, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def test_detail(self):
+        for fast_path in (False, True):
+            with self.subTest(fast_path=fast_path), override_settings(
+                RECIPE_PROJECTION_FAST_PATH=fast_path
+            ):
+                response = self.get(self.anonymous, self.url)
+                etag = response['ETag']
+
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('Authorization', response['Vary'])
+
+                with self.assertNumQueries(1):
+                    not_modified = self.assertNotModified(
+                        self.anonymous, self.url, HTTP_IF_NONE_MATCH=etag
+                    )
+
+                self.assertEqual(not_modified['ETag'], etag)
+                self.assertNotModified(
+                    self.anonymous, self.url,
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                )
+                self.assertEqual(self.get(
+                    self.anonymous, self.url, HTTP_IF_NONE_MATCH='"other"'
+                ).status_code, 200)
+
+    def test_detail_reads_recipe_once(self):
+        for fast_path in (False, True):
+            with self.subTest(fast_path=fast_path), override_settings(
+                RECIPE_PROJECTION_FAST_PATH=fast_path
+            ), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(
+                    self.get(self.anonymous, self.url).status_code, 200
+                )
+
+            recipe_queries = [
+                query['sql'] for query in queries.captured_queries
+                if 'FROM "recipes_recipe"' in query['sql']
+            ]
+            self.assertEqual(len(recipe_queries), 1, recipe_queries)
+
+    def test_detail_changes(self):
+        etag = self.get(self.anonymous, self.url)['ETag']
+        self.recipe.save()
+
+        self.assertNotEqual(self.get(
+            self.anonymous, self.url, HTTP_IF_NONE_MATCH=etag
+        ).status_code, 304)
+        self.assertNotEqual(
+            self.get(self.anonymous, f'{self.url}?fields=id')['ETag'], etag
+        )
+
+    def test_detail_follows_user_flags(self):
+        response = self.get(self.authenticated, self.url)
+        etag = response['ETag']
+
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotModified(
+            self.authenticated, self.url, HTTP_IF_NONE_MATCH=etag
+        )
+
+        for url in (
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            f'/api/users/{self.author.pk}/subscribe/',
+        ):
+            with self.subTest(url=url), self.captureOnCommitCallbacks(
+                execute=True
+            ):
+                self.authenticated.post(url)
+
+            response = self.get(
+                self.authenticated, self.url, HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+        self.assertNotEqual(self.get(self.anonymous, self.url)['ETag'], etag)
+
+    def test_detail_not_found(self):
+        self.recipe.is_hidden = True
+        self.recipe.save()
+
+        self.assertEqual(self.get(self.anonymous, self.url).status_code, 404)
+
+    def test_list(self):
+        for name, client in (
+            ('anonymous', self.anonymous),
+            ('authenticated', self.authenticated),
+        ):
+            with self.subTest(client=name):
+                response = self.get(client, '/api/recipes/')
+                etag = response['ETag']
+
+                self.assertTrue(etag.startswith('W/'))
+                self.assertNotModified(
+                    client, '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+                )
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.recipe.save()
+
+                self.assertEqual(self.get(
+                    client, '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+                ).status_code, 200)
+
+
+@mock.patch.object(ActionCostThrottle, 'THROTTLE_RATES', {
+    'anon': '3/min', 'user': '3/min', 'expensive': '3/min',
+})
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.ActionCostThrottle'],
+    'NUM_PROXIES': 1,
+}, CACHE_GENERATION_CHECK_INTERVAL=3600)
+class ThrottlingTest(TestCase):
+    """Anonymous clients behind the proxy are throttled separately."""
+
+    def setUp(self):
+        clear_caches()
+
+    def get_codes(self, address, count):
+        return [
+            self.client.get(
+                '/api/tags/',
+                HTTP_X_FORWARDED_FOR=f'203.0.113.1, {address}',
+            ).status_code
+            for _ in range(count)
+        ]
+
+    def test_client_address_from_proxy(self):
+        self.assertEqual(api_settings.NUM_PROXIES, 1)
+        self.assertEqual(
+            self.get_codes('198.51.100.1', 5), [200, 200, 200, 429, 429]
+        )
+        self.assertEqual(self.get_codes('198.51.100.2', 1), [200])
+        self.assertEqual(get_rejected_counts()['anon'], 2)
+
+    def test_counters_are_not_in_database(self):
+        self.get_codes('198.51.100.1', 1)
+
+        with self.assertNumQueries(0):
+            self.get_codes('198.51.100.1', 3)
+
+
+class PurgeTest(TestCase):
+    """Deleted recipes and users are hidden at once and purged later."""
+
+    def setUp(self):
+        clear_caches()
+        self.author, self.reader = (
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name=username.title(),
+                last_name='Тестов',
+                password='password-123',
+            )
+            for username in ('author', 'reader')
+        )
+        self.reader_recipe = self.create_recipe(self.reader, 'Суп')
+        self.clients = {}
+
+        for user in (self.author, self.reader):
+            self.clients[user.pk] = APIClient()
+            self.clients[user.pk].force_authenticate(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = self.create_recipe(self.author, 'Омлет')
+            self.clients[self.reader.pk].post(
+                f'/api/recipes/{self.recipe.pk}/favorite/'
+            )
+            self.clients[self.author.pk].post(
+                f'/api/recipes/{self.reader_recipe.pk}/favorite/'
+            )
+            self.clients[self.author.pk].post(
+                f'/api/recipes/{self.reader_recipe.pk}/shopping_cart/'
+            )
+
+    def create_recipe(self, author, name):
+        recipe = Recipe.objects.create(
+            name=name,
+            text='Описание.',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+            author=author,
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.get_or_create(
+                name='соль', measurement_unit='г'
+            )[0],
+            amount=1,
+        )
+        return recipe
+
+    def run_tasks(self):
+        for task in claim_tasks('test', 100):
+            self.assertEqual(run_task(task), task.DONE, task.last_error)
+
+    def delete(self, client, url, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(url, data, format='json')
+
+        self.assertEqual(response.status_code, 204)
+
+    def test_recipe_is_hidden_then_purged(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.delete(self.clients[self.author.pk], url)
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+        self.run_tasks()
+
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+        for model in (
+            Favourites, IngredientInRecipe, RecipeActivity, ShoppingCart
+        ):
+            self.assertFalse(
+                model.objects.filter(recipe_id=self.recipe.pk).exists(),
+                model.__name__,
+            )
+
+    def test_recipe_leaves_similar_recipes(self):
+        build_similar_recipes()
+        url = f'/api/recipes/{self.reader_recipe.pk}/similar/'
+
+        self.assertEqual(
+            [recipe['id'] for recipe in self.client.get(url).data],
+            [self.recipe.pk],
+        )
+
+        self.delete(
+            self.clients[self.author.pk], f'/api/recipes/{self.recipe.pk}/'
+        )
+        task = claim_tasks('test', 1)[0]
+
+        self.assertEqual(task.name, 'recipes.tasks.update_similar_recipes')
+        self.assertEqual(run_task(task), task.DONE, task.last_error)
+        self.assertFalse(SimilarRecipe.objects.filter(
+            similar_id=self.recipe.pk
+        ).exists())
+        self.assertEqual(self.client.get(url).data, [])
+        self.assertEqual(
+            self.client.get(
+                f'/api/recipes/{self.recipe.pk}/similar/'
+            ).status_code,
+            404,
+        )
+        self.assertEqual(
+            self.client.get('/api/recipes/999999/similar/').status_code, 404
+        )
+
+    def test_user_is_hidden_then_purged(self):
+        url = f'/api/users/{self.author.pk}/'
+        self.delete(
+            self.clients[self.author.pk],
+            '/api/users/me/',
+            current_password='password-123',
+        )
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{self.recipe.pk}/').status_code,
+            404,
+        )
+
+        self.run_tasks()
+
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipe.objects.filter(author=self.author).exists())
+        self.assertFalse(Favourites.objects.filter(user=self.author).exists())
+        self.assertFalse(
+            ShoppingCart.objects.filter(user=self.author).exists()
+        )
+        self.assertFalse(Token.objects.filter(user=self.author).exists())
+
+    def test_user_purge_removes_activity_of_other_recipes(self):
+        activity = RecipeActivity.objects.get(recipe=self.reader_recipe)
+        self.assertEqual(
+            (activity.favourites, activity.shopping_cart), (1, 1)
+        )
+        self.reader_recipe.refresh_from_db()
+        self.assertGreater(self.reader_recipe.trending_score, 0)
+
+        self.delete(
+            self.clients[self.author.pk],
+            '/api/users/me/',
+            current_password='password-123',
+        )
+        self.run_tasks()
+
+        activity.refresh_from_db()
+        self.assertEqual(
+            (activity.favourites, activity.shopping_cart), (0, 0)
+        )
+        self.reader_recipe.refresh_from_db()
+        self.assertAlmostEqual(self.reader_recipe.trending_score, 0)
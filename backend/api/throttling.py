@@ -0,0 +1,136 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+REJECTED_COUNTER_KEY = 'throttle:rejected:%s'
+
+
+def incr(key, amount, timeout):
+    """Add the amount to the counter in the throttle cache."""
+    cache = caches[settings.THROTTLE_CACHE]
+    cache.add(key, 0, timeout)
+
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # The counter was evicted between add() and incr().
+        cache.set(key, amount, timeout)
+
+
+class ActionCostThrottle(SimpleRateThrottle):
+    """
+    Sliding-window throttle with per-action scopes and costs.
+
+    The scope comes from the view's throttle_scopes by action,
+    otherwise it is 'user' or 'anon'. Each request spends
+    THROTTLE_ACTION_COSTS['<basename>.<action>'] (1 by default)
+    of the scope rate. Counters of the current and the previous window
+    live in the THROTTLE_CACHE, shared by all workers and incremented
+    atomically by memcached in production, so requests do not write
+    to the database. The previous window is weighted by its overlap
+    with the last period, which approximates a sliding window.
+    Anonymous clients are told apart by the address nginx adds
+    to X-Forwarded-For, see NUM_PROXIES.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s:%(window)s'
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    @staticmethod
+    def get_scope(request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None)
+        )
+
+        if scope:
+            return scope
+
+        return 'user' if request.user.is_authenticated else 'anon'
+
+    @staticmethod
+    def get_cost(view):
+        return settings.THROTTLE_ACTION_COSTS.get(
+            f'{getattr(view, "basename", None)}.'
+            f'{getattr(view, "action", None)}',
+            1
+        )
+
+    def get_cache_key(self, request, view, window):
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident,
+            'window': window,
+        }
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        limit, duration = self.parse_rate(self.THROTTLE_RATES.get(self.scope))
+
+        if limit is None:
+            return True
+
+        cost = self.get_cost(view)
+        window, elapsed = divmod(time.time(), duration)
+        current_key = self.get_cache_key(request, view, int(window))
+        previous_key = self.get_cache_key(request, view, int(window) - 1)
+        counts = caches[settings.THROTTLE_CACHE].get_many(
+            (current_key, previous_key)
+        )
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+
+        if previous * (duration - elapsed) / duration + current + cost > limit:
+            self.wait_seconds = self.get_wait(
+                limit, duration, elapsed, current, previous, cost
+            )
+            self.throttle_failure()
+            return False
+
+        incr(current_key, cost, 2 * duration)
+        return True
+
+    @staticmethod
+    def get_wait(limit, duration, elapsed, current, previous, cost):
+        """Return seconds until the request would fit into the limit."""
+        if cost > limit:
+            return duration - elapsed
+
+        if current + cost <= limit:
+            return (
+                duration * (1 - (limit - current - cost) / previous)
+                - elapsed
+            )
+
+        return (duration - elapsed) + duration * (1 - (limit - cost) / current)
+
+    def throttle_failure(self):
+        incr(REJECTED_COUNTER_KEY % self.scope, 1, None)
+        logger.warning('Request throttled in scope %s.', self.scope)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def get_rejected_counts():
+    """Return the number of rejected requests by throttle scope."""
+    scopes = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+    values = caches[settings.THROTTLE_CACHE].get_many([
+        REJECTED_COUNTER_KEY % scope for scope in scopes
+    ])
+
+    return {
+        scope: values.get(REJECTED_COUNTER_KEY % scope, 0)
+        for scope in scopes
+    }
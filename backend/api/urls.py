@@ -1,7 +1,9 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
 from api import views
+from api.async_views import async_route
 
 namespace = 'api'
 
@@ -32,6 +34,69 @@ urlpatterns_v1 = [
     path('auth/', include('djoser.urls.authtoken')),
 ]
 
+if settings.SERVER_MODE == 'asgi':
+    urlpatterns_v1 = [
+        path(
+            'tags/',
+            async_route(
+                views.TagReadOnlyViewSet, {'get': 'list'}, 'tags', False
+            ),
+            name='tags-list'
+        ),
+        re_path(
+            r'^tags/(?P<pk>\d+)/$',
+            async_route(
+                views.TagReadOnlyViewSet, {'get': 'retrieve'}, 'tags', True
+            ),
+            name='tags-detail'
+        ),
+        path(
+            'ingredients/',
+            async_route(
+                views.IngredientReadOnlyViewSet,
+                {'get': 'list'},
+                'ingredients',
+                False
+            ),
+            name='ingredients-list'
+        ),
+        re_path(
+            r'^ingredients/(?P<pk>\d+)/$',
+            async_route(
+                views.IngredientReadOnlyViewSet,
+                {'get': 'retrieve'},
+                'ingredients',
+                True
+            ),
+            name='ingredients-detail'
+        ),
+        path(
+            'recipes/',
+            async_route(
+                views.RecipeViewSet,
+                {'get': 'list', 'post': 'create'},
+                'recipes',
+                False
+            ),
+            name='recipes-list'
+        ),
+        re_path(
+            r'^recipes/(?P<pk>\d+)/$',
+            async_route(
+                views.RecipeViewSet,
+                {
+                    'get': 'retrieve',
+                    'put': 'update',
+                    'patch': 'partial_update',
+                    'delete': 'destroy',
+                },
+                'recipes',
+                True
+            ),
+            name='recipes-detail'
+        ),
+    ] + urlpatterns_v1
+
 urlpatterns = [
     path('', include(urlpatterns_v1)),
 ]
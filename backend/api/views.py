@@ -1,25 +1,90 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, F, Sum, Value, IntegerField, OuterRef
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Sum,
+    Value,
+    prefetch_related_objects,
+)
 from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from api import serializers
+from api.conditional import get_not_modified, make_etag, set_validators
 from api.filters import IngredientFilter, RecipeFilter
+from api.projections import RecipeProjection
 from api.shopping_cart_renderer import render_shopping_cart_as_txt
 from api.permissions import IsAuthorOrReadOnly
+from caching import constants as cache_constants
+from caching.cache import catalog_cache, feed_cache
+from caching.recipe_sets import get_recipe_ids
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (
     Ingredient, IngredientInRecipe, Recipe, Tag, Favourites, ShoppingCart
 )
+from recipes.tasks import (
+    purge_recipes, purge_users, update_similar_recipes
+)
 from users.models import Subscriptions
 
+VERSION_FIELDS = ('id', 'updated_at', 'is_favorited', 'is_in_shopping_cart')
+
+
+def parse_ids(value):
+    """Parse a comma separated list of positive IDs, None if malformed."""
+    try:
+        ids = [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError:
+        return None
+
+    if not ids or min(ids) < 1:
+        return None
+
+    return ids
+
+
+def get_response_cache_key(request):
+    """Return the cache key of a response that is the same for everyone."""
+    return (
+        f'{request.build_absolute_uri()}:{request.accepted_renderer.format}'
+    )
+
+
+class CachedListMixin:
+    """Serve the list from the cache until a tag or ingredient changes."""
 
-class TagReadOnlyViewSet(ReadOnlyModelViewSet):
+    def list(self, request, *args, **kwargs):
+        data = catalog_cache.get_or_set(
+            get_response_cache_key(request),
+            lambda: self.get_list_data(request, *args, **kwargs),
+            settings.CATALOG_CACHE_TIMEOUT,
+            (cache_constants.CATALOG,),
+        )
+        return Response(data)
+
+    def get_list_data(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs).data
+
+
+class TagReadOnlyViewSet(CachedListMixin, ReadOnlyModelViewSet):
     """ViewSet providing read-only access to Tag objects."""
 
     queryset = Tag.objects.all()
@@ -27,7 +92,7 @@ class TagReadOnlyViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientReadOnlyViewSet(ReadOnlyModelViewSet):
+class IngredientReadOnlyViewSet(CachedListMixin, ReadOnlyModelViewSet):
     """ViewSet providing read-only access to Ingredient objects."""
 
     queryset = Ingredient.objects.all()
@@ -44,32 +109,92 @@ class RecipeViewSet(ModelViewSet):
     Additing actions for favoriting and adding/removing from the shopping cart.
     """
 
-    queryset = Recipe.objects.all(
-    ).select_related('author').prefetch_related(
-        'tags', 'ingredients'
-    )
+    queryset = Recipe.objects.filter(is_hidden=False)
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'expensive',
+        'download_shopping_cart': 'expensive',
+    }
+
+    def get_recipe_fields(self):
+        """Return the RecipeGetSerializer fields the response will contain."""
+        fields = serializers.RecipeGetSerializer.Meta.fields
+
+        if self.action in ('list', 'retrieve'):
+            return serializers.get_sparse_fields(self.request, fields)
+        if self.action == 'similar':
+            # Only the recipe is looked up, its fields are not rendered.
+            return ()
+
+        return fields
 
     def get_queryset(self):
-        if self.request.user.is_authenticated:
-            return super().get_queryset().annotate(
-                is_favorited=Exists(
-                    Favourites.objects.filter(
-                        recipe=OuterRef('pk'),
-                        user=self.request.user
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        recipe=OuterRef('pk'),
-                        user=self.request.user
-                    )
-                )
+        """
+        Build the recipe queryset for the fields of the response.
+
+        Relations, columns and per-user flags left out with
+        ?fields= or ?omit= are not loaded.
+        """
+        fields = self.get_recipe_fields()
+        queryset = super().get_queryset()
+
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+
+        queryset = queryset.prefetch_related(*self.get_prefetch_lookups())
+
+        if 'text' not in fields:
+            queryset = queryset.defer('text')
+
+        user = self.request.user
+
+        if user.is_authenticated:
+            flags = {
+                'is_favorited': Favourites,
+                'is_in_shopping_cart': ShoppingCart,
+            }
+            queryset = queryset.annotate(**{
+                flag: self.get_flag(model, user)
+                for flag, model in flags.items()
+                if flag in fields
+            })
+
+        return queryset
+
+    def get_prefetch_lookups(self):
+        """Return the relations the serializer output needs prefetched."""
+        fields = self.get_recipe_fields()
+        lookups = []
+
+        if 'tags' in fields:
+            lookups.append('tags')
+        if 'ingredients' in fields:
+            lookups.append('ingredient_in_recipe__ingredient')
+
+        return lookups
+
+    @staticmethod
+    def get_flag(model, user):
+        """
+        Return an expression telling if the recipe is in the user's set.
+
+        Uses the cached recipe IDs of the user, falls back to a subquery
+        for sets too large to be inlined into the query.
+        """
+        ids = get_recipe_ids(model, user.pk)
+
+        if ids is None:
+            return Exists(
+                model.objects.filter(recipe=OuterRef('pk'), user=user)
             )
+        if not ids:
+            return Value(False, output_field=BooleanField())
 
-        return super().get_queryset()
+        return ExpressionWrapper(
+            Q(pk__in=sorted(ids)), output_field=BooleanField()
+        )
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -77,6 +202,220 @@ class RecipeViewSet(ModelViewSet):
 
         return serializers.RecipePostSerializer
 
+    def represent(self, recipes, projection=None):
+        """Serialize the recipes, with the projection when it is given."""
+        if projection is None:
+            return self.get_serializer(recipes, many=True).data
+
+        return projection.represent(list(recipes))
+
+    def get_page_etag(self, page):
+        """
+        Return a weak ETag of the page.
+
+        Built from the IDs, versions and per-user flags of the recipes,
+        the total count and the request itself.
+        """
+        rows = [
+            item if isinstance(item, dict) else vars(item) for item in page
+        ]
+        subscribed = ()
+        user = self.request.user
+
+        if user.is_authenticated and 'author' in self.get_recipe_fields():
+            subscribed = sorted(Subscriptions.objects.filter(
+                subscriber=user,
+                author_id__in={row['author_id'] for row in rows}
+            ).values_list('author_id', flat=True))
+
+        return make_etag(
+            [[row.get(field) for field in VERSION_FIELDS] for row in rows],
+            subscribed,
+            self.paginator.page.paginator.count,
+            self.request.get_full_path(),
+            self.request.accepted_renderer.format,
+            weak=True,
+        )
+
+    def get_recipe(self, projection=None):
+        """
+        Fetch the recipe with the fields its ETag is built from.
+
+        A .values() row with the projection, otherwise an instance
+        whose relations are not prefetched yet, so a 304 response
+        costs the one query.
+        """
+        queryset = self.filter_queryset(
+            self.get_queryset()
+        ).prefetch_related(None)
+        user = self.request.user
+
+        if user.is_authenticated and 'author' in self.get_recipe_fields():
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscriptions.objects.filter(
+                    author=OuterRef('author'), subscriber=user
+                )
+            ))
+
+        if projection is not None:
+            return get_object_or_404(
+                projection.get_rows(queryset), pk=self.kwargs['pk']
+            )
+
+        recipe = get_object_or_404(queryset, pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, recipe)
+        return recipe
+
+    def get_list_data(self, conditional=True):
+        """
+        Return the list data and the ETag of the page.
+
+        The ETag is None when the list is not paginated. With conditional
+        the data is not built (None) when the client has the page already.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        projection = None
+
+        if settings.RECIPE_PROJECTION_FAST_PATH:
+            projection = RecipeProjection(
+                self.request, self.get_recipe_fields()
+            )
+            queryset = projection.get_rows(queryset)
+
+        page = self.paginate_queryset(queryset)
+
+        if page is None:
+            return self.represent(queryset, projection), None
+
+        etag = self.get_page_etag(page)
+
+        if conditional and get_not_modified(self.request, etag) is not None:
+            return None, etag
+
+        return self.get_paginated_response(
+            self.represent(page, projection)
+        ).data, etag
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.retrieve_batch(request)
+
+        if request.user.is_authenticated:
+            data, etag = self.get_list_data()
+        else:
+            data, etag = feed_cache.get_or_set(
+                get_response_cache_key(request),
+                partial(self.get_list_data, conditional=False),
+                settings.FEED_CACHE_TIMEOUT,
+                (cache_constants.RECIPES,),
+            )
+
+        if etag is None:
+            return Response(data)
+
+        not_modified = get_not_modified(request, etag)
+
+        if not_modified is not None:
+            return not_modified
+
+        return set_validators(Response(data), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        projection = None
+
+        if settings.RECIPE_PROJECTION_FAST_PATH:
+            projection = RecipeProjection(request, self.get_recipe_fields())
+
+        recipe = self.get_recipe(projection)
+        row = recipe if projection is not None else vars(recipe)
+        etag = make_etag(
+            kwargs['pk'],
+            *(row.get(field) for field in VERSION_FIELDS[1:]),
+            row.get('is_subscribed'),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        last_modified = (
+            None if request.user.is_authenticated else row['updated_at']
+        )
+        not_modified = get_not_modified(request, etag, last_modified)
+
+        if not_modified is not None:
+            return not_modified
+
+        if projection is not None:
+            data = projection.represent([recipe])[0]
+        else:
+            prefetch_related_objects([recipe], *self.get_prefetch_lookups())
+            data = self.get_serializer(recipe).data
+
+        return set_validators(Response(data), etag, last_modified)
+
+    def get_batch_ids(self):
+        """Parse the comma separated ?ids= list, keeping request order."""
+        ids = parse_ids(self.request.query_params['ids'])
+
+        if ids is None:
+            raise ValidationError(
+                {'ids': 'Укажите ID рецептов через запятую.'}
+            )
+        if len(ids) > settings.RECIPE_BATCH_MAX_SIZE:
+            raise ValidationError({
+                'ids': 'Нельзя запросить больше '
+                       f'{settings.RECIPE_BATCH_MAX_SIZE} рецептов.'
+            })
+
+        return ids
+
+    def retrieve_batch(self, request):
+        """
+        Return the recipes of ?ids= in request order.
+
+        Recipes that do not exist are returned as null
+        and listed in 'missing'.
+        """
+        ids = self.get_batch_ids()
+        queryset = self.get_queryset().filter(pk__in=ids)
+
+        if settings.RECIPE_PROJECTION_FAST_PATH:
+            projection = RecipeProjection(request, self.get_recipe_fields())
+            rows = list(projection.get_rows(queryset))
+            found = dict(zip(
+                (row['id'] for row in rows), projection.represent(rows)
+            ))
+        else:
+            recipes = list(queryset)
+            found = dict(zip(
+                (recipe.pk for recipe in recipes),
+                self.get_serializer(recipes, many=True).data
+            ))
+
+        return Response({
+            'results': [found.get(pk) for pk in ids],
+            'missing': [pk for pk in dict.fromkeys(ids) if pk not in found],
+        })
+
+    def perform_create(self, serializer):
+        """Save the recipe and recompute its similar recipes later."""
+        with transaction.atomic():
+            serializer.save()
+            update_similar_recipes.delay(recipe_ids=[serializer.instance.pk])
+
+    def perform_update(self, serializer):
+        self.perform_create(serializer)
+
+    def perform_destroy(self, instance):
+        """
+        Hide the recipe now and delete it in the background.
+
+        It leaves the similar recipes of other recipes right away.
+        """
+        with transaction.atomic():
+            instance.is_hidden = True
+            instance.save(update_fields=('is_hidden', 'updated_at'))
+            update_similar_recipes.delay(recipe_ids=[instance.pk])
+            purge_recipes.delay([instance.pk])
+
     def get_permissions(self):
         if self.action in (
             'favorite', 'shopping_cart', 'download_shopping_cart'
@@ -95,7 +434,11 @@ class RecipeViewSet(ModelViewSet):
             data=data, context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+
+        # The trending activity is recorded in the same transaction,
+        # see rebuild_trending().
+        with transaction.atomic():
+            serializer.save()
 
         return Response(
             serializer.data,
@@ -140,10 +483,11 @@ class RecipeViewSet(ModelViewSet):
     def delete_from_shopping_cart(self, request, pk):
         return self.delete_recipe_from(request, ShoppingCart, pk)
 
-    @action(detail=False)
-    def download_shopping_cart(self, request):
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
+    @staticmethod
+    def get_shopping_cart_ingredients(user):
+        """Return ingredient totals over all recipes in the user's cart."""
+        return IngredientInRecipe.objects.filter(
+            recipe__shopping_cart__user=user, recipe__is_hidden=False
         ).values(
             name=F('ingredient__name'),
             measurement_unit=F('ingredient__measurement_unit'),
@@ -153,7 +497,89 @@ class RecipeViewSet(ModelViewSet):
             )
         ).order_by('name')
 
-        return render_shopping_cart_as_txt(request.user, ingredients)
+    @action(detail=True)
+    def similar(self, request, pk):
+        recipes = Recipe.objects.filter(
+            similar_to__recipe=self.get_object(), is_hidden=False
+        ).order_by('-similar_to__score')
+
+        return Response(serializers.RecipeMinifiedSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+
+    def get_cook_params(self):
+        """Return the ingredient IDs and minimal coverage of the request."""
+        params = self.request.query_params
+        ingredient_ids = parse_ids(params.get('ingredients', ''))
+
+        if ingredient_ids is None:
+            raise ValidationError(
+                {'ingredients': 'Укажите ID ингредиентов через запятую.'}
+            )
+        if len(ingredient_ids) > settings.WHAT_CAN_I_COOK_MAX_INGREDIENTS:
+            raise ValidationError({
+                'ingredients': 'Нельзя указать больше '
+                f'{settings.WHAT_CAN_I_COOK_MAX_INGREDIENTS} ингредиентов.'
+            })
+
+        try:
+            min_coverage = float(params.get(
+                'min_coverage', settings.WHAT_CAN_I_COOK_MIN_COVERAGE
+            ))
+        except ValueError:
+            min_coverage = None
+
+        if min_coverage is None or not 0 < min_coverage <= 1:
+            raise ValidationError(
+                {'min_coverage': 'Укажите долю от 0 до 1.'}
+            )
+
+        return ingredient_ids, min_coverage
+
+    @action(detail=False)
+    def what_can_i_cook(self, request):
+        """
+        Return recipes ranked by the share of their ingredients given.
+
+        Served from the in-memory ingredient index, each recipe has
+        the number of matched and total ingredients and the coverage.
+        Recipes hidden since the index was synced are dropped before
+        the results are paginated.
+        """
+        matches = ingredient_index.search(
+            *self.get_cook_params(), settings.WHAT_CAN_I_COOK_MAX_RESULTS
+        )
+        hidden = set(Recipe.objects.filter(
+            pk__in=[recipe_id for recipe_id, _, _ in matches],
+            is_hidden=True,
+        ).values_list('pk', flat=True))
+        matches = self.paginate_queryset([
+            match for match in matches if match[0] not in hidden
+        ])
+        recipes = Recipe.objects.filter(
+            pk__in=[recipe_id for recipe_id, _, _ in matches],
+            is_hidden=False,
+        ).in_bulk()
+        results = []
+
+        for recipe_id, matched, total in matches:
+            if recipe_id not in recipes:
+                continue
+            item = serializers.RecipeMinifiedSerializer(
+                recipes[recipe_id], context={'request': request}
+            ).data
+            item['ingredients_matched'] = matched
+            item['ingredients_total'] = total
+            item['coverage'] = round(matched / total, 3)
+            results.append(item)
+
+        return self.get_paginated_response(results)
+
+    @action(detail=False)
+    def download_shopping_cart(self, request):
+        return render_shopping_cart_as_txt(
+            request.user, self.get_shopping_cart_ingredients(request.user)
+        )
 
 
 class FoodgramUserViewSet(UserViewSet):
@@ -164,17 +590,47 @@ class FoodgramUserViewSet(UserViewSet):
     subscribing and unsubscribing.
     """
 
+    queryset = get_user_model().objects.filter(is_hidden=False)
+    throttle_scopes = {
+        'subscriptions': 'expensive',
+        'subscribe': 'expensive',
+    }
+
     def get_permissions(self):
         if self.action in ('me', 'subscriptions', 'subscribe'):
             return (IsAuthenticated(),)
 
         return super().get_permissions()
 
+    def perform_destroy(self, instance):
+        """
+        Hide the account and its recipes now and delete them in the background.
+
+        The user is deactivated, so the account cannot be used any more.
+        """
+        with transaction.atomic():
+            instance.is_hidden = True
+            instance.is_active = False
+            instance.save(update_fields=('is_hidden', 'is_active'))
+            recipes = Recipe.objects.filter(author=instance)
+            recipe_ids = list(recipes.values_list('pk', flat=True))
+            recipes.update(is_hidden=True, updated_at=timezone.now())
+
+            if recipe_ids:
+                update_similar_recipes.delay(recipe_ids=recipe_ids)
+
+            purge_users.delay([instance.pk])
+
+    @staticmethod
+    def get_subscribed_authors(user):
+        """Return authors the user is subscribed to."""
+        return get_user_model().objects.filter(
+            subscriptions_to_author__subscriber=user, is_hidden=False
+        )
+
     @action(detail=False)
     def subscriptions(self, request):
-        authors = get_user_model().objects.filter(
-            subscriptions_to_author__subscriber=request.user
-        )
+        authors = self.get_subscribed_authors(request.user)
         serializer = serializers.UserWithRecipesSerializer(
             self.paginate_queryset(authors),
             many=True,
@@ -193,7 +649,11 @@ class FoodgramUserViewSet(UserViewSet):
             data=data, context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+
+        # The trending activity is recorded in the same transaction,
+        # see rebuild_trending().
+        with transaction.atomic():
+            serializer.save()
 
         return Response(
             serializer.data,
@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from caching.models import CacheGeneration, Counter
+
+
+@admin.register(CacheGeneration)
+class CacheGenerationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'generation')
+    readonly_fields = ('name', 'generation')
+
+
+@admin.register(Counter)
+class CounterAdmin(admin.ModelAdmin):
+    list_display = ('key', 'value', 'expires')
+    search_fields = ('key',)
+    readonly_fields = ('key', 'value', 'expires')
@@ -0,0 +1,114 @@
+"""Cache backends."""
+import base64
+import pickle
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache as BaseDatabaseCache
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+
+DEFAULT_CULL_INTERVAL = 60
+
+
+class DatabaseCache(BaseDatabaseCache):
+    """
+    Database cache whose writes only touch the row of their key.
+
+    Django's backend counts the whole table before every set() and add()
+    and deletes expired rows only once the count passes MAX_ENTRIES.
+    Entries keyed by a cache generation are orphaned by every bump,
+    so the table would be kept near MAX_ENTRIES and each write would
+    count all of it. Here each process deletes expired rows, and culls
+    the table down from MAX_ENTRIES, once per CULL_INTERVAL seconds.
+    add() stays atomic: it inserts the row, and the primary key makes
+    the insert fail if another process added the key first.
+    """
+
+    def __init__(self, table, params):
+        super().__init__(table, params)
+        self._cull_interval = params.get('OPTIONS', {}).get(
+            'CULL_INTERVAL', DEFAULT_CULL_INTERVAL
+        )
+        self._culled_at = None
+
+    def cull_periodically(self, db):
+        now = time.monotonic()
+
+        if (
+            self._culled_at is not None
+            and now - self._culled_at < self._cull_interval
+        ):
+            return
+
+        self._culled_at = now
+
+        with connections[db].cursor() as cursor:
+            self._cull(db, cursor, timezone.now())
+
+    def _base_set(self, mode, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        db = router.db_for_write(self.cache_model_class)
+        self.cull_periodically(db)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        cache_key = quote_name('cache_key')
+        expires = quote_name('expires')
+
+        if timeout is None:
+            exp = datetime.max
+        elif settings.USE_TZ:
+            exp = datetime.utcfromtimestamp(timeout)
+        else:
+            exp = datetime.fromtimestamp(timeout)
+
+        exp = connection.ops.adapt_datetimefield_value(
+            exp.replace(microsecond=0)
+        )
+        now = connection.ops.adapt_datetimefield_value(
+            timezone.now().replace(microsecond=0)
+        )
+
+        if mode == 'touch':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET {expires} = %s '
+                    f'WHERE {cache_key} = %s',
+                    [exp, key],
+                )
+                return bool(cursor.rowcount)
+
+        encoded = base64.b64encode(
+            pickle.dumps(value, self.pickle_protocol)
+        ).decode('latin1')
+        update = (
+            f'UPDATE {table} SET {quote_name("value")} = %s, {expires} = %s '
+            f'WHERE {cache_key} = %s'
+        )
+        params = [encoded, exp, key]
+
+        if mode == 'add':
+            # Only an expired entry may be replaced by add().
+            update += f' AND {expires} < %s'
+            params.append(now)
+
+        try:
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                cursor.execute(update, params)
+
+                if not cursor.rowcount:
+                    cursor.execute(
+                        f'INSERT INTO {table} '
+                        f'({cache_key}, {quote_name("value")}, {expires}) '
+                        'VALUES (%s, %s, %s)',
+                        [key, encoded, exp],
+                    )
+        except DatabaseError:
+            # The key was written by another process at the same time,
+            # or add() found an entry that has not expired.
+            return False
+
+        return True
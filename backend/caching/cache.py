@@ -0,0 +1,259 @@
+"""Two-tier cache: an in-process LRU in front of the shared cache."""
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import caches
+
+from caching import counters
+from caching.generations import generations
+from foodgram.db_router import read_from_primary
+
+METRICS = ('local_hits', 'shared_hits', 'misses', 'coalesced')
+METRICS_KEY = 'cache:metrics:{}:{}'
+
+registry = {}
+
+
+class LocalCache:
+    """Bounded thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+
+            if item is None:
+                return None
+
+            if item[0] < time.monotonic():
+                del self.items[key]
+                return None
+
+            self.items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, timeout):
+        if not self.size:
+            return
+
+        with self.lock:
+            self.items[key] = (time.monotonic() + timeout, value)
+            self.items.move_to_end(key)
+
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+class Flight:
+    """A computation shared by the threads that missed the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TwoTierCache:
+    """
+    Cache with an in-process LRU in front of the shared cache.
+
+    get_or_set() coalesces concurrent misses: one thread per process
+    computes the value while the others wait for it, and processes
+    take a short lock in the shared cache so that usually only one
+    of them computes; the lock relies on add() of the shared backend
+    being atomic, as it is for the database cache. Shared timeouts get
+    random jitter so entries written together do not expire together.
+    Keys can include cache generations, which makes bumping
+    a generation invalidate them. Values keyed by a generation are
+    computed from the primary database: right after a bump a replica
+    may not have the change yet, and its data would be cached under
+    the new generation.
+    """
+
+    def __init__(self, name, local_size=None, local_timeout=None):
+        self.name = name
+        self.local = LocalCache(
+            settings.CACHE_LOCAL_SIZE if local_size is None else local_size
+        )
+        self.local_timeout = (
+            settings.CACHE_LOCAL_TIMEOUT
+            if local_timeout is None else local_timeout
+        )
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.metrics = defaultdict(int)
+        self.flushed_at = time.monotonic()
+        registry[name] = self
+
+    @property
+    def shared(self):
+        return caches[settings.SHARED_CACHE]
+
+    def make_key(self, key, generation_names=()):
+        parts = [self.name, key]
+        parts.extend(
+            f'{name}{generations.get(name)}' for name in generation_names
+        )
+        return ':'.join(map(str, parts))
+
+    def count(self, metric):
+        with self.lock:
+            self.metrics[metric] += 1
+            now = time.monotonic()
+
+            if now - self.flushed_at < settings.CACHE_METRICS_FLUSH_INTERVAL:
+                return
+
+            metrics, self.metrics = self.metrics, defaultdict(int)
+            self.flushed_at = now
+
+        self.flush_metrics(metrics)
+
+    def flush_metrics(self, metrics):
+        for metric, value in metrics.items():
+            counters.incr(METRICS_KEY.format(self.name, metric), value)
+
+    def get_timeout(self, timeout):
+        return timeout * random.uniform(1 - settings.CACHE_TTL_JITTER, 1)
+
+    def get(self, key, generation_names=()):
+        """Return the cached value or None."""
+        item = self.get_item(self.make_key(key, generation_names))
+        return item[0] if item else None
+
+    def get_item(self, cache_key):
+        item = self.local.get(cache_key)
+
+        if item is not None:
+            self.count('local_hits')
+            return item
+
+        item = self.shared.get(cache_key)
+
+        if item is not None:
+            self.count('shared_hits')
+            self.local.set(cache_key, item, self.local_timeout)
+
+        return item
+
+    def set(self, key, value, timeout, generation_names=()):
+        self.set_item(self.make_key(key, generation_names), value, timeout)
+
+    def set_item(self, cache_key, value, timeout):
+        item = (value,)
+        self.shared.set(cache_key, item, self.get_timeout(timeout))
+        self.local.set(cache_key, item, min(timeout, self.local_timeout))
+
+    def delete(self, key, generation_names=()):
+        """
+        Delete the key here and in the shared cache.
+
+        Other processes may keep their local copy until it expires,
+        so data that must change everywhere at once should be keyed
+        by a generation instead.
+        """
+        cache_key = self.make_key(key, generation_names)
+        self.local.delete(cache_key)
+        self.shared.delete(cache_key)
+
+    def get_or_set(self, key, compute, timeout, generation_names=()):
+        """Return the cached value, computing it once on a miss."""
+        cache_key = self.make_key(key, generation_names)
+        item = self.get_item(cache_key)
+
+        if item is not None:
+            return item[0]
+
+        with self.lock:
+            flight = self.flights.get(cache_key)
+            leader = flight is None
+
+            if leader:
+                flight = self.flights[cache_key] = Flight()
+
+        if not leader:
+            self.count('coalesced')
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.value
+
+        try:
+            flight.value = self.compute(
+                cache_key, compute, timeout, primary=bool(generation_names)
+            )
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[cache_key]
+            flight.done.set()
+
+        return flight.value
+
+    def compute(self, cache_key, compute, timeout, primary=False):
+        """
+        Compute a missing value, waiting for another process first.
+
+        With primary, the value is computed from the primary database.
+        """
+        lock_key = f'{cache_key}:lock'
+        locked = self.shared.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT)
+
+        if not locked:
+            deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+
+            while time.monotonic() < deadline:
+                time.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+                item = self.shared.get(cache_key)
+
+                if item is not None:
+                    self.count('shared_hits')
+                    self.local.set(cache_key, item, self.local_timeout)
+                    return item[0]
+
+        self.count('misses')
+
+        try:
+            with read_from_primary() if primary else nullcontext():
+                value = compute()
+
+            self.set_item(cache_key, value, timeout)
+        finally:
+            if locked:
+                self.shared.delete(lock_key)
+
+        return value
+
+    def get_metrics(self):
+        """Return the metrics flushed by all processes."""
+        values = counters.get_many([
+            METRICS_KEY.format(self.name, metric) for metric in METRICS
+        ])
+        return {
+            metric: values.get(METRICS_KEY.format(self.name, metric), 0)
+            for metric in METRICS
+        }
+
+
+catalog_cache = TwoTierCache('catalog')
+feed_cache = TwoTierCache('feed')
+count_cache = TwoTierCache('counts')
+# Per-user sets change on every favourite and cart change
+# and are deleted explicitly, so they are kept in the shared cache only.
+user_sets_cache = TwoTierCache('user_sets', local_size=0)
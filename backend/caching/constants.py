@@ -0,0 +1,15 @@
+MAX_NAME_LENGTH = 50
+MAX_COUNTER_KEY_LENGTH = 255
+
+# Seconds between deletions of expired counters by a process.
+COUNTER_CULL_INTERVAL = 60
+
+# Generations of cached data, bumped on changes of the source models.
+RECIPES = 'recipes'
+CATALOG = 'catalog'
+USERS = 'users'
+TOKENS = 'tokens'
+# Bumped by bulk writes of recipes that keep their updated_at or leave
+# no row behind, i.e. imports and purges; data built by full scans
+# of the recipes has to be rebuilt.
+BULK_RECIPES = 'bulk_recipes'
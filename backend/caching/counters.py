@@ -0,0 +1,63 @@
+"""Counters shared by all worker processes."""
+import time
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Q
+from django.utils import timezone
+
+from caching.constants import COUNTER_CULL_INTERVAL
+from caching.models import Counter
+
+culled_at = None
+
+
+def incr(key, amount=1, timeout=None):
+    """
+    Add the amount to the counter, creating it if it does not exist.
+
+    The value is changed in the database with a single UPDATE, so
+    concurrent increments from any number of processes are not lost.
+    A counter created with a timeout is deleted some time after it
+    expires.
+    """
+    updated = Counter.objects.filter(key=key).update(
+        value=F('value') + amount
+    )
+
+    if updated:
+        return
+
+    expires = None if timeout is None else (
+        timezone.now() + timedelta(seconds=timeout)
+    )
+    counter, created = Counter.objects.get_or_create(
+        key=key, defaults={'value': amount, 'expires': expires}
+    )
+
+    if not created:
+        Counter.objects.filter(key=key).update(value=F('value') + amount)
+    else:
+        cull()
+
+
+def get_many(keys):
+    """Return the values of the existing unexpired counters by key."""
+    return dict(
+        Counter.objects.using(DEFAULT_DB_ALIAS).filter(
+            Q(expires__isnull=True) | Q(expires__gt=timezone.now()),
+            key__in=keys,
+        ).values_list('key', 'value')
+    )
+
+
+def cull():
+    """Delete expired counters, at most once per COUNTER_CULL_INTERVAL."""
+    global culled_at
+    now = time.monotonic()
+
+    if culled_at is not None and now - culled_at < COUNTER_CULL_INTERVAL:
+        return
+
+    culled_at = now
+    Counter.objects.filter(expires__lt=timezone.now()).delete()
@@ -0,0 +1,82 @@
+"""Named cache generations shared by all worker processes."""
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from caching.models import CacheGeneration
+
+
+class Generations:
+    """
+    Per-process view of the cache generations.
+
+    All generations are read with one query at most once per
+    CACHE_GENERATION_CHECK_INTERVAL seconds, so checking a generation
+    is usually a dictionary lookup. Data cached in the process is
+    stale once the generation it was stored with has changed.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def is_expired(self, now):
+        interval = settings.CACHE_GENERATION_CHECK_INTERVAL
+        return self.checked_at is None or now - self.checked_at >= interval
+
+    def get(self, name):
+        """Return the current generation of the name."""
+        now = time.monotonic()
+
+        if self.is_expired(now):
+            with self.lock:
+                if self.is_expired(now):
+                    self.values = dict(
+                        CacheGeneration.objects.using(
+                            DEFAULT_DB_ALIAS
+                        ).values_list('name', 'generation')
+                    )
+                    self.checked_at = now
+
+        return self.values.get(name, 0)
+
+    def expire(self):
+        """Read the generations again on the next check."""
+        self.checked_at = None
+
+
+generations = Generations()
+
+
+def increment(names):
+    for name in names:
+        updated = CacheGeneration.objects.filter(name=name).update(
+            generation=F('generation') + 1
+        )
+
+        if not updated:
+            generation, created = CacheGeneration.objects.get_or_create(
+                name=name, defaults={'generation': 1}
+            )
+            if not created:
+                CacheGeneration.objects.filter(name=name).update(
+                    generation=F('generation') + 1
+                )
+
+    generations.expire()
+
+
+def bump(*names):
+    """
+    Invalidate the named cached data in every process.
+
+    The generations change after the current transaction commits,
+    so other workers never see a new generation with old data,
+    and the generation rows are not locked for the whole transaction.
+    """
+    transaction.on_commit(partial(increment, names))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from caching.cache import registry
+
+
+class Command(BaseCommand):
+    """Print hit and miss counts of the project caches."""
+
+    help = 'Показывает число попаданий и промахов кэшей по всем процессам.'
+
+    def handle(self, *args, **options):
+        for name, cache in registry.items():
+            metrics = cache.get_metrics()
+            hits = metrics['local_hits'] + metrics['shared_hits']
+            total = hits + metrics['misses']
+            ratio = hits / total if total else 0
+            self.stdout.write(
+                f'{name}: ' + ', '.join(
+                    f'{metric}={value}' for metric, value in metrics.items()
+                ) + f', hit_ratio={ratio:.1%}'
+            )
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('generation', models.BigIntegerField(default=0, verbose_name='Поколение')),
+            ],
+            options={
+                'verbose_name': 'поколение кэша',
+                'verbose_name_plural': 'Поколения кэша',
+                'ordering': ('name',),
+            },
+        ),
+    ]
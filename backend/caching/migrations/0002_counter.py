@@ -0,0 +1,35 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:33
+
+from django.core.management import call_command
+from django.db import migrations, models
+
+
+def create_cache_table(apps, schema_editor):
+    call_command(
+        'createcachetable', database=schema_editor.connection.alias
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caching', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Ключ')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                ('expires', models.DateTimeField(db_index=True, null=True, verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'счётчик',
+                'verbose_name_plural': 'Счётчики',
+                'ordering': ('key',),
+            },
+        ),
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import models
+
+from caching import constants
+
+
+class CacheGeneration(models.Model):
+    """Model representing a generation of a named group of cached data."""
+
+    name = models.CharField(
+        'Название', max_length=constants.MAX_NAME_LENGTH, unique=True
+    )
+    generation = models.BigIntegerField('Поколение', default=0)
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'поколение кэша'
+        verbose_name_plural = 'Поколения кэша'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.generation}'
+
+
+class Counter(models.Model):
+    """Model representing a counter shared by all worker processes."""
+
+    key = models.CharField(
+        'Ключ', max_length=constants.MAX_COUNTER_KEY_LENGTH, unique=True
+    )
+    value = models.BigIntegerField('Значение', default=0)
+    expires = models.DateTimeField('Истекает', null=True, db_index=True)
+
+    class Meta:
+        ordering = ('key',)
+        verbose_name = 'счётчик'
+        verbose_name_plural = 'Счётчики'
+
+    def __str__(self) -> str:
+        return f'{self.key}: {self.value}'
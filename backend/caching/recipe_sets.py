@@ -0,0 +1,46 @@
+"""Cached IDs of the recipes a user has favourited or put in the cart."""
+from django.conf import settings
+from django.db import transaction
+
+from caching.cache import user_sets_cache
+from recipes.models import Favourites, ShoppingCart
+
+RECIPE_SETS = {
+    Favourites: 'favourites',
+    ShoppingCart: 'shopping_cart',
+}
+
+
+def get_key(model, user_id):
+    return f'{RECIPE_SETS[model]}:{user_id}'
+
+
+def get_recipe_ids(model, user_id):
+    """
+    Return the frozenset of recipe IDs of the user in the model.
+
+    Returns None when the user has more than USER_RECIPE_SET_MAX_SIZE
+    of them, such sets are better checked in the database.
+    """
+    def compute():
+        ids = list(model.objects.filter(user_id=user_id).values_list(
+            'recipe_id', flat=True
+        )[:settings.USER_RECIPE_SET_MAX_SIZE + 1])
+
+        if len(ids) > settings.USER_RECIPE_SET_MAX_SIZE:
+            return None
+
+        return frozenset(ids)
+
+    return user_sets_cache.get_or_set(
+        get_key(model, user_id),
+        compute,
+        settings.USER_RECIPE_SET_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_recipe_ids(model, user_id):
+    """Drop the cached IDs once the current transaction commits."""
+    transaction.on_commit(
+        lambda: user_sets_cache.delete(get_key(model, user_id))
+    )
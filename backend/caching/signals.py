@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from caching import constants
+from caching.generations import bump
+from caching.recipe_sets import invalidate_recipe_ids
+from recipes.models import (
+    Favourites, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def bump_recipes(sender, **kwargs):
+    """Invalidate cached recipes."""
+    bump(constants.RECIPES)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_recipe_relations(sender, action, **kwargs):
+    """Invalidate cached recipes when their tags or ingredients change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump(constants.RECIPES)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_catalog(sender, **kwargs):
+    """Invalidate cached tags and ingredients and recipes showing them."""
+    bump(constants.CATALOG, constants.RECIPES)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def bump_users(sender, update_fields=None, **kwargs):
+    """Invalidate cached users and recipes showing them as authors."""
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+
+    bump(constants.USERS, constants.RECIPES)
+
+
+@receiver(post_save, sender=Favourites)
+@receiver(post_delete, sender=Favourites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_user_recipes(sender, instance, **kwargs):
+    """Drop the cached favourite or cart recipe IDs of the user."""
+    invalidate_recipe_ids(sender, instance.user_id)
@@ -0,0 +1,380 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication, local_token_cache
+from caching import counters
+from caching.cache import catalog_cache, registry
+from caching.constants import RECIPES
+from caching.generations import generations, increment
+from foodgram.db_router import (
+    ReplicaRoutingMiddleware, read_db_alias, replica_health
+)
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+PROCESSES = 4
+REPLICA = 'replica_1'
+
+
+def run_child(target, args):
+    try:
+        target(*args)
+    finally:
+        connections.close_all()
+
+
+def run_in_processes(target, *args, count=1):
+    """Run the target in child processes sharing the test database."""
+    # SQLite connections must not be carried across fork().
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(target=run_child, args=(target, args))
+        for _ in range(count)
+    ]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    return [process.exitcode for process in processes]
+
+
+def create_tag(slug, color):
+    Tag.objects.create(name=slug, color=color, slug=slug)
+
+
+def rename_recipe(pk, name):
+    recipe = Recipe.objects.get(pk=pk)
+    recipe.name = name
+    recipe.save()
+
+
+def delete_token(key):
+    Token.objects.get(key=key).delete()
+
+
+def deactivate_user(pk):
+    user = User.objects.get(pk=pk)
+    user.is_active = False
+    user.save()
+
+
+def increment_recipes(times):
+    for _ in range(times):
+        increment((RECIPES,))
+
+
+def increment_counter(key, times):
+    for _ in range(times):
+        counters.incr(key)
+
+
+def take_lock(key, queue):
+    queue.put(caches['shared'].add(key, 1, 60))
+
+
+@unittest.skipUnless(
+    connection.vendor == 'sqlite', 'Дочерние процессы открывают файл SQLite.'
+)
+@override_settings(CACHE_GENERATION_CHECK_INTERVAL=0)
+class MultiProcessInvalidationTest(TransactionTestCase):
+    """Changes made by other processes invalidate cached data here."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        for cache in registry.values():
+            cache.local.items.clear()
+        local_token_cache.items.clear()
+        generations.expire()
+
+        self.user = User.objects.create_user(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров',
+            password='password-123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def assertChildrenSucceed(self, exit_codes):
+        self.assertEqual(exit_codes, [0] * len(exit_codes))
+
+    def test_catalog_change(self):
+        create_tag('breakfast', '#FFFF00')
+        self.assertEqual(
+            [tag['slug'] for tag in self.client.get('/api/tags/').json()],
+            ['breakfast'],
+        )
+
+        self.assertChildrenSucceed(
+            run_in_processes(create_tag, 'lunch', '#00FF00')
+        )
+
+        self.assertEqual(
+            sorted(
+                tag['slug'] for tag in self.client.get('/api/tags/').json()
+            ),
+            ['breakfast', 'lunch'],
+        )
+
+    def test_recipe_change(self):
+        recipe = Recipe.objects.create(
+            name='Омлет',
+            text='Взбить и пожарить.',
+            cooking_time=10,
+            image='recipes/images/omelette.png',
+            author=self.user,
+        )
+        url = '/api/recipes/'
+        self.assertEqual(
+            self.client.get(url).json()['results'][0]['name'], 'Омлет'
+        )
+        self.assertEqual(
+            self.client.get(f'{url}{recipe.pk}/').json()['name'], 'Омлет'
+        )
+
+        self.assertChildrenSucceed(
+            run_in_processes(rename_recipe, recipe.pk, 'Яичница')
+        )
+
+        self.assertEqual(
+            self.client.get(url).json()['results'][0]['name'], 'Яичница'
+        )
+        self.assertEqual(
+            self.client.get(f'{url}{recipe.pk}/').json()['name'], 'Яичница'
+        )
+
+    def test_deleted_token(self):
+        authentication = CachedTokenAuthentication()
+        user, _ = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+        self.assertChildrenSucceed(
+            run_in_processes(delete_token, self.token.key)
+        )
+
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user(self):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(self.token.key)
+
+        self.assertChildrenSucceed(
+            run_in_processes(deactivate_user, self.user.pk)
+        )
+
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(self.token.key)
+
+    def test_concurrent_generation_increments(self):
+        start = generations.get(RECIPES)
+
+        self.assertChildrenSucceed(
+            run_in_processes(increment_recipes, 25, count=PROCESSES)
+        )
+
+        self.assertEqual(generations.get(RECIPES), start + 25 * PROCESSES)
+
+    def test_concurrent_counter_increments(self):
+        self.assertChildrenSucceed(
+            run_in_processes(
+                increment_counter, 'test:counter', 50, count=PROCESSES
+            )
+        )
+
+        self.assertEqual(
+            counters.get_many(['test:counter']),
+            {'test:counter': 50 * PROCESSES},
+        )
+
+    def test_shared_lock_has_one_owner(self):
+        queue = multiprocessing.get_context('fork').Queue()
+
+        self.assertChildrenSucceed(
+            run_in_processes(take_lock, 'test:lock', queue, count=PROCESSES)
+        )
+
+        self.assertEqual(
+            sorted(queue.get() for _ in range(PROCESSES)),
+            [False] * (PROCESSES - 1) + [True],
+        )
+
+
+class DatabaseCacheTest(TestCase):
+    """The shared database cache writes without counting the table."""
+
+    def setUp(self):
+        self.cache = caches['shared']
+        self.cache.clear()
+        self.cache._culled_at = None
+
+    def test_set_and_get(self):
+        self.cache.set('key', {'value': 1}, 60)
+        self.cache.set('key', {'value': 2}, 60)
+
+        self.assertEqual(self.cache.get('key'), {'value': 2})
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('key', 1, 60))
+        self.assertFalse(self.cache.add('key', 2, 60))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_add_replaces_expired_entry(self):
+        self.cache.set('key', 1, -1)
+
+        self.assertTrue(self.cache.add('key', 2, 60))
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_touch(self):
+        self.assertFalse(self.cache.touch('key', 60))
+        self.cache.set('key', 1, -1)
+
+        self.assertTrue(self.cache.touch('key', 60))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_write_does_not_count_table(self):
+        self.cache.set('first', 1, 60)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.cache.set('second', 2, 60)
+            self.cache.add('third', 3, 60)
+
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'COUNT' in query['sql']
+        ])
+
+    def test_expired_rows_culled_periodically(self):
+        self.cache.set('expired', 1, -1)
+        self.cache.set('other', 1, -1)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM foodgram_cache')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+        with mock.patch('time.monotonic', return_value=10 ** 6):
+            self.cache.set('fresh', 1, 60)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT cache_key FROM foodgram_cache')
+            self.assertEqual(
+                [row[0] for row in cursor.fetchall()],
+                [self.cache.make_key('fresh')],
+            )
+
+
+class ReplicaRoutingTest(TestCase):
+    """Safe API reads go to a replica, writes pin the client to the primary."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        for cache in registry.values():
+            cache.local.items.clear()
+        replica_health.failed_until.clear()
+        self.addCleanup(replica_health.failed_until.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+        self.factory = RequestFactory()
+        self.status = 200
+
+    def add_replica(self, name):
+        patcher = mock.patch.dict(settings.DATABASES, {REPLICA: dict(
+            connections.settings[DEFAULT_DB_ALIAS],
+            NAME=os.path.join(self.directory, name),
+        )})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.remove_replica)
+
+    @staticmethod
+    def remove_replica():
+        connections[REPLICA].close()
+        del connections[REPLICA]
+
+    def get_response(self, request):
+        self.routed = router.db_for_read(Recipe)
+        return HttpResponse(status=self.status)
+
+    def request(self, method, path='/api/recipes/', client='Token first'):
+        self.middleware(getattr(self.factory, method)(
+            path, HTTP_AUTHORIZATION=client
+        ))
+        self.assertIsNone(read_db_alias.get())
+        return self.routed
+
+    def test_safe_api_reads_go_to_replica(self):
+        self.add_replica('replica.sqlite3')
+
+        self.assertEqual(self.request('get'), REPLICA)
+        self.assertEqual(self.request('head'), REPLICA)
+        self.assertEqual(self.request('get', '/admin/'), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request('post'), DEFAULT_DB_ALIAS)
+
+    def test_write_pins_client_to_primary(self):
+        self.add_replica('replica.sqlite3')
+        self.status = 400
+        self.request('post')
+
+        self.assertEqual(self.request('get'), REPLICA)
+
+        self.status = 201
+        self.request('post')
+
+        self.assertEqual(self.request('get'), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request('get', client='Token second'), REPLICA)
+
+    def test_failed_replica_is_dropped(self):
+        self.add_replica(os.path.join('missing', 'replica.sqlite3'))
+
+        self.assertEqual(self.request('get'), DEFAULT_DB_ALIAS)
+        self.assertIn(REPLICA, replica_health.failed_until)
+
+        with mock.patch.object(
+            connections[REPLICA], 'ensure_connection'
+        ) as ensure_connection:
+            self.assertEqual(self.request('get'), DEFAULT_DB_ALIAS)
+
+        ensure_connection.assert_not_called()
+
+    def test_generation_keyed_fills_read_primary(self):
+        self.add_replica('replica.sqlite3')
+
+        def get_response(request):
+            self.routed = (
+                catalog_cache.get_or_set(
+                    'generation', lambda: router.db_for_read(Recipe), 60,
+                    (RECIPES,),
+                ),
+                catalog_cache.get_or_set(
+                    'plain', lambda: router.db_for_read(Recipe), 60
+                ),
+            )
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+        self.assertEqual(self.request('get'), (DEFAULT_DB_ALIAS, REPLICA))
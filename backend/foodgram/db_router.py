@@ -0,0 +1,178 @@
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.authentication import TokenAuthentication
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_CACHE_KEY = 'db_router:pin:{}'
+# App label of the model Django uses for the database cache table.
+CACHE_APP_LABEL = 'django_cache'
+
+read_db_alias = ContextVar('read_db_alias', default=None)
+
+
+@contextmanager
+def read_from_primary():
+    """Route the reads of the block to the primary database."""
+    token = read_db_alias.set(None)
+
+    try:
+        yield
+    finally:
+        read_db_alias.reset(token)
+
+
+class ReplicaHealth:
+    """
+    Availability of replicas for the current process.
+
+    A replica that failed to connect is left out of rotation
+    for DB_REPLICA_RETRY_SECONDS and checked again after that.
+    """
+
+    def __init__(self):
+        self.failed_until = {}
+
+    def is_available(self, alias):
+        if time.monotonic() < self.failed_until.get(alias, 0):
+            return False
+
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            self.failed_until[alias] = (
+                time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+            )
+            return False
+
+        self.failed_until.pop(alias, None)
+        return True
+
+
+replica_health = ReplicaHealth()
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def choose_replica():
+    """Return a random available replica or None."""
+    replicas = get_replicas()
+    random.shuffle(replicas)
+
+    for alias in replicas:
+        if replica_health.is_available(alias):
+            return alias
+
+    return None
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to the replica chosen for the current request.
+
+    Outside of requests allowed to use replicas,
+    reads and all writes go to the primary database. The database
+    cache is always read from the primary, where it is written.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+
+        return read_db_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Allow safe-method API requests to read from a replica.
+
+    After a successful write the client is pinned to the primary
+    for DB_REPLICA_STICKINESS_SECONDS, so it reads its own changes.
+    Clients are identified by the Authorization header or session cookie,
+    a client that has just logged in by the token it was given.
+    """
+
+    def process_request(self, request):
+        request.read_db_token = None
+
+        if (
+            request.method not in SAFE_METHODS
+            or not request.path_info.startswith(
+                settings.DB_REPLICA_READ_PREFIXES
+            )
+            or not get_replicas()
+        ):
+            return
+
+        pin_key = self.get_pin_key(request)
+
+        if pin_key and caches[settings.DB_REPLICA_PIN_CACHE].get(pin_key):
+            return
+
+        request.read_db_token = read_db_alias.set(choose_replica())
+
+    def process_response(self, request, response):
+        token = getattr(request, 'read_db_token', None)
+
+        if token is not None:
+            read_db_alias.reset(token)
+        elif (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            pin_key = self.get_pin_key(request) or self.get_login_pin_key(
+                response
+            )
+
+            if pin_key:
+                caches[settings.DB_REPLICA_PIN_CACHE].set(
+                    pin_key, True, settings.DB_REPLICA_STICKINESS_SECONDS
+                )
+
+        return response
+
+    @staticmethod
+    def make_pin_key(client):
+        return PIN_CACHE_KEY.format(
+            hashlib.sha256(client.encode()).hexdigest()
+        )
+
+    def get_pin_key(self, request):
+        client = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(
+            settings.SESSION_COOKIE_NAME
+        )
+
+        if not client:
+            return None
+
+        return self.make_pin_key(client)
+
+    def get_login_pin_key(self, response):
+        """Return the pin key of the token issued by a login response."""
+        data = getattr(response, 'data', None)
+
+        if not isinstance(data, dict) or not data.get('auth_token'):
+            return None
+
+        return self.make_pin_key(
+            f'{TokenAuthentication.keyword} {data["auth_token"]}'
+        )
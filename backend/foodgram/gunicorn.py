@@ -0,0 +1,71 @@
+"""
+Gunicorn configuration for foodgram.
+
+Usage: gunicorn -c python:foodgram.gunicorn
+
+Every setting can be overridden with an environment variable.
+"""
+import math
+import multiprocessing
+import os
+
+CGROUP_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+
+
+def get_cpu_count():
+    """Return the number of cores available to the process."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = multiprocessing.cpu_count()
+
+    try:
+        with open(CGROUP_CPU_MAX) as file:
+            quota, period = file.read().split()
+        if quota != 'max':
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return count
+
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+CPU_COUNT = get_cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = os.getenv(
+        'GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker'
+    )
+    workers = int(os.getenv('GUNICORN_WORKERS', CPU_COUNT + 1))
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+    workers = int(os.getenv('GUNICORN_WORKERS', CPU_COUNT * 2 + 1))
+
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(
+    os.getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+)
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def when_ready(server):
+    """Warm up the preloaded application before the workers are forked."""
+    if preload_app:
+        from foodgram.warmup import warm_up
+
+        warm_up()
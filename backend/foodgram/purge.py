@@ -0,0 +1,195 @@
+"""Chunked set-based deletion of rows and everything depending on them."""
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import CASCADE, FileField
+from django.dispatch import Signal
+
+from caching.constants import BULK_RECIPES, RECIPES, USERS
+from caching.generations import bump
+
+logger = logging.getLogger(__name__)
+
+# Sent with the primary keys of rows about to be purged, in the same
+# transaction as their deletion, by models with receivers only.
+pre_purge = Signal()
+
+
+def get_cascades(model):
+    """Return the reverse relations deleted together with the model rows."""
+    return [
+        relation
+        for relation in model._meta.get_fields(include_hidden=True)
+        if (relation.one_to_many or relation.one_to_one)
+        and relation.auto_created
+        and not relation.concrete
+        and relation.on_delete is CASCADE
+    ]
+
+
+def chunked(ids, size):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def delete_rows(model, column, ids, chunk_size, progress=None):
+    """
+    Delete rows of the model whose column is in ids.
+
+    Every statement deletes at most chunk_size rows and commits on its
+    own, so no lock is held for long. Returns the number of rows.
+    """
+    if pre_purge.has_listeners(model):
+        return delete_rows_with_signal(
+            model, column, ids, chunk_size, progress
+        )
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    column = connection.ops.quote_name(column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f'DELETE FROM {table} WHERE {pk} IN ('
+        f'SELECT {pk} FROM {table} WHERE {column} IN ({placeholders}) '
+        f'LIMIT %s)'
+    )
+    total = 0
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*ids, chunk_size])
+            deleted = cursor.rowcount
+        total += deleted
+
+        if deleted and progress:
+            progress(model._meta.label, deleted)
+
+        if deleted < chunk_size:
+            return total
+
+
+def delete_rows_with_signal(model, column, ids, chunk_size, progress=None):
+    """
+    Delete rows like delete_rows(), sending pre_purge for each chunk.
+
+    The receivers and the deletion share a transaction, so a purge
+    interrupted and run again does not repeat their work.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    column = connection.ops.quote_name(column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    select_sql = (
+        f'SELECT {pk} FROM {table} WHERE {column} IN ({placeholders}) '
+        f'LIMIT %s'
+    )
+    total = 0
+
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(select_sql, [*ids, chunk_size])
+            pks = [row[0] for row in cursor.fetchall()]
+
+            if pks:
+                pre_purge.send(sender=model, pks=pks)
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {pk} IN '
+                    f'({", ".join(["%s"] * len(pks))})',
+                    pks,
+                )
+
+        total += len(pks)
+
+        if pks and progress:
+            progress(model._meta.label, len(pks))
+
+        if len(pks) < chunk_size:
+            return total
+
+
+def delete_files(model, ids):
+    """Return a function removing the files stored by the model rows."""
+    fields = [
+        field.attname for field in model._meta.concrete_fields
+        if isinstance(field, FileField)
+    ]
+
+    if not fields:
+        return lambda: None
+
+    names = [
+        name
+        for values in model._base_manager.filter(pk__in=ids).values_list(
+            *fields
+        )
+        for name in values
+        if name
+    ]
+
+    def delete():
+        for name in names:
+            try:
+                default_storage.delete(name)
+            except OSError:
+                logger.warning('Не удалось удалить файл %s.', name)
+
+    return delete
+
+
+def purge(model, ids, progress=None, chunk_size=None, bulk=False):
+    """
+    Delete model rows by primary key with all cascading rows and files.
+
+    Unlike Model.delete() nothing is loaded into memory and no model
+    signals but pre_purge are sent: dependent rows are removed first
+    with chunked DELETE
+    statements, models that have dependents of their own are walked
+    chunk by chunk. The recipes and users cache generations are bumped
+    after each chunk instead. progress(label, rows) is called after
+    each statement. Deleting rows that are already gone is a no-op,
+    so an interrupted purge can simply be run again.
+
+    Recipes hidden by the API have a new updated_at and leave the
+    ingredient index on its next sync. A bulk purge, which may delete
+    recipes hidden some other way, bumps the bulk recipes generation
+    at the end, and every worker rebuilds the index.
+    """
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+    total = 0
+
+    for chunk in chunked(ids, chunk_size):
+        for relation in get_cascades(model):
+            related = relation.related_model
+            column = relation.field.column
+
+            if not get_cascades(related):
+                total += delete_rows(
+                    related, column, chunk, chunk_size, progress
+                )
+                continue
+
+            lookup = {f'{relation.field.attname}__in': chunk}
+            while True:
+                related_ids = list(related._base_manager.filter(
+                    **lookup
+                ).values_list('pk', flat=True)[:chunk_size])
+
+                if not related_ids:
+                    break
+
+                total += purge(related, related_ids, progress, chunk_size)
+
+        remove_files = delete_files(model, chunk)
+        total += delete_rows(
+            model, model._meta.pk.column, chunk, chunk_size, progress
+        )
+        remove_files()
+        bump(RECIPES, USERS)
+
+    if bulk:
+        bump(BULK_RECIPES)
+
+    return total
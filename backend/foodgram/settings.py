@@ -30,10 +30,16 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
+    'caching.apps.CachingConfig',
+    'monitoring.apps.MonitoringConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.profiling.ProfilingMiddleware',
+    'monitoring.queries.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,6 +70,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# 'wsgi' or 'asgi': in ASGI mode the hot read endpoints are served async.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
 DEFAULT_DB = {
     'ENGINE': 'django.db.backends.postgresql',
     'NAME': os.getenv('POSTGRES_DB', 'django'),
@@ -77,12 +86,32 @@ if os.getenv('USE_SQLITE', None):
     DEFAULT_DB = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, so tests can use the database from several processes.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 
 DATABASES = {
     'default': DEFAULT_DB
 }
 
+# Replicas are given as hosts for PostgreSQL or as file names for SQLite.
+for number, replica in enumerate(os.getenv('DB_REPLICAS', '').split(), 1):
+    DATABASES[f'replica_{number}'] = {
+        **DEFAULT_DB,
+        'NAME' if os.getenv('USE_SQLITE', None) else 'HOST': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.db_router.PrimaryReplicaRouter']
+
+DB_REPLICA_READ_PREFIXES = ('/api/',)
+
+DB_REPLICA_STICKINESS_SECONDS = int(os.getenv('DB_REPLICA_STICKINESS_SECONDS', 5))
+
+DB_REPLICA_RETRY_SECONDS = int(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+
+DB_REPLICA_PIN_CACHE = 'shared'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -126,17 +155,163 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
 
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ActionCostThrottle',
+    ] if os.getenv('THROTTLING_ENABLED', 'True') == 'True' else [],
+
+    # Proxies in front of the backend appending to X-Forwarded-For (nginx).
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
+
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('THROTTLE_ANON_RATE', '300/min'),
+        'user': os.getenv('THROTTLE_USER_RATE', '600/min'),
+        'expensive': os.getenv('THROTTLE_EXPENSIVE_RATE', '60/min'),
+    },
+
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
 }
 
+# Build recipe list/detail responses from .values() rows without serializers.
+RECIPE_PROJECTION_FAST_PATH = os.getenv('RECIPE_PROJECTION_FAST_PATH', 'False') == 'True'
+
+RECIPE_BATCH_MAX_SIZE = int(os.getenv('RECIPE_BATCH_MAX_SIZE', 100))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by all workers; the cache table is created by a migration.
+    # Expired rows are deleted every CULL_INTERVAL seconds, not on writes.
+    'shared': {
+        'BACKEND': 'caching.backends.DatabaseCache',
+        'LOCATION': 'foodgram_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SHARED_CACHE_MAX_ENTRIES', 50_000)),
+            'CULL_INTERVAL': float(os.getenv('SHARED_CACHE_CULL_INTERVAL', 60)),
+        },
+    },
+    # Throttle counters need an atomic incr(); memcached in production.
+    'throttle': {
+        'BACKEND': os.getenv('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION', 'throttle'),
+    },
+}
+
+THROTTLE_CACHE = 'throttle'
+
+# Cost of '<basename>.<action>' in its throttle scope, 1 by default.
+THROTTLE_ACTION_COSTS = {
+    'recipes.download_shopping_cart': int(os.getenv('THROTTLE_DOWNLOAD_COST', 10)),
+    'recipes.create': int(os.getenv('THROTTLE_RECIPE_CREATE_COST', 5)),
+    'users.subscriptions': int(os.getenv('THROTTLE_SUBSCRIPTIONS_COST', 3)),
+    'ingredients.list': int(os.getenv('THROTTLE_INGREDIENTS_COST', 2)),
+}
+
+CACHE_GENERATION_CHECK_INTERVAL = float(os.getenv('CACHE_GENERATION_CHECK_INTERVAL', 1))
+
+SHARED_CACHE = 'shared'
+
+CACHE_LOCAL_SIZE = int(os.getenv('CACHE_LOCAL_SIZE', 1024))
+
+CACHE_LOCAL_TIMEOUT = float(os.getenv('CACHE_LOCAL_TIMEOUT', 60))
+
+CACHE_TTL_JITTER = float(os.getenv('CACHE_TTL_JITTER', 0.1))
+
+CACHE_LOCK_TIMEOUT = float(os.getenv('CACHE_LOCK_TIMEOUT', 5))
+
+CACHE_LOCK_POLL_INTERVAL = 0.05
+
+CACHE_METRICS_FLUSH_INTERVAL = float(os.getenv('CACHE_METRICS_FLUSH_INTERVAL', 10))
+
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 3600))
+
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', 60))
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 30))
+
+# Use planner estimates for PostgreSQL counts at least this large, 0 disables.
+PAGINATION_ESTIMATE_THRESHOLD = int(os.getenv('PAGINATION_ESTIMATE_THRESHOLD', 0))
+
+USER_RECIPE_SET_CACHE_TIMEOUT = int(os.getenv('USER_RECIPE_SET_CACHE_TIMEOUT', 600))
+
+USER_RECIPE_SET_MAX_SIZE = int(os.getenv('USER_RECIPE_SET_MAX_SIZE', 500))
+
+# Profile requests of staff users sending the header and a sample of all requests.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+
+PROFILING_HEADER = 'X-Profile'
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+PROFILING_DIRECTORY = os.getenv('PROFILING_DIRECTORY', '/tmp/foodgram_profiles')
+
+PROFILING_MAX_BYTES = int(os.getenv('PROFILING_MAX_BYTES', 100 * 1024 * 1024))
+
+# Aggregate executed SQL by fingerprint for the query_report command.
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'False') == 'True'
+
+QUERY_STATS_FLUSH_INTERVAL = float(os.getenv('QUERY_STATS_FLUSH_INTERVAL', 10))
+
+AUTH_TOKEN_CACHE = 'shared'
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', 10))
+
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_SIZE', 1024))
+
+TASKS_RETRY_DELAY = int(os.getenv('TASKS_RETRY_DELAY', 10))
+
+TASKS_MAX_RETRY_DELAY = int(os.getenv('TASKS_MAX_RETRY_DELAY', 3600))
+
+TASKS_LOCK_TIMEOUT = int(os.getenv('TASKS_LOCK_TIMEOUT', 900))
+
+TASKS_POLL_INTERVAL = float(os.getenv('TASKS_POLL_INTERVAL', 1))
+
+# Workers release stale tasks and delete old ones this often, in seconds.
+TASKS_MAINTENANCE_INTERVAL = int(os.getenv('TASKS_MAINTENANCE_INTERVAL', 60))
+
+# Finished tasks are kept for this long, in seconds.
+TASKS_DONE_RETENTION = int(os.getenv('TASKS_DONE_RETENTION', 24 * 3600))
+
+TASKS_FAILED_RETENTION = int(os.getenv('TASKS_FAILED_RETENTION', 30 * 24 * 3600))
+
+# Build the "what can I cook" ingredient index at startup, not on first use.
+INGREDIENT_INDEX_WARMUP = os.getenv('INGREDIENT_INDEX_WARMUP', 'True') == 'True'
+
+# Seconds of recipe changes read again on every sync, covers slow commits.
+INGREDIENT_INDEX_SYNC_OVERLAP = int(os.getenv('INGREDIENT_INDEX_SYNC_OVERLAP', 60))
+
+INGREDIENT_INDEX_MAX_OVERLAY = int(os.getenv('INGREDIENT_INDEX_MAX_OVERLAY', 10000))
+
+WHAT_CAN_I_COOK_MIN_COVERAGE = float(os.getenv('WHAT_CAN_I_COOK_MIN_COVERAGE', 0.5))
+
+WHAT_CAN_I_COOK_MAX_INGREDIENTS = int(os.getenv('WHAT_CAN_I_COOK_MAX_INGREDIENTS', 50))
+
+WHAT_CAN_I_COOK_MAX_RESULTS = int(os.getenv('WHAT_CAN_I_COOK_MAX_RESULTS', 500))
+
+# Rows deleted by one statement when purging hidden users and recipes.
+PURGE_CHUNK_SIZE = int(os.getenv('PURGE_CHUNK_SIZE', 1000))
+
 DJOSER = {
     'HIDE_USERS': False,
     'PERMISSIONS': {
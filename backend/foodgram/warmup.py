@@ -0,0 +1,69 @@
+"""Warm up per-process caches before gunicorn forks its workers."""
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEMPLATES = (
+    'rest_framework/api.html',
+    'admin/index.html',
+    'admin/change_list.html',
+)
+
+
+def get_warmup_host():
+    """Return a host name accepted by ALLOWED_HOSTS for warm-up requests."""
+    for host in settings.ALLOWED_HOSTS:
+        if host and '*' not in host and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def warm_up_catalog():
+    """Run the catalog views once to build serializers and query caches."""
+    from api import views
+
+    factory = RequestFactory(HTTP_HOST=get_warmup_host())
+    for viewset, path in (
+        (views.TagReadOnlyViewSet, '/api/tags/'),
+        (views.IngredientReadOnlyViewSet, '/api/ingredients/'),
+        (views.RecipeViewSet, '/api/recipes/'),
+    ):
+        response = viewset.as_view({'get': 'list'})(factory.get(path))
+        response.render()
+
+
+def warm_up_ingredient_index():
+    """Build the ingredient index so that forked workers share it."""
+    from recipes.ingredient_index import ingredient_index
+
+    if settings.INGREDIENT_INDEX_WARMUP:
+        ingredient_index.build()
+
+
+def warm_up():
+    """
+    Populate URL resolvers, templates, catalog data and the ingredient index.
+
+    Meant to run once in the gunicorn master with preload_app, so that
+    forked workers share the warmed state. Failures (for example an
+    unmigrated database on the first deploy) are logged and ignored.
+    Database connections are closed afterwards because they must not
+    be shared with the workers.
+    """
+    try:
+        resolver = get_resolver()
+        resolver.reverse_dict
+        for name in WARMUP_TEMPLATES:
+            get_template(name)
+        warm_up_catalog()
+        warm_up_ingredient_index()
+    except Exception:
+        logger.warning('Прогрев приложения не удался.', exc_info=True)
+    finally:
+        connections.close_all()
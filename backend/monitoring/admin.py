@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from monitoring.models import QueryFingerprint
+
+
+@admin.register(QueryFingerprint)
+class QueryFingerprintAdmin(admin.ModelAdmin):
+    list_display = ('view', 'sql', 'calls', 'total_time', 'max_time')
+    list_filter = ('view',)
+    search_fields = ('sql',)
+    readonly_fields = (
+        'fingerprint', 'view', 'sql', 'param_types',
+        'calls', 'total_time', 'max_time', 'last_seen',
+    )
@@ -0,0 +1,3 @@
+FINGERPRINT_LENGTH = 40
+MAX_VIEW_LENGTH = 150
+MAX_PARAM_TYPES_LENGTH = 1000
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from monitoring.models import QueryFingerprint
+
+ORDERING = {
+    'total': '-total_time',
+    'max': '-max_time',
+    'calls': '-calls',
+}
+
+
+class Command(BaseCommand):
+    """Print the SQL fingerprints that took the most time."""
+
+    help = (
+        'Выводит самые затратные запросы к базе данных '
+        'по собранной статистике.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Сколько запросов вывести.'
+        )
+        parser.add_argument(
+            '--order', choices=ORDERING, default='total',
+            help='Порядок: по общему времени, максимальному или вызовам.'
+        )
+        parser.add_argument(
+            '--view', help='Только запросы представления, например '
+                           'RecipeViewSet.list.'
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить собранную статистику.'
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = QueryFingerprint.objects.all().delete()
+            self.stdout.write(f'Удалено записей: {deleted}.')
+            return
+
+        fingerprints = QueryFingerprint.objects.order_by(
+            ORDERING[options['order']]
+        )
+
+        if options['view']:
+            fingerprints = fingerprints.filter(view=options['view'])
+
+        for number, item in enumerate(
+            fingerprints[:options['limit']], start=1
+        ):
+            self.stdout.write(
+                f'{number}. {item.view}: {item.calls} вызовов, '
+                f'всего {item.total_time:.1f} мс, '
+                f'в среднем {item.total_time / item.calls:.2f} мс, '
+                f'максимум {item.max_time:.1f} мс'
+            )
+            self.stdout.write(f'   {item.sql}')
+            self.stdout.write(f'   Типы параметров: {item.param_types}')
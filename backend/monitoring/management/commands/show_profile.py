@@ -0,0 +1,51 @@
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.profiling import get_profiles
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+class Command(BaseCommand):
+    """List stored request profiles or print the top functions of one."""
+
+    help = (
+        'Без аргументов выводит сохранённые профили запросов, '
+        'с именем профиля — самые затратные функции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Имя файла профиля.')
+        parser.add_argument(
+            '--sort', choices=SORT_KEYS, default='cumulative',
+            help='Порядок функций.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=30,
+            help='Сколько функций вывести.'
+        )
+
+    def handle(self, *args, **options):
+        directory = settings.PROFILING_DIRECTORY
+
+        if not os.path.isdir(directory):
+            raise CommandError(f'Каталог {directory} не найден.')
+
+        if options['name'] is None:
+            for path, size, _ in reversed(get_profiles(directory)):
+                self.stdout.write(
+                    f'{os.path.basename(path)}  {size / 1024:.0f} КБ'
+                )
+            return
+
+        path = os.path.join(directory, os.path.basename(options['name']))
+
+        if not os.path.isfile(path):
+            raise CommandError(f'Профиль {options["name"]} не найден.')
+
+        stats = pstats.Stats(path, stream=self.stdout._out)
+        stats.strip_dirs().sort_stats(options['sort'])
+        stats.print_stats(options['limit'])
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, verbose_name='Отпечаток')),
+                ('view', models.CharField(max_length=150, verbose_name='Представление')),
+                ('sql', models.TextField(verbose_name='Запрос')),
+                ('example_params', models.TextField(blank=True, verbose_name='Пример параметров')),
+                ('calls', models.BigIntegerField(default=0, verbose_name='Вызовы')),
+                ('total_time', models.FloatField(default=0, verbose_name='Общее время, мс')),
+                ('max_time', models.FloatField(default=0, verbose_name='Максимальное время, мс')),
+                ('last_seen', models.DateTimeField(auto_now=True, verbose_name='Последний вызов')),
+            ],
+            options={
+                'verbose_name': 'отпечаток запроса',
+                'verbose_name_plural': 'Отпечатки запросов',
+                'ordering': ('-total_time',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='queryfingerprint',
+            constraint=models.UniqueConstraint(fields=('fingerprint', 'view'), name='unique_fingerprint_view'),
+        ),
+    ]
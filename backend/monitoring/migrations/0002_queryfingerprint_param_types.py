@@ -0,0 +1,22 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='queryfingerprint',
+            name='example_params',
+        ),
+        migrations.AddField(
+            model_name='queryfingerprint',
+            name='param_types',
+            field=models.TextField(blank=True, verbose_name='Типы параметров'),
+        ),
+    ]
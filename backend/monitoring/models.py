@@ -0,0 +1,34 @@
+from django.db import models
+
+from monitoring import constants
+
+
+class QueryFingerprint(models.Model):
+    """Model representing totals of one normalized SQL statement in a view."""
+
+    fingerprint = models.CharField(
+        'Отпечаток', max_length=constants.FINGERPRINT_LENGTH
+    )
+    view = models.CharField(
+        'Представление', max_length=constants.MAX_VIEW_LENGTH
+    )
+    sql = models.TextField('Запрос')
+    param_types = models.TextField('Типы параметров', blank=True)
+    calls = models.BigIntegerField('Вызовы', default=0)
+    total_time = models.FloatField('Общее время, мс', default=0)
+    max_time = models.FloatField('Максимальное время, мс', default=0)
+    last_seen = models.DateTimeField('Последний вызов', auto_now=True)
+
+    class Meta:
+        ordering = ('-total_time',)
+        verbose_name = 'отпечаток запроса'
+        verbose_name_plural = 'Отпечатки запросов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('fingerprint', 'view'),
+                name='unique_fingerprint_view'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.view}: {self.sql[:50]}'
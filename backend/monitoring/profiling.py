@@ -0,0 +1,138 @@
+"""Request profiling on demand for staff and by random sampling."""
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import APIException
+
+from api.authentication import CachedTokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+PROFILE_EXTENSION = '.prof'
+PROFILE_HEADER = 'X-Profile-Id'
+UNSAFE_PATH_CHARACTERS = re.compile(r'[^\w-]+')
+
+# Only one request at a time can be profiled in a process.
+profiling_lock = threading.Lock()
+
+
+def is_staff_request(request):
+    """Tell if the request carries the token of a staff user."""
+    try:
+        credentials = CachedTokenAuthentication().authenticate(request)
+    except APIException:
+        return False
+
+    return credentials is not None and credentials[0].is_staff
+
+
+def get_profile_name(request, duration):
+    path = UNSAFE_PATH_CHARACTERS.sub('_', request.path_info).strip('_')
+    return (
+        f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-'
+        f'{request.method}-{path[:80]}-{duration * 1000:.0f}ms-'
+        f'{uuid.uuid4().hex[:6]}{PROFILE_EXTENSION}'
+    )
+
+
+def get_profiles(directory):
+    """Return (path, size, mtime) of the stored profiles, oldest first."""
+    profiles = []
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(PROFILE_EXTENSION) and entry.is_file():
+                stat = entry.stat()
+                profiles.append((entry.path, stat.st_size, stat.st_mtime))
+
+    return sorted(profiles, key=lambda profile: profile[2])
+
+
+def prune_profiles(directory, max_bytes):
+    """Delete the oldest profiles until the directory fits into max_bytes."""
+    profiles = get_profiles(directory)
+    total = sum(size for _, size, _ in profiles)
+
+    for path, size, _ in profiles:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class ProfilingMiddleware:
+    """
+    Profile whole requests with cProfile.
+
+    A request is profiled when a staff user sends the PROFILING_HEADER
+    header or when it is picked with PROFILING_SAMPLE_RATE probability.
+    Being the first middleware, the profile covers the other middleware,
+    the view, serializers and rendering. Profiles are written in pstats
+    format to PROFILING_DIRECTORY, which is kept under
+    PROFILING_MAX_BYTES by deleting the oldest ones. Requests that are
+    not profiled only pay for a header lookup.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace(
+            '-', '_'
+        )
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        os.makedirs(settings.PROFILING_DIRECTORY, exist_ok=True)
+
+    def should_profile(self, request):
+        if self.header in request.META:
+            return is_staff_request(request)
+
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        if not profiling_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+        finally:
+            profiling_lock.release()
+
+        name = get_profile_name(request, duration)
+
+        try:
+            profiler.dump_stats(
+                os.path.join(settings.PROFILING_DIRECTORY, name)
+            )
+            prune_profiles(
+                settings.PROFILING_DIRECTORY, settings.PROFILING_MAX_BYTES
+            )
+        except OSError:
+            logger.exception('Не удалось сохранить профиль %s.', name)
+        else:
+            if self.header in request.META:
+                response[PROFILE_HEADER] = name
+
+        return response
@@ -0,0 +1,204 @@
+"""Aggregated statistics of executed SQL statements by fingerprint."""
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from monitoring import constants
+from monitoring.models import QueryFingerprint
+
+logger = logging.getLogger(__name__)
+
+NORMALIZERS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+UNKNOWN_VIEW = '-'
+
+
+def normalize_sql(sql):
+    """Replace literals and placeholders with ? and collapse value lists."""
+    for pattern, replacement in NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_param_types(params):
+    """
+    Return the types of the query parameters.
+
+    The values themselves are never stored: they include token keys,
+    password hashes and other personal data.
+    """
+    if params is None:
+        return ''
+
+    if isinstance(params, dict):
+        params = params.values()
+
+    return ', '.join(type(value).__name__ for value in params)
+
+
+def get_view_name(request):
+    """Return 'ViewSet.action' or the URL name of the view of the request."""
+    match = getattr(request, 'resolver_match', None)
+
+    if match is None:
+        return UNKNOWN_VIEW
+
+    view_class = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+
+    if view_class is not None and action:
+        return f'{view_class.__name__}.{action}'
+
+    return match.view_name or UNKNOWN_VIEW
+
+
+class QueryCollector:
+    """
+    Per-process totals of SQL fingerprints by view.
+
+    Totals are added to QueryFingerprint rows at most once per
+    QUERY_STATS_FLUSH_INTERVAL seconds, so the report covers
+    all worker processes.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def add(self, view, queries):
+        with self.lock:
+            for sql, params, duration in queries:
+                normalized = normalize_sql(sql)
+                key = (
+                    hashlib.sha1(normalized.encode()).hexdigest(), view
+                )
+                item = self.stats.get(key)
+
+                if item is None:
+                    self.stats[key] = [
+                        normalized,
+                        get_param_types(params),
+                        1,
+                        duration,
+                        duration,
+                    ]
+                else:
+                    item[2] += 1
+                    item[3] += duration
+                    item[4] = max(item[4], duration)
+
+            now = time.monotonic()
+
+            if now - self.flushed_at < settings.QUERY_STATS_FLUSH_INTERVAL:
+                return
+
+            stats, self.stats = self.stats, {}
+            self.flushed_at = now
+
+        try:
+            self.flush(stats)
+        except Exception:
+            logger.exception('Не удалось сохранить статистику запросов.')
+
+    @staticmethod
+    def flush(stats):
+        manager = QueryFingerprint.objects.using(DEFAULT_DB_ALIAS)
+
+        for (fingerprint, view), item in stats.items():
+            sql, param_types, calls, total_time, max_time = item
+            totals = {
+                'calls': F('calls') + calls,
+                'total_time': F('total_time') + total_time,
+                'max_time': Greatest('max_time', Value(max_time)),
+                # update() does not fill auto_now fields.
+                'last_seen': timezone.now(),
+            }
+
+            if manager.filter(
+                fingerprint=fingerprint, view=view
+            ).update(**totals):
+                continue
+
+            try:
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    manager.create(
+                        fingerprint=fingerprint,
+                        view=view,
+                        sql=sql,
+                        param_types=param_types[
+                            :constants.MAX_PARAM_TYPES_LENGTH
+                        ],
+                        calls=calls,
+                        total_time=total_time,
+                        max_time=max_time,
+                    )
+            except IntegrityError:
+                manager.filter(
+                    fingerprint=fingerprint, view=view
+                ).update(**totals)
+
+
+collector = QueryCollector()
+
+
+class QueryRecorder:
+    """Database execute wrapper timing the queries of one request."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, params, (time.perf_counter() - started) * 1000)
+            )
+
+
+class QueryStatsMiddleware:
+    """
+    Collect SQL fingerprints of every request with its view and action.
+
+    Enabled with QUERY_STATS_ENABLED; see the query_report command.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_STATS_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(recorder)
+                )
+            response = self.get_response(request)
+
+        if recorder.queries:
+            collector.add(get_view_name(request), recorder.queries)
+
+        return response
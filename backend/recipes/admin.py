@@ -1,7 +1,9 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.safestring import mark_safe
 
 from recipes import models
+from recipes.tasks import update_similar_recipes
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -10,6 +12,7 @@ class RecipeIngredientInline(admin.TabularInline):
     model = models.IngredientInRecipe
     extra = 0
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(models.Tag)
@@ -50,13 +53,29 @@ class RecipeAdmin(admin.ModelAdmin):
         'author__first_name',
         'author__last_name'
     )
-    list_filter = ('tags',)
+    list_filter = ('tags', 'is_hidden')
     inlines = (RecipeIngredientInline,)
     readonly_fields = ('total_favorites', 'ingredients_list')
+    autocomplete_fields = ('author',)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_similar_recipes.delay(recipe_ids=[form.instance.pk])
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            'ingredient_in_recipe__ingredient'
+        ).annotate(
+            favourites_count=Count('favourites')
+        )
 
-    @admin.display(description='Добавлено в избранное')
+    @admin.display(
+        description='Добавлено в избранное', ordering='favourites_count'
+    )
     def total_favorites(self, obj):
-        return obj.favourites.count()
+        return obj.favourites_count
 
     @admin.display(description='Список ингредиентов')
     def ingredients_list(self, obj):
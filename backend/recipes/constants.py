@@ -1,4 +1,18 @@
+from datetime import date
+
 MAX_TEXTFIELD_LENGTH = 200
 MAX_STRING_LENGTH = 20
 MIN_VALUE = 1
 MAX_VALUE = 32767
+TAG_MASK_BITS = 63
+TAG_MASK_ENUMERATION_BITS = 8
+SIMILAR_RECIPES_COUNT = 10
+TRENDING_EPOCH = date(2024, 1, 1)
+TRENDING_HALF_LIFE_DAYS = 7
+TRENDING_FAVOURITE_WEIGHT = 1.0
+TRENDING_SHOPPING_CART_WEIGHT = 0.5
+# Days after the epoch when scores are rebased, far below the float
+# overflow of 2 ** (days / TRENDING_HALF_LIFE_DAYS) after ~7000 days.
+TRENDING_REBASE_DAYS = 3650
+TRENDING_REBASE_LOCK_KEY = 'trending:rebase'
+TRENDING_REBASE_LOCK_TIMEOUT = 3600
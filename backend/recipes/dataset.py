@@ -0,0 +1,384 @@
+"""Streaming NDJSON export and import of the foodgram dataset."""
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from caching.constants import BULK_RECIPES, CATALOG, RECIPES, USERS
+from caching.generations import bump
+from recipes import constants
+from recipes.models import (
+    Favourites,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipes.trending import add_inserted_activity
+from users.constants import MAX_CHARFIELD_LENGTH
+from users.models import Subscriptions
+
+User = get_user_model()
+
+DEFAULT_CHUNK_SIZE = 2000
+FILE_EXTENSION = '.ndjson'
+GZIP_EXTENSION = '.gz'
+
+# Files of the dataset in the order they have to be imported.
+DATASET = (
+    ('tags', Tag, ('id', 'name', 'color', 'slug', 'bit')),
+    ('ingredients', Ingredient, ('id', 'name', 'measurement_unit')),
+    ('users', User, (
+        'id', 'email', 'username', 'first_name', 'last_name', 'password',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+        'is_hidden',
+    )),
+    ('subscriptions', Subscriptions, ('author_id', 'subscriber_id')),
+    ('recipes', Recipe, (
+        'id', 'name', 'image', 'text', 'cooking_time', 'pub_date',
+        'updated_at', 'author_id', 'tags_mask', 'is_hidden',
+    )),
+    ('recipe_tags', Recipe.tags.through, ('recipe_id', 'tag_id')),
+    ('recipe_ingredients', IngredientInRecipe, (
+        'recipe_id', 'ingredient_id', 'amount',
+    )),
+    ('favourites', Favourites, ('user_id', 'recipe_id', 'added_at')),
+    ('shopping_cart', ShoppingCart, ('user_id', 'recipe_id', 'added_at')),
+)
+
+
+class DatasetEncoder(DjangoJSONEncoder):
+    """JSON encoder keeping full microsecond precision of timestamps."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_file(path, mode):
+    """Open an NDJSON file, transparently handling gzip compression."""
+    if path.endswith(GZIP_EXTENSION):
+        return gzip.open(path, f'{mode}t', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def find_file(directory, name):
+    """Return the path of the plain or compressed file, or None."""
+    path = os.path.join(directory, name + FILE_EXTENSION)
+    for candidate in (path, path + GZIP_EXTENSION):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+@contextmanager
+def preserve_auto_dates(*models):
+    """Keep exported auto_now and auto_now_add values during bulk inserts."""
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(
+                field, 'auto_now_add', False
+            ):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def export_dataset(
+    directory, compress=False, chunk_size=DEFAULT_CHUNK_SIZE, progress=None
+):
+    """
+    Write every model of the dataset to its own NDJSON file.
+
+    Rows are streamed with a server-side cursor, so memory does not
+    depend on the size of the tables. Returns the total number of rows.
+    """
+    os.makedirs(directory, exist_ok=True)
+    total = 0
+
+    for name, model, fields in DATASET:
+        started = time.monotonic()
+        path = os.path.join(
+            directory,
+            name + FILE_EXTENSION + (GZIP_EXTENSION if compress else '')
+        )
+        rows = 0
+        with open_file(path, 'w') as file:
+            for values in model.objects.order_by('pk').values_list(
+                *fields
+            ).iterator(chunk_size=chunk_size):
+                file.write(json.dumps(
+                    dict(zip(fields, values)),
+                    cls=DatasetEncoder,
+                    ensure_ascii=False,
+                ))
+                file.write('\n')
+                rows += 1
+        total += rows
+        if progress:
+            progress(name, rows, time.monotonic() - started)
+
+    return total
+
+
+class DatasetImporter:
+    """
+    Load an exported dataset into the current database.
+
+    Tags are matched by slug, ingredients by name and measurement unit
+    and users by email. Other users and all recipes get new IDs shifted
+    past the largest existing ones, so only the small catalogs and the
+    matched users are kept in memory. New users whose username is taken
+    get a numeric suffix. Each batch is committed on its own, so the
+    import holds no long transaction; rows loaded before a failure stay.
+    The ID ranges of new users and recipes are reserved before loading,
+    so rows created meanwhile do not take them. Rows are bulk inserted
+    without signals: favourites and cart items are added to trending
+    with each batch, and the cache generations are bumped at the end.
+    """
+
+    def __init__(
+        self, directory, batch_size=DEFAULT_CHUNK_SIZE, progress=None
+    ):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.progress = progress
+        self.tag_ids = {}
+        self.tag_bits = {}
+        self.ingredient_ids = {}
+        self.user_ids = {}
+        self.user_offset = 0
+        self.recipe_offset = 0
+
+    def run(self):
+        """Import every file found in the directory, returns row count."""
+        total = 0
+
+        with preserve_auto_dates(Recipe, Favourites, ShoppingCart):
+            self.user_offset = self.reserve_ids(User, 'users')
+            self.recipe_offset = self.reserve_ids(Recipe, 'recipes')
+
+            try:
+                for name, model, fields in DATASET:
+                    path = find_file(self.directory, name)
+                    if path is None:
+                        continue
+                    started = time.monotonic()
+                    rows = 0
+                    load = getattr(self, f'load_{name}')
+                    for batch in self.read_batches(path):
+                        with transaction.atomic():
+                            load(batch)
+                        rows += len(batch)
+                    total += rows
+                    if self.progress:
+                        self.progress(name, rows, time.monotonic() - started)
+            finally:
+                bump(BULK_RECIPES, CATALOG, RECIPES, USERS)
+
+        return total
+
+    def reserve_ids(self, model, name):
+        """
+        Return the offset of the IDs of the file.
+
+        On PostgreSQL the ID sequence is moved past the shifted IDs
+        of the file while the table is locked for inserts, so rows
+        created during the import do not take them.
+        """
+        path = find_file(self.directory, name)
+
+        if path is None or connection.vendor != 'postgresql':
+            return model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+        last_id = 0
+
+        for batch in self.read_batches(path):
+            last_id = max(last_id, *(row['id'] for row in batch))
+
+        table = model._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {connection.ops.quote_name(table)} '
+                'IN SHARE ROW EXCLUSIVE MODE'
+            )
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [table]
+            )
+            offset = max(
+                cursor.fetchone()[0],
+                model.objects.aggregate(max_id=Max('id'))['max_id'] or 0,
+            )
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)",
+                [table, offset + last_id],
+            )
+
+        return offset
+
+    def read_batches(self, path):
+        with open_file(path, 'r') as file:
+            rows = (json.loads(line) for line in file if line.strip())
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    return
+                yield batch
+
+    def get_user_id(self, old_id):
+        return self.user_ids.get(old_id, old_id + self.user_offset)
+
+    def get_recipe_id(self, old_id):
+        return old_id + self.recipe_offset
+
+    def get_tags_mask(self, old_mask):
+        return sum(
+            1 << self.tag_bits[bit]
+            for bit in range(constants.TAG_MASK_BITS)
+            if old_mask >> bit & 1
+        )
+
+    def load_tags(self, batch):
+        existing = Tag.objects.in_bulk(
+            [row['slug'] for row in batch], field_name='slug'
+        )
+        for row in batch:
+            tag = existing.get(row['slug'])
+            if tag is None:
+                tag = Tag.objects.create(
+                    name=row['name'], color=row['color'], slug=row['slug']
+                )
+            self.tag_ids[row['id']] = tag.id
+            self.tag_bits[row['bit']] = tag.bit
+
+    def load_ingredients(self, batch):
+        keys = {(row['name'], row['measurement_unit']) for row in batch}
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in keys
+            ),
+            ignore_conflicts=True,
+        )
+        ids = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+        for row in batch:
+            self.ingredient_ids[row['id']] = ids[
+                (row['name'], row['measurement_unit'])
+            ]
+
+    @staticmethod
+    def get_free_username(username, taken):
+        """Return the username or the first free one with a suffix."""
+        candidate = username
+        number = 0
+        while candidate in taken:
+            number += 1
+            suffix = f'_{number}'
+            candidate = username[:MAX_CHARFIELD_LENGTH - len(suffix)] + suffix
+            if User.objects.filter(username=candidate).exists():
+                taken.add(candidate)
+        taken.add(candidate)
+        return candidate
+
+    def load_users(self, batch):
+        existing = dict(User.objects.filter(
+            email__in=[row['email'] for row in batch]
+        ).values_list('email', 'id'))
+        rows = []
+        for row in batch:
+            if row['email'] in existing:
+                self.user_ids[row['id']] = existing[row['email']]
+            else:
+                rows.append(row)
+        taken = set(User.objects.filter(
+            username__in=[row['username'] for row in rows]
+        ).values_list('username', flat=True))
+        User.objects.bulk_create(
+            User(**dict(
+                row,
+                id=row['id'] + self.user_offset,
+                username=self.get_free_username(row['username'], taken),
+            ))
+            for row in rows
+        )
+
+    def load_subscriptions(self, batch):
+        Subscriptions.objects.bulk_create(
+            (
+                Subscriptions(
+                    author_id=self.get_user_id(row['author_id']),
+                    subscriber_id=self.get_user_id(row['subscriber_id']),
+                )
+                for row in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+    def load_recipes(self, batch):
+        Recipe.objects.bulk_create(
+            Recipe(**dict(
+                row,
+                id=self.get_recipe_id(row['id']),
+                author_id=self.get_user_id(row['author_id']),
+                tags_mask=self.get_tags_mask(row['tags_mask']),
+            ))
+            for row in batch
+        )
+
+    def load_recipe_tags(self, batch):
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe_id=self.get_recipe_id(row['recipe_id']),
+                tag_id=self.tag_ids[row['tag_id']],
+            )
+            for row in batch
+        )
+
+    def load_recipe_ingredients(self, batch):
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=self.get_recipe_id(row['recipe_id']),
+                ingredient_id=self.ingredient_ids[row['ingredient_id']],
+                amount=row['amount'],
+            )
+            for row in batch
+        )
+
+    def load_recipe_users(self, model, batch):
+        add_inserted_activity(model.objects.bulk_create(
+            model(
+                user_id=self.get_user_id(row['user_id']),
+                recipe_id=self.get_recipe_id(row['recipe_id']),
+                added_at=parse_datetime(row['added_at']),
+            )
+            for row in batch
+        ))
+
+    def load_favourites(self, batch):
+        self.load_recipe_users(Favourites, batch)
+
+    def load_shopping_cart(self, batch):
+        self.load_recipe_users(ShoppingCart, batch)
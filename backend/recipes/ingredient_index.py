@@ -0,0 +1,278 @@
+"""In-memory inverted index of recipes by ingredient."""
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.utils import timezone
+
+from caching.constants import BULK_RECIPES, RECIPES
+from caching.generations import generations
+from recipes.models import IngredientInRecipe, Recipe
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 100_000
+SYNC_CHUNK_SIZE = 10_000
+
+
+def load_pairs():
+    """Return (recipe_ids, ingredient_ids) arrays of all visible recipes."""
+    pairs = IngredientInRecipe.objects.using(DEFAULT_DB_ALIAS).filter(
+        recipe__is_hidden=False
+    ).order_by().values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator(chunk_size=READ_CHUNK_SIZE)
+    flat = np.fromiter(
+        (value for pair in pairs for value in pair), dtype=np.int64
+    )
+    return flat[0::2], flat[1::2]
+
+
+class IngredientPostings:
+    """
+    Immutable inverted index built from (recipe, ingredient) pairs.
+
+    Recipes get dense positions in the sorted recipe_ids array.
+    The positions of the recipes containing the ingredient of a column
+    are positions[offsets[column]:offsets[column + 1]], sizes holds
+    the number of ingredients of every recipe.
+    """
+
+    def __init__(self, recipe_column, ingredient_column):
+        self.recipe_ids, recipe_positions = np.unique(
+            recipe_column, return_inverse=True
+        )
+        ingredient_ids, columns = np.unique(
+            ingredient_column, return_inverse=True
+        )
+        self.columns = dict(zip(
+            ingredient_ids.tolist(), range(len(ingredient_ids))
+        ))
+        self.positions = recipe_positions[
+            np.argsort(columns, kind='stable')
+        ].astype(np.int32)
+        self.offsets = np.r_[0, np.cumsum(
+            np.bincount(columns, minlength=len(ingredient_ids))
+        )]
+        self.sizes = np.bincount(
+            recipe_positions, minlength=len(self.recipe_ids)
+        ).astype(np.int32)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.recipe_ids, self.positions, self.offsets, self.sizes
+        ))
+
+    def find(self, recipe_id):
+        """Return the position of the recipe or None."""
+        position = np.searchsorted(self.recipe_ids, recipe_id)
+
+        if (
+            position < len(self.recipe_ids)
+            and self.recipe_ids[position] == recipe_id
+        ):
+            return position
+
+        return None
+
+    def count(self, ingredient_ids):
+        """Return the number of the ingredients found in every recipe."""
+        columns = [
+            self.columns[pk] for pk in ingredient_ids if pk in self.columns
+        ]
+
+        if not columns:
+            return np.zeros(len(self.recipe_ids), dtype=np.int64)
+
+        return np.bincount(
+            np.concatenate([
+                self.positions[self.offsets[column]:self.offsets[column + 1]]
+                for column in columns
+            ]),
+            minlength=len(self.recipe_ids),
+        )
+
+
+class IngredientIndex:
+    """
+    Recipes by ingredient, kept in memory of every worker process.
+
+    The postings are built from the database once, at warm-up or on
+    the first search. Recipes changed afterwards are read again when
+    the recipes cache generation changes: their postings are masked
+    out and the current ingredient sets are kept in a small overlay.
+    Once the overlay grows past INGREDIENT_INDEX_MAX_OVERLAY or the bulk
+    recipes generation changes, the postings are rebuilt in a background
+    thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.postings = None
+        self.alive = None
+        self.overlay = {}
+        self.synced_at = None
+        self.generation = None
+        self.bulk_generation = None
+        self.rebuilding = False
+
+    def set_postings(self, postings, synced_at, bulk_generation=None):
+        with self.lock:
+            self.postings = postings
+            self.alive = np.ones(len(postings.recipe_ids), dtype=bool)
+            self.overlay = {}
+            self.synced_at = synced_at
+            self.bulk_generation = bulk_generation
+            # Changes made while the postings were loaded are read
+            # by the next sync.
+            self.generation = None
+
+    def build(self):
+        """Load the postings of all visible recipes from the database."""
+        started = timezone.now()
+        bulk_generation = generations.get(BULK_RECIPES)
+        self.set_postings(
+            IngredientPostings(*load_pairs()), started, bulk_generation
+        )
+
+    def rebuild(self):
+        try:
+            with self.build_lock:
+                self.build()
+        except Exception:
+            logger.exception('Не удалось перестроить индекс ингредиентов.')
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def rebuild_in_background(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+
+        threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def apply(self, recipe_id, ingredient_ids):
+        """Replace the ingredients of a recipe, None removes the recipe."""
+        position = self.postings.find(recipe_id)
+
+        if position is not None:
+            self.alive[position] = False
+
+        if ingredient_ids:
+            self.overlay[recipe_id] = frozenset(ingredient_ids)
+        else:
+            self.overlay.pop(recipe_id, None)
+
+    @staticmethod
+    def get_changed_recipes(since):
+        """Return (id, is_hidden) of recipes changed since the time."""
+        return Recipe.objects.using(DEFAULT_DB_ALIAS).filter(
+            updated_at__gte=since
+        ).order_by().values_list('id', 'is_hidden')
+
+    def sync(self):
+        """Apply recipes changed since the last sync, if there are any."""
+        if generations.get(BULK_RECIPES) != self.bulk_generation:
+            self.rebuild_in_background()
+
+        generation = generations.get(RECIPES)
+
+        if generation == self.generation or not self.sync_lock.acquire(
+            blocking=False
+        ):
+            return
+
+        try:
+            started = timezone.now()
+            since = self.synced_at - timedelta(
+                seconds=settings.INGREDIENT_INDEX_SYNC_OVERLAP
+            )
+            changed = dict(self.get_changed_recipes(since))
+            visible = [
+                pk for pk, is_hidden in changed.items() if not is_hidden
+            ]
+            ingredients = defaultdict(set)
+
+            for start in range(0, len(visible), SYNC_CHUNK_SIZE):
+                for recipe_id, ingredient_id in (
+                    IngredientInRecipe.objects.using(DEFAULT_DB_ALIAS).filter(
+                        recipe_id__in=visible[start:start + SYNC_CHUNK_SIZE]
+                    ).values_list('recipe_id', 'ingredient_id')
+                ):
+                    ingredients[recipe_id].add(ingredient_id)
+
+            with self.lock:
+                for recipe_id in changed:
+                    self.apply(recipe_id, ingredients.get(recipe_id))
+                self.generation = generation
+                self.synced_at = started
+                overflow = (
+                    len(self.overlay) > settings.INGREDIENT_INDEX_MAX_OVERLAY
+                )
+        finally:
+            self.sync_lock.release()
+
+        if overflow:
+            self.rebuild_in_background()
+
+    def search(self, ingredient_ids, min_coverage, limit):
+        """Return the best recipes for the ingredients, see rank()."""
+        if self.postings is None:
+            with self.build_lock:
+                if self.postings is None:
+                    self.build()
+
+        self.sync()
+        return self.rank(ingredient_ids, min_coverage, limit)
+
+    def rank(self, ingredient_ids, min_coverage, limit):
+        """
+        Rank recipes by the share of their ingredients that are given.
+
+        Returns up to limit (recipe_id, matched, total) tuples with
+        matched / total of at least min_coverage, best coverage first,
+        then more matched and fewer total ingredients.
+        """
+        query = frozenset(ingredient_ids)
+
+        with self.lock:
+            postings = self.postings
+            counts = postings.count(query)
+            positions = np.flatnonzero(
+                (counts > 0)
+                & self.alive
+                & (counts / postings.sizes >= min_coverage)
+            )
+            extra = [
+                (recipe_id, matched, len(ingredients))
+                for recipe_id, ingredients in self.overlay.items()
+                for matched in (len(ingredients & query),)
+                if matched and matched / len(ingredients) >= min_coverage
+            ]
+
+        extra = np.array(extra, dtype=np.int64).reshape(-1, 3)
+        recipe_ids = np.concatenate(
+            (postings.recipe_ids[positions], extra[:, 0])
+        )
+        matched = np.concatenate((counts[positions], extra[:, 1]))
+        totals = np.concatenate((postings.sizes[positions], extra[:, 2]))
+        coverage = matched / totals
+        order = np.lexsort((totals, -matched, -coverage))[:limit]
+
+        return list(zip(
+            recipe_ids[order].tolist(),
+            matched[order].tolist(),
+            totals[order].tolist(),
+        ))
+
+
+ingredient_index = IngredientIndex()
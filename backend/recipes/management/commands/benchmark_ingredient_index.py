@@ -0,0 +1,121 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.ingredient_index import IngredientIndex, IngredientPostings
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the ingredient index on a generated catalog.
+
+    Recipes get a random number of ingredients drawn from a Zipf-like
+    distribution, so common ingredients like salt have long postings.
+    The database is not used.
+    """
+
+    help = (
+        'Измеряет построение индекса ингредиентов и поиск рецептов '
+        'по ингредиентам на сгенерированных данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--min-size', type=int, default=3,
+            help='Наименьшее число ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--max-size', type=int, default=15,
+            help='Наибольшее число ингредиентов в рецепте.'
+        )
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument(
+            '--query-size', type=int, default=8,
+            help='Число ингредиентов в запросе.'
+        )
+        parser.add_argument('--min-coverage', type=float, default=0.5)
+        parser.add_argument(
+            '--updates', type=int, default=5000,
+            help='Число изменённых рецептов в оверлее.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        weights = 1 / np.arange(1, options['ingredients'] + 1) ** 0.9
+        weights /= weights.sum()
+
+        started = time.perf_counter()
+        recipe_column, ingredient_column = self.generate(rng, weights, options)
+        self.stdout.write(
+            f'Сгенерировано пар: {len(recipe_column)} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+
+        started = time.perf_counter()
+        postings = IngredientPostings(recipe_column, ingredient_column)
+        self.stdout.write(
+            f'Построение: {time.perf_counter() - started:.2f} с, '
+            f'память {postings.nbytes / 2 ** 20:.0f} МБ'
+        )
+
+        index = IngredientIndex()
+        index.set_postings(postings, timezone.now())
+        queries = [
+            rng.choice(
+                options['ingredients'], options['query_size'],
+                replace=False, p=weights
+            ).tolist()
+            for _ in range(options['queries'])
+        ]
+        self.report('Поиск', index, queries, options)
+
+        started = time.perf_counter()
+        for recipe_id in rng.choice(
+            postings.recipe_ids, options['updates'], replace=False
+        ).tolist():
+            index.apply(recipe_id, rng.choice(
+                options['ingredients'], options['min_size'], replace=False,
+                p=weights
+            ).tolist())
+        self.stdout.write(
+            f'Изменения: {options["updates"]} за '
+            f'{(time.perf_counter() - started) * 1000:.0f} мс'
+        )
+        self.report('Поиск с оверлеем', index, queries, options)
+
+    @staticmethod
+    def generate(rng, weights, options):
+        sizes = rng.integers(
+            options['min_size'], options['max_size'] + 1, options['recipes']
+        )
+        recipe_column = np.repeat(
+            np.arange(1, options['recipes'] + 1, dtype=np.int64), sizes
+        )
+        ingredient_column = rng.choice(
+            len(weights), len(recipe_column), p=weights
+        ).astype(np.int64)
+        # A recipe lists an ingredient once.
+        pairs = np.unique(
+            recipe_column * len(weights) + ingredient_column
+        )
+        return pairs // len(weights), pairs % len(weights)
+
+    def report(self, title, index, queries, options):
+        timings = []
+        found = 0
+
+        for query in queries:
+            started = time.perf_counter()
+            found += len(index.rank(query, options['min_coverage'], 500))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: p50 {np.percentile(timings, 50):.1f} мс, '
+            f'p99 {np.percentile(timings, 99):.1f} мс, '
+            f'в среднем найдено {found / len(queries):.0f}'
+        ))
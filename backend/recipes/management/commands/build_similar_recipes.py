@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import constants
+from recipes.similarity import (
+    DEFAULT_MAX_INGREDIENT_SHARE,
+    DEFAULT_MAX_PAIRS,
+    METRICS,
+    build_similar_recipes,
+)
+
+
+class Command(BaseCommand):
+    """Custom management command to precompute similar recipes."""
+
+    help = 'Пересчитывает похожие рецепты по ингредиентам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipe',
+            type=int,
+            action='append',
+            dest='recipe_ids',
+            help='Пересчитать только указанные рецепты.'
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=constants.SIMILAR_RECIPES_COUNT
+        )
+        parser.add_argument('--metric', choices=METRICS, default='jaccard')
+        parser.add_argument(
+            '--max-pairs',
+            type=int,
+            default=DEFAULT_MAX_PAIRS,
+            help='Предел пар-кандидатов в одном пакете (ограничивает память).'
+        )
+        parser.add_argument(
+            '--max-ingredient-share',
+            type=float,
+            default=DEFAULT_MAX_INGREDIENT_SHARE,
+            help='Не учитывать ингредиенты, входящие в большую долю рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        processed = build_similar_recipes(
+            recipe_ids=options['recipe_ids'],
+            top_k=options['top_k'],
+            metric=options['metric'],
+            max_pairs=options['max_pairs'],
+            max_ingredient_share=options['max_ingredient_share'],
+            progress=self.report_progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed} '
+            f'за {time.monotonic() - started:.1f} с.'
+        ))
+
+    def report_progress(self, processed, total):
+        self.stdout.write(f'{processed}/{total}')
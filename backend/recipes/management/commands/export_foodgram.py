@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.dataset import DEFAULT_CHUNK_SIZE, export_dataset
+
+
+class Command(BaseCommand):
+    """Custom management command to export the dataset to NDJSON files."""
+
+    help = (
+        'Выгружает теги, ингредиенты, пользователей, рецепты, избранное, '
+        'списки покупок и подписки в NDJSON-файлы (файлы изображений '
+        'не копируются).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов.')
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать файлы gzip.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = export_dataset(
+            options['directory'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+            progress=self.report_progress,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {rows} за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-6):.0f} строк/с).'
+        ))
+
+    def report_progress(self, name, rows, elapsed):
+        self.stdout.write(
+            f'{name}: {rows} ({rows / max(elapsed, 1e-6):.0f} строк/с)'
+        )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from recipes.dataset import DEFAULT_CHUNK_SIZE, DatasetImporter
+
+
+class Command(BaseCommand):
+    """Custom management command to import the dataset from NDJSON files."""
+
+    help = (
+        'Загружает данные, выгруженные export_foodgram. Теги сопоставляются '
+        'по слагу, ингредиенты по названию и единицам измерения, '
+        'пользователи по почте; остальные записи получают новые ID.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами.')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            rows = DatasetImporter(
+                options['directory'],
+                batch_size=options['batch_size'],
+                progress=self.report_progress,
+            ).run()
+        except (IntegrityError, KeyError) as exc:
+            raise CommandError(
+                f'Не удалось загрузить данные: {exc!r}. '
+                'Пакеты, загруженные до ошибки, сохранены.'
+            )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {rows} за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-6):.0f} строк/с).'
+        ))
+
+    def report_progress(self, name, rows, elapsed):
+        self.stdout.write(
+            f'{name}: {rows} ({rows / max(elapsed, 1e-6):.0f} строк/с)'
+        )
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from foodgram.purge import purge
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Custom management command to delete all hidden users and recipes."""
+
+    help = (
+        'Удаляет из базы скрытых пользователей и рецепты вместе со '
+        'связанными записями и изображениями, частями по --chunk-size строк.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.PURGE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = 0
+
+        for model in (get_user_model(), Recipe):
+            ids = model.objects.filter(is_hidden=True).values_list(
+                'pk', flat=True
+            )
+            rows += purge(
+                model,
+                ids,
+                self.report_progress,
+                options['chunk_size'],
+                bulk=True,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено строк: {rows} за {time.monotonic() - started:.1f} с.'
+        ))
+
+    def report_progress(self, label, rows):
+        self.stdout.write(f'{label}: {rows}')
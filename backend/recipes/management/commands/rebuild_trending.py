@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import rebuild_trending
+
+
+class Command(BaseCommand):
+    """Custom management command to rebuild recipe trending scores."""
+
+    help = 'Пересчитывает дневную активность и популярность рецептов.'
+
+    def handle(self, *args, **options):
+        recipes = rebuild_trending()
+        self.stdout.write(
+            self.style.SUCCESS(f'Популярность пересчитана: {recipes}.')
+        )
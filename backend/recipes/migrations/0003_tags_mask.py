@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+def fill_tags_masks(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+
+    for bit, tag in enumerate(Tag.objects.order_by('pk')):
+        tag.bit = bit
+        tag.save(update_fields=('bit',))
+
+    for recipe in Recipe.objects.prefetch_related('tags').iterator():
+        recipe.tags_mask = sum(1 << tag.bit for tag in recipe.tags.all())
+        recipe.save(update_fields=('tags_mask',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Бит в маске тегов'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, verbose_name='Бит в маске тегов'),
+        ),
+    ]
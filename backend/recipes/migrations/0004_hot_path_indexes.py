@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_tags_mask'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favourites',
+            index=models.Index(fields=['user', 'recipe'], name='recipes_favourites_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', 'recipe'], name='recipes_shoppingcart_user_idx'),
+        ),
+    ]
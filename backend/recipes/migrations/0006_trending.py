@@ -0,0 +1,59 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('favourites', models.PositiveIntegerField(default=0, verbose_name='В избранном')),
+                ('shopping_cart', models.PositiveIntegerField(default=0, verbose_name='В списках покупок')),
+            ],
+            options={
+                'verbose_name': 'активность рецепта',
+                'verbose_name_plural': 'Активность рецептов',
+                'ordering': ('recipe', '-day'),
+            },
+        ),
+        migrations.AddField(
+            model_name='favourites',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Добавлено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Добавлено'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='recipeactivity',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeactivity',
+            constraint=models.UniqueConstraint(fields=('recipe', 'day'), name='unique_recipe_day'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:01
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменено'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыт'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+INDEX_NAME = 'recipes_ingredient_name_upper_idx'
+
+
+def create_index(apps, schema_editor):
+    # name__istartswith is UPPER("name"::text) LIKE UPPER(%s) on PostgreSQL,
+    # a pattern operator class lets it use the index in any locale.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {INDEX_NAME} ON recipes_ingredient '
+            '(UPPER(name) text_pattern_ops)'
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_is_hidden'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_ingredient_name_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at'], name='recipe_updated_at_idx'),
+        ),
+    ]
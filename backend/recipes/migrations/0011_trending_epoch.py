@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:04
+
+from django.db import migrations, models
+
+from recipes.trending import rebuild_trending
+
+
+def fill_trending(apps, schema_editor):
+    # Favourites and cart items added before 0006 were never counted,
+    # removing them would subtract contributions that were not added.
+    rebuild_trending(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+            ],
+            options={
+                'verbose_name': 'эпоха популярности',
+                'verbose_name_plural': 'Эпохи популярности',
+            },
+        ),
+        migrations.RunPython(fill_trending, migrations.RunPython.noop),
+    ]
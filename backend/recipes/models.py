@@ -1,7 +1,9 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from recipes import constants
 
@@ -20,6 +22,11 @@ class Tag(models.Model):
         unique=True,
         max_length=constants.MAX_TEXTFIELD_LENGTH,
     )
+    bit = models.PositiveSmallIntegerField(
+        'Бит в маске тегов',
+        unique=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('name',)
@@ -29,6 +36,29 @@ class Tag(models.Model):
     def __str__(self) -> str:
         return self.name[:constants.MAX_STRING_LENGTH]
 
+    @property
+    def mask(self) -> int:
+        """Bit of this tag in Recipe.tags_mask."""
+        return 1 << self.bit
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = self.get_free_bit()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def get_free_bit(cls) -> int:
+        """Return the lowest bit of the tag mask not taken by any tag."""
+        taken = set(cls.objects.values_list('bit', flat=True))
+
+        for bit in range(constants.TAG_MASK_BITS):
+            if bit not in taken:
+                return bit
+
+        raise ValidationError(
+            f'Нельзя создать больше {constants.TAG_MASK_BITS} тегов.'
+        )
+
 
 class Ingredient(models.Model):
     """Model representing an ingredient."""
@@ -88,6 +118,7 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Опубликовано',
     )
+    updated_at = models.DateTimeField('Изменено', auto_now=True)
     author = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
@@ -104,15 +135,55 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Теги'
     )
+    tags_mask = models.BigIntegerField(
+        'Маска тегов',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        'Популярность',
+        default=0,
+        editable=False,
+    )
+    is_hidden = models.BooleanField('Скрыт', default=False)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date',),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-pub_date'),
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=('updated_at',),
+                name='recipe_updated_at_idx'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name[:constants.MAX_STRING_LENGTH]
 
+    def update_tags_mask(self):
+        """Recalculate tags_mask from the current tags of the recipe."""
+        self.tags_mask = sum(
+            1 << bit for bit in self.tags.values_list('bit', flat=True)
+        )
+        self.updated_at = timezone.now()
+        Recipe.objects.filter(pk=self.pk).update(
+            tags_mask=self.tags_mask, updated_at=self.updated_at
+        )
+
 
 class IngredientInRecipe(models.Model):
     """Model representing an ingredient in a recipe."""
@@ -177,6 +248,7 @@ class BaseRecipeUser(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
     )
+    added_at = models.DateTimeField('Добавлено', auto_now_add=True)
 
     class Meta:
         abstract = True
@@ -187,6 +259,12 @@ class BaseRecipeUser(models.Model):
                 name='%(app_label)s_%(class)s_unique_recipe_user'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'recipe'),
+                name='%(app_label)s_%(class)s_user_idx'
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.recipe} - {self.user}'
@@ -208,3 +286,84 @@ class ShoppingCart(BaseRecipeUser):
         default_related_name = 'shopping_cart'
         verbose_name = 'список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class RecipeActivity(models.Model):
+    """Model representing daily favourite and cart additions of a recipe."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт',
+    )
+    day = models.DateField('День')
+    favourites = models.PositiveIntegerField('В избранном', default=0)
+    shopping_cart = models.PositiveIntegerField(
+        'В списках покупок', default=0
+    )
+
+    class Meta:
+        ordering = ('recipe', '-day')
+        verbose_name = 'активность рецепта'
+        verbose_name_plural = 'Активность рецептов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'day'),
+                name='unique_recipe_day'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.recipe} - {self.day}'
+
+
+class TrendingEpoch(models.Model):
+    """Model storing the day trending scores are relative to."""
+
+    day = models.DateField('День')
+
+    class Meta:
+        verbose_name = 'эпоха популярности'
+        verbose_name_plural = 'Эпохи популярности'
+
+    def __str__(self) -> str:
+        return str(self.day)
+
+
+class SimilarRecipe(models.Model):
+    """Model representing a precomputed similar recipe."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_recipe_similar'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.recipe} ~ {self.similar}'
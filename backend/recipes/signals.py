@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from foodgram.purge import pre_purge
+from recipes.constants import (
+    TRENDING_REBASE_LOCK_KEY, TRENDING_REBASE_LOCK_TIMEOUT
+)
+from recipes.models import (
+    Favourites, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+from recipes.tasks import reconcile_trending
+from recipes.trending import record_activity, subtract_activity
+
+
+def touch_recipes(recipes, **changes):
+    """Bump updated_at of the recipes, applying the other changes too."""
+    recipes.update(updated_at=timezone.now(), **changes)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Recipe.tags_mask in sync with the recipe tags."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.update_tags_mask()
+        return
+
+    if action == 'post_add':
+        touch_recipes(
+            Recipe.objects.filter(pk__in=pk_set),
+            tags_mask=F('tags_mask').bitor(instance.mask)
+        )
+    elif action == 'post_remove':
+        touch_recipes(
+            Recipe.objects.filter(pk__in=pk_set),
+            tags_mask=F('tags_mask').bitand(~instance.mask)
+        )
+    elif action == 'pre_clear':
+        remove_tag_from_masks(Tag, instance)
+
+
+@receiver(pre_delete, sender=Tag)
+def remove_tag_from_masks(sender, instance, **kwargs):
+    """Drop the bit of a deleted tag from the masks of its recipes."""
+    touch_recipes(
+        Recipe.objects.filter(tags=instance),
+        tags_mask=F('tags_mask').bitand(~instance.mask)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_ingredients(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Bump recipe versions when ingredients are added or removed."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+    else:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def touch_ingredient_recipe(sender, instance, **kwargs):
+    """Bump the recipe version when one of its ingredient rows changes."""
+    touch_recipes(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_catalog_recipes(sender, instance, created, **kwargs):
+    """Bump versions of recipes showing a renamed tag or ingredient."""
+    if created:
+        return
+
+    if sender is Tag:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+    else:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=get_user_model())
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    """Bump versions of recipes showing the changed author."""
+    if created or update_fields and set(update_fields) == {'last_login'}:
+        return
+
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+def schedule_trending_rebase():
+    """Queue one rebuild of the trending scores for all processes."""
+    if caches[settings.SHARED_CACHE].add(
+        TRENDING_REBASE_LOCK_KEY, True, TRENDING_REBASE_LOCK_TIMEOUT
+    ):
+        reconcile_trending.delay()
+
+
+@receiver(post_save, sender=Favourites)
+@receiver(post_save, sender=ShoppingCart)
+def add_activity(sender, instance, created, **kwargs):
+    """Count a new favourite or cart item towards the trending score."""
+    if created and record_activity(instance, 1):
+        schedule_trending_rebase()
+
+
+@receiver(post_delete, sender=Favourites)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_activity(sender, instance, **kwargs):
+    """Remove a deleted favourite or cart item from the trending score."""
+    if record_activity(instance, -1):
+        schedule_trending_rebase()
+
+
+@receiver(pre_purge, sender=Favourites)
+@receiver(pre_purge, sender=ShoppingCart)
+def subtract_purged_activity(sender, pks, **kwargs):
+    """Remove purged favourites and cart items from the trending scores."""
+    subtract_activity(sender, pks)
@@ -0,0 +1,411 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from scipy import sparse
+
+from recipes import constants
+from recipes.models import IngredientInRecipe, Recipe, SimilarRecipe
+
+METRICS = ('jaccard', 'cosine')
+READ_CHUNK_SIZE = 100_000
+ID_CHUNK_SIZE = 10_000
+WRITE_BATCH_SIZE = 10_000
+DEFAULT_MAX_PAIRS = 5_000_000
+DEFAULT_MAX_INGREDIENT_SHARE = 0.05
+MIN_COMMON_INGREDIENT_RECIPES = 1000
+
+
+def load_recipe_ingredients(recipe_ids=None):
+    """
+    Return (recipe_ids, ingredient_ids) arrays of visible recipe rows.
+
+    Reads the rows of all visible recipes or of the given ones.
+    """
+    rows = IngredientInRecipe.objects.filter(
+        recipe__is_hidden=False
+    ).order_by()
+
+    if recipe_ids is None:
+        chunks = [rows]
+    else:
+        recipe_ids = list(recipe_ids)
+        chunks = [
+            rows.filter(
+                recipe_id__in=recipe_ids[start:start + ID_CHUNK_SIZE]
+            )
+            for start in range(0, len(recipe_ids), ID_CHUNK_SIZE)
+        ]
+
+    flat = np.fromiter(
+        (
+            value
+            for chunk in chunks
+            for pair in chunk.values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(chunk_size=READ_CHUNK_SIZE)
+            for value in pair
+        ),
+        dtype=np.int64,
+    )
+    return flat[0::2], flat[1::2]
+
+
+def get_max_frequency(recipes_count, max_ingredient_share):
+    """Return the number of recipes above which an ingredient is common."""
+    return max(
+        max_ingredient_share * recipes_count, MIN_COMMON_INGREDIENT_RECIPES
+    )
+
+
+def make_matrix(recipe_column, ingredient_column):
+    """
+    Build the binary recipe x ingredient matrix of the rows.
+
+    Returns (matrix, recipe_ids) where row i belongs to recipe_ids[i].
+    """
+    recipe_ids, rows = np.unique(recipe_column, return_inverse=True)
+    ingredient_ids, columns = np.unique(
+        ingredient_column, return_inverse=True
+    )
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(recipe_ids), len(ingredient_ids)),
+    )
+    return matrix, recipe_ids
+
+
+def build_matrix(max_ingredient_share=DEFAULT_MAX_INGREDIENT_SHARE):
+    """
+    Build the binary recipe x ingredient matrix of all visible recipes.
+
+    Ingredients found in more than max_ingredient_share of recipes
+    (and in more than MIN_COMMON_INGREDIENT_RECIPES recipes), like salt,
+    carry little information and would make every recipe a candidate
+    for every other, so they are left out.
+
+    Returns (matrix, recipe_ids) where row i belongs to recipe_ids[i].
+    """
+    matrix, recipe_ids = make_matrix(*load_recipe_ingredients())
+    frequencies = np.asarray(matrix.sum(axis=0)).ravel()
+    matrix = matrix[:, frequencies <= get_max_frequency(
+        len(recipe_ids), max_ingredient_share
+    )]
+
+    return matrix, recipe_ids
+
+
+def get_common_ingredients(ingredient_ids, max_ingredient_share):
+    """Return the given ingredients that build_matrix() leaves out."""
+    max_frequency = get_max_frequency(
+        Recipe.objects.filter(ingredients__isnull=False, is_hidden=False)
+        .order_by().distinct().count(),
+        max_ingredient_share,
+    )
+    ingredient_ids = [int(pk) for pk in ingredient_ids]
+    common = []
+
+    for start in range(0, len(ingredient_ids), ID_CHUNK_SIZE):
+        common.extend(
+            IngredientInRecipe.objects.filter(
+                ingredient_id__in=ingredient_ids[start:start + ID_CHUNK_SIZE],
+                recipe__is_hidden=False,
+            ).order_by().values('ingredient_id').annotate(
+                recipes=Count('id')
+            ).filter(recipes__gt=max_frequency).values_list(
+                'ingredient_id', flat=True
+            )
+        )
+
+    return np.array(common, dtype=np.int64)
+
+
+def build_local_matrix(recipe_ids, max_ingredient_share):
+    """
+    Build the matrix of the recipes and the recipes sharing
+    an ingredient with them, like build_matrix() would.
+
+    Only these rows are read, so the cost depends on the neighbourhood
+    of the recipes and not on the size of the catalogue.
+
+    Returns (matrix, recipe_ids) where row i belongs to recipe_ids[i].
+    """
+    recipe_column, ingredient_column = load_recipe_ingredients(recipe_ids)
+    ingredient_ids = np.unique(ingredient_column)
+    ingredient_ids = ingredient_ids[~np.isin(
+        ingredient_ids,
+        get_common_ingredients(ingredient_ids, max_ingredient_share),
+    )]
+    candidate_ids = set(recipe_column.tolist())
+    ingredient_ids = ingredient_ids.tolist()
+
+    for start in range(0, len(ingredient_ids), ID_CHUNK_SIZE):
+        candidate_ids.update(IngredientInRecipe.objects.filter(
+            ingredient_id__in=ingredient_ids[start:start + ID_CHUNK_SIZE],
+            recipe__is_hidden=False,
+        ).order_by().values_list('recipe_id', flat=True).distinct())
+
+    recipe_column, ingredient_column = load_recipe_ingredients(
+        sorted(candidate_ids)
+    )
+    keep = ~np.isin(ingredient_column, get_common_ingredients(
+        np.unique(ingredient_column), max_ingredient_share
+    ))
+
+    return make_matrix(recipe_column[keep], ingredient_column[keep])
+
+
+def score_pairs(intersections, left_sizes, right_sizes, metric):
+    if metric == 'cosine':
+        return intersections / np.sqrt(left_sizes * right_sizes)
+
+    return intersections / (left_sizes + right_sizes - intersections)
+
+
+def get_batches(matrix, rows, max_pairs):
+    """
+    Split rows into batches with a bounded number of candidate pairs.
+
+    The candidate count of a row is the sum of the frequencies
+    of its ingredients, an upper bound of the nonzeros it adds
+    to the similarity product.
+    """
+    frequencies = np.asarray(matrix.sum(axis=0)).ravel()
+    candidates = matrix[rows] @ frequencies
+    batch_start = 0
+    batch_pairs = 0
+
+    for position, row_pairs in enumerate(candidates):
+        if batch_pairs and batch_pairs + row_pairs > max_pairs:
+            yield rows[batch_start:position]
+            batch_start = position
+            batch_pairs = 0
+
+        batch_pairs += row_pairs
+
+    if batch_start < len(rows):
+        yield rows[batch_start:]
+
+
+def top_neighbours(matrix, transposed, sizes, rows, top_k, metric):
+    """
+    Return (row, neighbour, score) arrays of the top-k neighbours.
+
+    Similarities of the batch rows with all recipes are computed
+    by one sparse product of the batch with the transposed matrix.
+    """
+    product = (matrix[rows] @ transposed).tocoo()
+    batch_rows = rows[product.row]
+    keep = batch_rows != product.col
+    batch_rows = batch_rows[keep]
+    neighbours = product.col[keep]
+    scores = score_pairs(
+        product.data[keep],
+        sizes[batch_rows],
+        sizes[neighbours],
+        metric,
+    )
+
+    order = np.lexsort((-scores, batch_rows))
+    batch_rows = batch_rows[order]
+    group_starts = np.flatnonzero(
+        np.r_[True, batch_rows[1:] != batch_rows[:-1]]
+    )
+    group_sizes = np.diff(np.r_[group_starts, len(batch_rows)])
+    ranks = np.arange(len(batch_rows)) - np.repeat(group_starts, group_sizes)
+    selected = order[ranks < top_k]
+
+    return batch_rows[ranks < top_k], neighbours[selected], scores[selected]
+
+
+def save_neighbours(recipe_ids, neighbours):
+    """
+    Replace the SimilarRecipe rows of recipe_ids in one transaction.
+
+    neighbours are (recipe_id, similar_id, score) triples.
+    """
+    with transaction.atomic():
+        for start in range(0, len(recipe_ids), ID_CHUNK_SIZE):
+            SimilarRecipe.objects.filter(
+                recipe_id__in=recipe_ids[start:start + ID_CHUNK_SIZE]
+            ).delete()
+
+        SimilarRecipe.objects.bulk_create(
+            (
+                SimilarRecipe(
+                    recipe_id=recipe, similar_id=similar, score=score
+                )
+                for recipe, similar, score in neighbours
+            ),
+            batch_size=WRITE_BATCH_SIZE,
+        )
+
+
+def load_neighbours(recipe_ids):
+    """Return the current (similar_id, score) lists of the recipes."""
+    recipe_ids = list(recipe_ids)
+    neighbours = defaultdict(list)
+
+    for start in range(0, len(recipe_ids), ID_CHUNK_SIZE):
+        for recipe, similar, score in SimilarRecipe.objects.filter(
+            recipe_id__in=recipe_ids[start:start + ID_CHUNK_SIZE]
+        ).values_list('recipe_id', 'similar_id', 'score'):
+            neighbours[recipe].append((similar, score))
+
+    return neighbours
+
+
+def compute_neighbours(recipe_ids, top_k, metric, max_ingredient_share):
+    """
+    Return (recipe_id, similar_id, score) triples of the top-k
+    neighbours of the recipes and the scores of all recipes sharing
+    an ingredient with them, as {recipe_id: {changed_id: score}}.
+    """
+    matrix, local_ids = build_local_matrix(recipe_ids, max_ingredient_share)
+    transposed = matrix.T.tocsr()
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    rows = np.flatnonzero(np.isin(local_ids, recipe_ids))
+    batch_rows, neighbours, scores = top_neighbours(
+        matrix, transposed, sizes, rows, top_k, metric
+    )
+    # Both metrics are symmetric, so the top-k of all recipes sharing
+    # an ingredient give the score of each recipe with the changed ones.
+    sharing_rows, sharing, sharing_scores = top_neighbours(
+        matrix, transposed, sizes, rows, len(local_ids), metric
+    )
+    incoming = defaultdict(dict)
+
+    for recipe, similar, score in zip(
+        local_ids[sharing_rows].tolist(),
+        local_ids[sharing].tolist(),
+        sharing_scores.tolist(),
+    ):
+        incoming[similar][recipe] = score
+
+    return list(zip(
+        local_ids[batch_rows].tolist(),
+        local_ids[neighbours].tolist(),
+        scores.tolist(),
+    )), incoming
+
+
+def update_neighbours(
+    recipe_ids, top_k, metric, max_ingredient_share, progress=None
+):
+    """
+    Recompute the neighbours of the changed recipes and merge them
+    into the lists of the recipes they may enter or leave.
+
+    Only the neighbourhood of the changed recipes is read. Scores
+    between unchanged recipes stay the same, so their lists only
+    gain or lose the changed recipes; a full list that loses one
+    of them, or sees its score drop, is recomputed around its own
+    recipe, since its next neighbour is unknown. Ingredients becoming
+    common or rare by the change are left to the full rebuild.
+
+    Returns the number of processed recipes.
+    """
+    changed = set(recipe_ids)
+    recipe_ids = sorted(changed)
+    neighbours, incoming = compute_neighbours(
+        recipe_ids, top_k, metric, max_ingredient_share
+    )
+    affected = set(incoming)
+
+    for start in range(0, len(recipe_ids), ID_CHUNK_SIZE):
+        affected.update(SimilarRecipe.objects.filter(
+            similar_id__in=recipe_ids[start:start + ID_CHUNK_SIZE]
+        ).values_list('recipe_id', flat=True))
+
+    affected -= changed
+    current = load_neighbours(affected)
+    recompute = []
+
+    for recipe in sorted(affected):
+        scores = incoming.get(recipe, {})
+        listed = current.get(recipe, [])
+
+        if len(listed) >= top_k and any(
+            similar in changed and scores.get(similar, 0) < score
+            for similar, score in listed
+        ):
+            recompute.append(recipe)
+            continue
+
+        merged = [
+            (similar, score) for similar, score in listed
+            if similar not in changed
+        ]
+        merged.extend(scores.items())
+        merged.sort(key=lambda pair: (-pair[1], pair[0]))
+        neighbours.extend(
+            (recipe, similar, score) for similar, score in merged[:top_k]
+        )
+
+    if recompute:
+        neighbours.extend(compute_neighbours(
+            recompute, top_k, metric, max_ingredient_share
+        )[0])
+
+    # Hidden recipes and recipes without ingredients get no rows.
+    save_neighbours(recipe_ids + sorted(affected), neighbours)
+    processed = len(changed) + len(affected)
+
+    if progress:
+        progress(processed, processed)
+
+    return processed
+
+
+def build_similar_recipes(
+    recipe_ids=None,
+    top_k=constants.SIMILAR_RECIPES_COUNT,
+    metric='jaccard',
+    max_pairs=DEFAULT_MAX_PAIRS,
+    max_ingredient_share=DEFAULT_MAX_INGREDIENT_SHARE,
+    progress=None,
+):
+    """
+    Recompute SimilarRecipe rows.
+
+    Rebuilds all visible recipes or, through update_neighbours(), only
+    the given recipe_ids together with the recipes whose neighbours
+    they may enter or leave. A full rebuild processes rows in batches
+    sized by max_pairs, which bounds memory, and the neighbours of each
+    batch are replaced in one transaction.
+
+    Returns the number of processed recipes.
+    """
+    if recipe_ids is not None:
+        return update_neighbours(
+            recipe_ids, top_k, metric, max_ingredient_share, progress
+        )
+
+    matrix, all_recipe_ids = build_matrix(max_ingredient_share)
+    transposed = matrix.T.tocsr()
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    rows = np.arange(len(all_recipe_ids))
+    # Hidden recipes and recipes without ingredients are not in the matrix.
+    SimilarRecipe.objects.filter(
+        Q(recipe__is_hidden=True) | ~Exists(IngredientInRecipe.objects.filter(
+            recipe_id=OuterRef('recipe_id')
+        ))
+    ).delete()
+    processed = 0
+
+    for batch in get_batches(matrix, rows, max_pairs):
+        batch_rows, neighbours, scores = top_neighbours(
+            matrix, transposed, sizes, batch, top_k, metric
+        )
+        save_neighbours(all_recipe_ids[batch].tolist(), zip(
+            all_recipe_ids[batch_rows].tolist(),
+            all_recipe_ids[neighbours].tolist(),
+            scores.tolist(),
+        ))
+        processed += len(batch)
+
+        if progress:
+            progress(processed, len(rows))
+
+    return processed
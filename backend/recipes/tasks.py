@@ -0,0 +1,44 @@
+import logging
+
+from django.contrib.auth import get_user_model
+
+from foodgram.purge import purge
+from recipes.models import Recipe
+from recipes.similarity import build_similar_recipes
+from recipes.trending import rebuild_trending
+from tasks.queue import task
+
+logger = logging.getLogger(__name__)
+
+
+def log_progress(label, rows):
+    logger.info('Удалено %s: %s.', label, rows)
+
+
+@task
+def update_similar_recipes(recipe_ids=None):
+    """
+    Recompute similar recipes for the given or all recipes.
+
+    Recipes whose neighbours the given recipes enter or leave
+    are recomputed as well.
+    """
+    build_similar_recipes(recipe_ids=recipe_ids)
+
+
+@task
+def reconcile_trending():
+    """Rebuild daily activity and trending scores from the source tables."""
+    rebuild_trending()
+
+
+@task
+def purge_recipes(recipe_ids):
+    """Delete hidden recipes with their related rows and images."""
+    purge(Recipe, recipe_ids, progress=log_progress)
+
+
+@task
+def purge_users(user_ids):
+    """Delete hidden users with everything they created."""
+    purge(get_user_model(), user_ids, progress=log_progress)
@@ -0,0 +1,657 @@
+import os
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from caching import constants as cache_constants
+from caching.constants import BULK_RECIPES
+from caching.generations import generations, increment
+from foodgram.purge import purge
+from recipes.dataset import (
+    DatasetImporter, export_dataset, find_file, open_file
+)
+from recipes.ingredient_index import IngredientIndex, IngredientPostings
+from recipes import constants
+from recipes.models import (
+    Favourites,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    RecipeActivity,
+    ShoppingCart,
+    SimilarRecipe,
+    Tag,
+    TrendingEpoch,
+)
+from recipes.similarity import build_similar_recipes
+from recipes.trending import get_day_score, get_epoch, rebuild_trending
+from tasks.models import Task
+from users.models import Subscriptions
+
+# Ingredients of recipes by recipe ID.
+RECIPES = {
+    10: (1, 2),
+    20: (1, 2, 3, 4),
+    30: (1, 2, 3),
+    40: (3, 4, 5),
+    50: (6,),
+}
+
+
+def make_postings(recipes=RECIPES):
+    pairs = [
+        (recipe_id, ingredient_id)
+        for recipe_id, ingredient_ids in recipes.items()
+        for ingredient_id in ingredient_ids
+    ]
+    recipe_column, ingredient_column = np.array(pairs, dtype=np.int64).T
+    return IngredientPostings(recipe_column, ingredient_column)
+
+
+def make_index(recipes=RECIPES):
+    index = IngredientIndex()
+    index.set_postings(make_postings(recipes), timezone.now())
+    return index
+
+
+class IngredientPostingsTest(SimpleTestCase):
+
+    def test_find(self):
+        postings = make_postings()
+
+        for recipe_id in RECIPES:
+            position = postings.find(recipe_id)
+            self.assertEqual(postings.recipe_ids[position], recipe_id)
+
+        for recipe_id in (5, 15, 60):
+            self.assertIsNone(postings.find(recipe_id))
+
+    def test_sizes(self):
+        postings = make_postings()
+
+        self.assertEqual(
+            dict(zip(postings.recipe_ids.tolist(), postings.sizes.tolist())),
+            {pk: len(ingredients) for pk, ingredients in RECIPES.items()},
+        )
+
+    def test_count(self):
+        postings = make_postings()
+        counts = dict(zip(
+            postings.recipe_ids.tolist(), postings.count([1, 3, 99]).tolist()
+        ))
+
+        self.assertEqual(counts, {10: 1, 20: 2, 30: 2, 40: 1, 50: 0})
+
+    def test_count_of_unknown_ingredients(self):
+        postings = make_postings()
+
+        self.assertEqual(postings.count([99]).tolist(), [0] * len(RECIPES))
+
+
+class IngredientIndexRankTest(SimpleTestCase):
+
+    def test_rank_order(self):
+        index = make_index()
+
+        self.assertEqual(index.rank([1, 2, 3], 0.5, 10), [
+            (30, 3, 3),
+            (10, 2, 2),
+            (20, 3, 4),
+        ])
+
+    def test_ties_prefer_more_matched_then_fewer_total(self):
+        index = make_index({1: (1, 2), 2: (1, 2, 3, 4), 3: (1, 2, 5, 6)})
+
+        self.assertEqual(index.rank([1, 2, 3, 4, 5, 6], 0, 10), [
+            (2, 4, 4),
+            (3, 4, 4),
+            (1, 2, 2),
+        ])
+        self.assertEqual(index.rank([1, 2], 0, 10), [
+            (1, 2, 2),
+            (2, 2, 4),
+            (3, 2, 4),
+        ])
+
+    def test_min_coverage(self):
+        index = make_index()
+
+        self.assertEqual(index.rank([3], 0.3, 10), [(30, 1, 3), (40, 1, 3)])
+        self.assertEqual(index.rank([3], 0.5, 10), [])
+
+    def test_limit(self):
+        index = make_index()
+
+        self.assertEqual(
+            [pk for pk, _, _ in index.rank([1, 2, 3], 0, 2)], [30, 10]
+        )
+
+    def test_no_matches(self):
+        self.assertEqual(make_index().rank([99], 0, 10), [])
+
+
+class IngredientIndexOverlayTest(SimpleTestCase):
+
+    def test_changed_recipe_is_ranked_by_new_ingredients(self):
+        index = make_index()
+        index.apply(50, [1, 2])
+
+        self.assertEqual(index.rank([1, 2], 1, 10), [(10, 2, 2), (50, 2, 2)])
+        self.assertEqual(index.rank([6], 0, 10), [])
+
+    def test_changed_recipe_loses_old_ingredients(self):
+        index = make_index()
+        index.apply(30, [7, 8])
+
+        self.assertNotIn(30, [pk for pk, _, _ in index.rank([1, 2], 0, 10)])
+        self.assertEqual(index.rank([7], 0, 10), [(30, 1, 2)])
+
+    def test_new_recipe(self):
+        index = make_index()
+        index.apply(60, [1, 2, 3])
+
+        self.assertEqual(index.rank([1, 2, 3], 1, 10), [
+            (30, 3, 3), (60, 3, 3), (10, 2, 2),
+        ])
+
+    def test_removed_recipe(self):
+        index = make_index()
+        index.apply(10, None)
+        index.apply(60, [1])
+        index.apply(60, None)
+
+        self.assertEqual(index.rank([1, 2], 1, 10), [])
+        self.assertEqual(index.overlay, {})
+
+
+class IngredientIndexSyncTest(TestCase):
+
+    def test_bulk_recipes_generation_rebuilds_postings(self):
+        index = IngredientIndex()
+        index.build()
+
+        with mock.patch.object(index, 'rebuild_in_background') as rebuild:
+            index.sync()
+            rebuild.assert_not_called()
+
+            increment((BULK_RECIPES,))
+            index.sync()
+            rebuild.assert_called_once()
+
+
+class SimilarRecipesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Тестов',
+            password='password-123',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(6)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                name=f'Рецепт {number}',
+                text='Описание.',
+                cooking_time=5,
+                image='recipes/images/recipe.png',
+                author=author,
+            )
+            for number in range(3)
+        ]
+
+        for recipe, ingredient_numbers in zip(
+            cls.recipes, ((0, 1), (0, 1, 2), (4, 5))
+        ):
+            cls.set_ingredients(recipe, ingredient_numbers)
+
+        build_similar_recipes()
+
+    @classmethod
+    def set_ingredients(cls, recipe, ingredient_numbers):
+        IngredientInRecipe.objects.filter(recipe=recipe).delete()
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=cls.ingredients[number], amount=1
+            )
+            for number in ingredient_numbers
+        )
+
+    def get_similar(self):
+        similar = {recipe.pk: set() for recipe in self.recipes}
+
+        for recipe_id, similar_id in SimilarRecipe.objects.values_list(
+            'recipe_id', 'similar_id'
+        ):
+            similar[recipe_id].add(similar_id)
+
+        return similar
+
+    def test_reverse_neighbours_gain_changed_recipe(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        self.set_ingredients(self.recipes[2], (0, 1))
+
+        build_similar_recipes(recipe_ids=[third])
+
+        self.assertEqual(self.get_similar(), {
+            first: {second, third},
+            second: {first, third},
+            third: {first, second},
+        })
+
+    def test_reverse_neighbours_lose_changed_recipe(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        self.set_ingredients(self.recipes[1], (4,))
+
+        build_similar_recipes(recipe_ids=[second])
+
+        self.assertEqual(self.get_similar(), {
+            first: set(),
+            second: {third},
+            third: {second},
+        })
+
+    def test_recipe_without_ingredients(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        self.set_ingredients(self.recipes[0], ())
+
+        build_similar_recipes(recipe_ids=[first])
+
+        self.assertEqual(self.get_similar(), {
+            first: set(),
+            second: set(),
+            third: set(),
+        })
+
+    def get_scores(self):
+        scores = {}
+
+        for recipe_id, score in SimilarRecipe.objects.values_list(
+            'recipe_id', 'score'
+        ):
+            scores.setdefault(recipe_id, []).append(round(score, 6))
+
+        return {
+            recipe_id: sorted(recipe_scores)
+            for recipe_id, recipe_scores in scores.items()
+        }
+
+    def test_hidden_recipe_is_left_out(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        Recipe.objects.filter(pk=second).update(is_hidden=True)
+
+        build_similar_recipes(recipe_ids=[second])
+
+        self.assertEqual(self.get_similar(), {
+            first: set(),
+            second: set(),
+            third: set(),
+        })
+
+        Recipe.objects.filter(pk=first).update(is_hidden=True)
+        Recipe.objects.filter(pk=second).update(is_hidden=False)
+        build_similar_recipes()
+
+        self.assertEqual(self.get_similar(), {
+            first: set(),
+            second: set(),
+            third: set(),
+        })
+
+    def test_update_matches_full_build(self):
+        author = self.recipes[0].author
+        rng = np.random.default_rng(7)
+        recipes = self.recipes + [
+            Recipe.objects.create(
+                name=f'Рецепт {number}',
+                text='Описание.',
+                cooking_time=5,
+                image='recipes/images/recipe.png',
+                author=author,
+            )
+            for number in range(3, 20)
+        ]
+
+        def shuffle(recipe):
+            self.set_ingredients(recipe, rng.choice(
+                len(self.ingredients), rng.integers(1, 4), replace=False
+            ))
+
+        for recipe in recipes:
+            shuffle(recipe)
+
+        build_similar_recipes(top_k=2)
+
+        for step in range(10):
+            # The most listed recipe, so full lists lose their neighbours.
+            listed = Counter(
+                SimilarRecipe.objects.values_list('similar_id', flat=True)
+            )
+            changed = max(
+                recipes, key=lambda recipe: (listed[recipe.pk], -recipe.pk)
+            )
+
+            if step % 4 == 3:
+                changed.is_hidden = not changed.is_hidden
+                changed.save(update_fields=('is_hidden',))
+            else:
+                shuffle(changed)
+
+            build_similar_recipes(recipe_ids=[changed.pk], top_k=2)
+            updated = self.get_scores()
+            build_similar_recipes(top_k=2)
+
+            self.assertEqual(updated, self.get_scores())
+
+
+class PurgeGenerationsTest(TestCase):
+
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Тестов',
+            password='password-123',
+        )
+        self.recipe = Recipe.objects.create(
+            name='Рецепт',
+            text='Описание.',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+            author=self.author,
+            is_hidden=True,
+        )
+
+    def purge(self, **kwargs):
+        names = (cache_constants.RECIPES, BULK_RECIPES)
+        generations.expire()
+        before = [generations.get(name) for name in names]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            purge(Recipe, [self.recipe.pk], **kwargs)
+
+        generations.expire()
+        return tuple(
+            generations.get(name) - value
+            for name, value in zip(names, before)
+        )
+
+    def test_purge_keeps_ingredient_index(self):
+        self.assertEqual(self.purge(), (1, 0))
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_bulk_purge_rebuilds_ingredient_index(self):
+        self.assertEqual(self.purge(bulk=True), (1, 1))
+
+
+class DayScoreTest(SimpleTestCase):
+
+    def test_doubles_every_half_life(self):
+        epoch = date(2024, 1, 1)
+        half_life = timedelta(days=constants.TRENDING_HALF_LIFE_DAYS)
+
+        self.assertEqual(get_day_score('favourites', epoch, epoch), 1)
+        self.assertEqual(
+            get_day_score('favourites', epoch + half_life, epoch), 2
+        )
+        self.assertEqual(
+            get_day_score('favourites', epoch - half_life, epoch), 0.5
+        )
+
+    def test_weights_and_counts(self):
+        epoch = date(2024, 1, 1)
+
+        self.assertEqual(
+            get_day_score('shopping_cart', epoch, epoch, count=4),
+            4 * constants.TRENDING_SHOPPING_CART_WEIGHT,
+        )
+
+    def test_rebase_scales_all_scores_equally(self):
+        old_epoch, new_epoch = date(2024, 1, 1), date(2024, 3, 1)
+        factor = 2 ** (
+            -(new_epoch - old_epoch).days / constants.TRENDING_HALF_LIFE_DAYS
+        )
+
+        for days in (0, 3, 30, 100):
+            day = old_epoch + timedelta(days=days)
+            self.assertAlmostEqual(
+                get_day_score('favourites', day, new_epoch)
+                / get_day_score('favourites', day, old_epoch),
+                factor,
+            )
+
+
+class TrendingTest(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров',
+            password='password-123',
+        )
+        self.recipe = Recipe.objects.create(
+            name='Рецепт',
+            text='Описание.',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+            author=self.user,
+        )
+
+    @staticmethod
+    def set_epoch(day):
+        TrendingEpoch.objects.all().delete()
+        TrendingEpoch.objects.create(day=day)
+
+    def get_state(self):
+        self.recipe.refresh_from_db()
+        activity = RecipeActivity.objects.filter(recipe=self.recipe).values(
+            'favourites', 'shopping_cart'
+        ).first()
+        return activity, self.recipe.trending_score
+
+    def test_signals_update_activity_and_score(self):
+        favourite = Favourites.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        today = timezone.localdate()
+        epoch = get_epoch()
+
+        activity, score = self.get_state()
+        self.assertEqual(activity, {'favourites': 1, 'shopping_cart': 1})
+        self.assertAlmostEqual(
+            score,
+            get_day_score('favourites', today, epoch)
+            + get_day_score('shopping_cart', today, epoch),
+        )
+
+        favourite.delete()
+
+        activity, score = self.get_state()
+        self.assertEqual(activity, {'favourites': 0, 'shopping_cart': 1})
+        self.assertAlmostEqual(
+            score, get_day_score('shopping_cart', today, epoch)
+        )
+
+    def test_rebuild_rebases_scores(self):
+        self.set_epoch(date(2024, 1, 1))
+        Favourites.objects.create(user=self.user, recipe=self.recipe)
+        Favourites.objects.bulk_create([
+            Favourites(user=get_user_model().objects.create_user(
+                email='other@example.com',
+                username='other',
+                first_name='Другой',
+                last_name='Повар',
+                password='password-123',
+            ), recipe=self.recipe),
+        ])
+
+        self.assertEqual(rebuild_trending(), 1)
+
+        self.assertEqual(get_epoch(), timezone.localdate())
+        self.assertEqual(
+            self.get_state(), ({'favourites': 2, 'shopping_cart': 0}, 2)
+        )
+
+    def test_old_epoch_schedules_rebase(self):
+        self.set_epoch(
+            timezone.localdate()
+            - timedelta(days=constants.TRENDING_REBASE_DAYS + 1)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Favourites.objects.create(user=self.user, recipe=self.recipe)
+            ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+
+        self.assertEqual(
+            Task.objects.filter(
+                name='recipes.tasks.reconcile_trending'
+            ).count(),
+            1,
+        )
+
+
+class DatasetTest(TestCase):
+    """Exported datasets import back with their activity and scores."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.author, self.reader = (
+            get_user_model().objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name=username.title(),
+                last_name='Тестов',
+                password='password-123',
+            )
+            for username in ('author', 'reader')
+        )
+        Subscriptions.objects.create(
+            author=self.author, subscriber=self.reader
+        )
+        self.recipe = Recipe.objects.create(
+            name='Рецепт',
+            text='Описание.',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+            author=self.author,
+        )
+        self.recipe.tags.add(
+            Tag.objects.create(name='Завтрак', color='#FF0000', slug='bf')
+        )
+        IngredientInRecipe.objects.create(
+            recipe=self.recipe,
+            ingredient=Ingredient.objects.create(
+                name='соль', measurement_unit='г'
+            ),
+            amount=3,
+        )
+        Favourites.objects.create(user=self.reader, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.author, recipe=self.recipe)
+        Favourites.objects.update(added_at=timezone.now() - timedelta(days=9))
+        rebuild_trending()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def export(self, name, compress=False):
+        path = os.path.join(self.directory, name)
+        export_dataset(path, compress=compress)
+        return path
+
+    @staticmethod
+    def read(path, name):
+        with open_file(find_file(path, name), 'r') as file:
+            return file.read()
+
+    @staticmethod
+    def get_trending(recipe_id):
+        return (
+            list(RecipeActivity.objects.filter(recipe_id=recipe_id).values(
+                'day', 'favourites', 'shopping_cart'
+            )),
+            round(Recipe.objects.get(pk=recipe_id).trending_score, 6),
+        )
+
+    def test_round_trip(self):
+        exported = self.export('first', compress=True)
+        trending = self.get_trending(self.recipe.pk)
+        Recipe.objects.all().delete()
+        get_user_model().objects.all().delete()
+        Tag.objects.all().delete()
+        Ingredient.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rows = DatasetImporter(exported, batch_size=1).run()
+
+        self.assertEqual(rows, 10)
+        reexported = self.export('second')
+        for name in (
+            'users', 'subscriptions', 'recipes', 'favourites', 'shopping_cart'
+        ):
+            self.assertEqual(
+                self.read(reexported, name), self.read(exported, name), name
+            )
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(
+            list(recipe.tags.values_list('slug', flat=True)), ['bf']
+        )
+        self.assertEqual(
+            list(recipe.ingredient_in_recipe.values_list(
+                'ingredient__name', 'amount'
+            )),
+            [('соль', 3)],
+        )
+        self.assertEqual(self.get_trending(recipe.pk), trending)
+
+    def test_import_next_to_existing_rows(self):
+        exported = self.export('first')
+
+        DatasetImporter(exported).run()
+
+        imported = Recipe.objects.exclude(pk=self.recipe.pk).get()
+        self.assertGreater(imported.pk, self.recipe.pk)
+        self.assertEqual(imported.author, self.author)
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(
+            self.get_trending(imported.pk), self.get_trending(self.recipe.pk)
+        )
+
+    def test_failed_batch_keeps_loaded_batches(self):
+        exported = self.export('first')
+        Recipe.objects.all().delete()
+
+        with mock.patch.object(
+            DatasetImporter,
+            'load_shopping_cart',
+            side_effect=IntegrityError('shopping_cart'),
+        ), self.assertRaises(IntegrityError):
+            DatasetImporter(exported, batch_size=1).run()
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(
+            RecipeActivity.objects.filter(recipe=recipe).values_list(
+                'favourites', 'shopping_cart'
+            ).get(),
+            (1, 0),
+        )
+        self.assertFalse(ShoppingCart.objects.exists())
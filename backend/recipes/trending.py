@@ -0,0 +1,223 @@
+from collections import Counter, defaultdict
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from recipes import constants
+from recipes.models import (
+    Favourites, Recipe, RecipeActivity, ShoppingCart, TrendingEpoch
+)
+
+ACTIVITY_WEIGHTS = {
+    'favourites': constants.TRENDING_FAVOURITE_WEIGHT,
+    'shopping_cart': constants.TRENDING_SHOPPING_CART_WEIGHT,
+}
+ACTIVITY_MODELS = {
+    Favourites: 'favourites',
+    ShoppingCart: 'shopping_cart',
+}
+ACTIVITY_MODEL_NAMES = {
+    model._meta.model_name: field for model, field in ACTIVITY_MODELS.items()
+}
+
+
+def get_epoch():
+    """Return the day the stored trending scores are relative to."""
+    return TrendingEpoch.objects.values_list(
+        'day', flat=True
+    ).first() or constants.TRENDING_EPOCH
+
+
+def is_rebase_due(epoch):
+    """Return whether scores should be rebased by rebuild_trending()."""
+    return (
+        (timezone.localdate() - epoch).days > constants.TRENDING_REBASE_DAYS
+    )
+
+
+def get_day_score(field, day, epoch, count=1):
+    """
+    Return the score contribution of count additions on the day.
+
+    Contributions grow exponentially from the epoch, doubling every
+    TRENDING_HALF_LIFE_DAYS. Comparing these sums gives the same order
+    as scores decayed to the current moment, so stored scores never
+    need to be recalculated as time passes, only rebased to a later
+    epoch before the contributions overflow.
+    """
+    return count * ACTIVITY_WEIGHTS[field] * 2 ** (
+        (day - epoch).days / constants.TRENDING_HALF_LIFE_DAYS
+    )
+
+
+def record_activity(instance, delta):
+    """
+    Add (delta=1) or remove (delta=-1) a favourite or cart item.
+
+    Updates the daily rollup and the recipe trending score.
+    Removals only touch existing rows, so they are safe during
+    cascade deletion of the recipe. The epoch is read after the
+    rollup is updated, which waits for a running rebuild_trending().
+    Returns whether the scores are due to be rebased.
+    """
+    field = ACTIVITY_MODELS[type(instance)]
+    day = timezone.localdate(instance.added_at)
+
+    with transaction.atomic():
+        updated = RecipeActivity.objects.filter(
+            recipe_id=instance.recipe_id, day=day
+        ).update(**{field: F(field) + delta})
+
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    RecipeActivity.objects.create(
+                        recipe_id=instance.recipe_id, day=day, **{field: 1}
+                    )
+            except IntegrityError:
+                RecipeActivity.objects.filter(
+                    recipe_id=instance.recipe_id, day=day
+                ).update(**{field: F(field) + delta})
+
+        epoch = get_epoch()
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            trending_score=F('trending_score')
+            + delta * get_day_score(field, day, epoch)
+        )
+
+    return is_rebase_due(epoch)
+
+
+def apply_activity(field, counts, delta):
+    """
+    Add (delta=1) or remove (delta=-1) activity counted by recipe and day.
+
+    counts maps (recipe_id, day) to the number of favourites or cart
+    items. Updates the daily rollup and the recipe trending scores
+    the way record_activity() does for each item, with one update per
+    recipe and day and one per recipe.
+    """
+    if delta > 0:
+        RecipeActivity.objects.bulk_create(
+            (
+                RecipeActivity(recipe_id=recipe_id, day=day)
+                for recipe_id, day in counts
+            ),
+            ignore_conflicts=True,
+        )
+
+    for (recipe_id, day), count in counts.items():
+        RecipeActivity.objects.filter(
+            recipe_id=recipe_id, day=day
+        ).update(**{field: F(field) + delta * count})
+
+    epoch = get_epoch()
+    scores = defaultdict(float)
+
+    for (recipe_id, day), count in counts.items():
+        scores[recipe_id] += get_day_score(field, day, epoch, count)
+
+    for recipe_id, score in scores.items():
+        Recipe.objects.filter(pk=recipe_id).update(
+            trending_score=F('trending_score') + delta * score
+        )
+
+
+def add_inserted_activity(instances):
+    """Add favourites or cart items of one model inserted in bulk."""
+    instances = list(instances)
+
+    if not instances:
+        return
+
+    counts = Counter(
+        (instance.recipe_id, timezone.localdate(instance.added_at))
+        for instance in instances
+    )
+    apply_activity(ACTIVITY_MODELS[type(instances[0])], counts, 1)
+
+
+def subtract_activity(model, pks):
+    """Remove favourites or cart items that are about to be deleted in bulk."""
+    apply_activity(ACTIVITY_MODELS[model], {
+        (row['recipe_id'], row['day']): row['count']
+        for row in model.objects.filter(pk__in=pks).order_by().values(
+            'recipe_id', day=TruncDate('added_at')
+        ).annotate(count=Count('id'))
+    }, -1)
+
+
+def clear_activity(activity_model):
+    """
+    Delete the daily rollup, keeping its writers waiting until the end
+    of the transaction.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {activity_model._meta.db_table} '
+                'IN SHARE ROW EXCLUSIVE MODE'
+            )
+
+    # On SQLite the first write takes the database write lock.
+    activity_model.objects.all().delete()
+
+
+def rebuild_trending(apps=global_apps):
+    """
+    Rebuild the daily rollup and trending scores from scratch.
+
+    Scores are recomputed relative to today, which rebases them.
+    The rollup is locked before the source tables are read, so
+    concurrent record_activity() calls wait and then apply their
+    change relative to the new epoch. Favourites and cart items are
+    saved in the same transaction as their record_activity(), so each
+    is counted exactly once. Takes the app registry, so migrations can
+    run it with historical models.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeActivity = apps.get_model('recipes', 'RecipeActivity')
+    TrendingEpoch = apps.get_model('recipes', 'TrendingEpoch')
+    epoch = timezone.localdate()
+
+    with transaction.atomic():
+        clear_activity(RecipeActivity)
+        activity = defaultdict(dict)
+
+        for model_name, field in ACTIVITY_MODEL_NAMES.items():
+            for row in apps.get_model(
+                'recipes', model_name
+            ).objects.order_by().values(
+                'recipe_id', day=TruncDate('added_at')
+            ).annotate(count=Count('id')):
+                activity[row['recipe_id'], row['day']][field] = row['count']
+
+        scores = defaultdict(float)
+
+        for (recipe_id, day), counts in activity.items():
+            for field, count in counts.items():
+                scores[recipe_id] += get_day_score(field, day, epoch, count)
+
+        TrendingEpoch.objects.all().delete()
+        TrendingEpoch.objects.create(day=epoch)
+        RecipeActivity.objects.bulk_create(
+            (
+                RecipeActivity(recipe_id=recipe_id, day=day, **counts)
+                for (recipe_id, day), counts in activity.items()
+            ),
+            batch_size=1000,
+        )
+        Recipe.objects.update(trending_score=0)
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=recipe_id, trending_score=score)
+                for recipe_id, score in scores.items()
+            ],
+            ('trending_score',),
+            batch_size=1000,
+        )
+
+    return len(scores)
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'status', 'attempts', 'run_at', 'created_at', 'finished_at'
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('locked_at', 'locked_by', 'last_error', 'finished_at')
@@ -0,0 +1,4 @@
+MAX_NAME_LENGTH = 200
+MAX_STATUS_LENGTH = 10
+MAX_ATTEMPTS = 5
+DELETE_CHUNK_SIZE = 1000
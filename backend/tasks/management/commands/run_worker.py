@@ -0,0 +1,104 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from tasks.queue import (
+    claim_tasks, delete_finished_tasks, release_stale_tasks, run_task
+)
+
+
+class Command(BaseCommand):
+    """Custom management command to process queued background tasks."""
+
+    help = 'Выполняет задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Число задач, выполняемых одновременно.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        concurrency = options['concurrency']
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        running = set()
+        processed = 0
+        maintained_at = None
+        self.stdout.write(f'Обработчик {worker}, потоков: {concurrency}.')
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            while not self.stopping.is_set():
+                close_old_connections()
+
+                if (
+                    maintained_at is None
+                    or time.monotonic() - maintained_at
+                    >= settings.TASKS_MAINTENANCE_INTERVAL
+                ):
+                    maintained_at = time.monotonic()
+                    self.maintain()
+
+                tasks = claim_tasks(worker, concurrency - len(running))
+
+                if not tasks and not running:
+                    if options['once']:
+                        break
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+
+                running.update(
+                    executor.submit(self.process, task) for task in tasks
+                )
+                done, running = wait(
+                    running,
+                    timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED,
+                )
+                processed += len(done)
+
+            processed += len(wait(running).done)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {processed}.'
+        ))
+
+    def stop(self, signum, frame):
+        self.stdout.write('Остановка после завершения текущих задач.')
+        self.stopping.set()
+
+    @staticmethod
+    def maintain():
+        """Requeue tasks of stopped workers and delete old finished ones."""
+        release_stale_tasks()
+        delete_finished_tasks()
+
+    @staticmethod
+    def process(task):
+        try:
+            return run_task(task)
+        finally:
+            connections.close_all()
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'finished_at'], name='task_status_finished_at_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import models
+from django.utils import timezone
+
+from tasks import constants
+
+
+class Task(models.Model):
+    """Model representing a background task waiting in the queue."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=constants.MAX_NAME_LENGTH)
+    arguments = models.JSONField('Аргументы', default=dict)
+    status = models.CharField(
+        'Статус',
+        max_length=constants.MAX_STATUS_LENGTH,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=constants.MAX_ATTEMPTS
+    )
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    locked_by = models.CharField(
+        'Обработчик', max_length=constants.MAX_NAME_LENGTH, blank=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = 'задача'
+        verbose_name_plural = 'Задачи'
+        indexes = (
+            models.Index(
+                fields=('status', 'run_at'),
+                name='task_status_run_at_idx'
+            ),
+            models.Index(
+                fields=('status', 'finished_at'),
+                name='task_status_finished_at_idx'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,175 @@
+"""Database-backed task queue: registration, enqueueing and claiming."""
+import logging
+import random
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from tasks import constants
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def task(function=None, *, name=None, max_attempts=None):
+    """
+    Register a function as a background task.
+
+    The function gets a delay(*args, **kwargs) attribute which queues
+    a call. Arguments must be JSON serializable.
+    """
+    if function is None:
+        return partial(task, name=name, max_attempts=max_attempts)
+
+    task_name = name or f'{function.__module__}.{function.__name__}'
+    REGISTRY[task_name] = function
+    function.task_name = task_name
+    function.delay = partial(
+        enqueue, task_name, _max_attempts=max_attempts
+    )
+    return function
+
+
+def enqueue(name, *args, _max_attempts=None, **kwargs):
+    """
+    Queue a registered task once the current transaction commits.
+
+    Nothing is queued if the transaction rolls back; outside
+    a transaction the task is queued immediately.
+    """
+    if name not in REGISTRY:
+        raise KeyError(f'Задача {name} не зарегистрирована.')
+
+    fields = {
+        'name': name,
+        'arguments': {'args': args, 'kwargs': kwargs},
+    }
+    if _max_attempts is not None:
+        fields['max_attempts'] = _max_attempts
+
+    transaction.on_commit(lambda: Task.objects.create(**fields))
+
+
+def get_retry_delay(attempts):
+    """Return the exponential backoff with jitter after a failed attempt."""
+    delay = min(
+        settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASKS_MAX_RETRY_DELAY,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def release_stale_tasks():
+    """Requeue tasks of workers that stopped without finishing them."""
+    now = timezone.now()
+    return Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+    ).update(status=Task.QUEUED, run_at=now)
+
+
+def delete_finished_tasks():
+    """
+    Delete done and failed tasks older than their retention period.
+
+    Rows are deleted in chunks, so the queue table is never locked
+    for long. Returns the number of deleted tasks.
+    """
+    now = timezone.now()
+    deleted = 0
+
+    for status, retention in (
+        (Task.DONE, settings.TASKS_DONE_RETENTION),
+        (Task.FAILED, settings.TASKS_FAILED_RETENTION),
+    ):
+        expired = Task.objects.filter(
+            status=status, finished_at__lt=now - timedelta(seconds=retention)
+        ).order_by()
+
+        while True:
+            ids = list(expired.values_list('id', flat=True)[
+                :constants.DELETE_CHUNK_SIZE
+            ])
+            if not ids:
+                break
+            deleted += Task.objects.filter(id__in=ids).delete()[0]
+
+    return deleted
+
+
+def claim_tasks(worker, limit):
+    """
+    Lock up to limit due tasks for the worker and return them.
+
+    Postgres uses SELECT ... FOR UPDATE SKIP LOCKED, so workers never
+    wait for each other. Databases without it (SQLite) claim every task
+    with a conditional UPDATE, and only the worker whose update
+    succeeded runs it.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('run_at')
+    claim = {
+        'status': Task.RUNNING,
+        'locked_at': now,
+        'locked_by': worker,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list(
+                'id', flat=True
+            )[:limit])
+            Task.objects.filter(id__in=ids).update(**claim)
+    else:
+        ids = [
+            pk for pk in due.values_list('id', flat=True)[:limit]
+            if Task.objects.filter(pk=pk, status=Task.QUEUED).update(**claim)
+        ]
+
+    return list(Task.objects.filter(id__in=ids).order_by('run_at'))
+
+
+def run_task(task):
+    """Run a claimed task and record its result or schedule a retry."""
+    function = REGISTRY.get(task.name)
+
+    try:
+        if function is None:
+            raise KeyError(f'Задача {task.name} не зарегистрирована.')
+        function(
+            *task.arguments.get('args', ()),
+            **task.arguments.get('kwargs', {})
+        )
+    except Exception:
+        task.last_error = traceback.format_exc()
+        if function is not None and task.attempts < task.max_attempts:
+            task.status = Task.QUEUED
+            task.run_at = timezone.now() + get_retry_delay(task.attempts)
+        else:
+            task.status = Task.FAILED
+            task.finished_at = timezone.now()
+        logger.warning(
+            'Задача %s (%s) завершилась ошибкой, попытка %s.',
+            task.name, task.pk, task.attempts, exc_info=True
+        )
+    else:
+        task.status = Task.DONE
+        task.finished_at = timezone.now()
+
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        status=task.status,
+        run_at=task.run_at,
+        last_error=task.last_error,
+        finished_at=task.finished_at,
+    )
+    return task.status
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.queue import (
+    claim_tasks, delete_finished_tasks, release_stale_tasks, run_task, task
+)
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise ValueError('Ошибка задачи.')
+
+
+class QueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def queue(self, function, *args, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            function.delay(*args)
+
+        task = Task.objects.latest('id')
+        Task.objects.filter(pk=task.pk).update(**fields)
+        task.refresh_from_db()
+        return task
+
+    def test_claim_due_tasks(self):
+        first = self.queue(remember, 1)
+        second = self.queue(remember, 2)
+        self.queue(remember, 3, run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(claim_tasks('first', 1), [first])
+        self.assertEqual(claim_tasks('second', 5), [second])
+        self.assertEqual(claim_tasks('third', 5), [])
+
+        second.refresh_from_db()
+        self.assertEqual(
+            (second.status, second.locked_by, second.attempts),
+            (Task.RUNNING, 'second', 1),
+        )
+
+    def test_run_task(self):
+        self.queue(remember, 1)
+        task, = claim_tasks('worker', 1)
+
+        self.assertEqual(run_task(task), Task.DONE)
+        self.assertEqual(calls, [1])
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertIsNotNone(task.finished_at)
+
+    @override_settings(TASKS_RETRY_DELAY=60)
+    def test_failed_task_is_retried_then_failed(self):
+        self.queue(fail)
+        task, = claim_tasks('worker', 1)
+
+        self.assertEqual(run_task(task), Task.QUEUED)
+        task.refresh_from_db()
+        self.assertGreater(
+            task.run_at, timezone.now() + timedelta(seconds=29)
+        )
+        self.assertIn('Ошибка задачи.', task.last_error)
+        self.assertEqual(claim_tasks('worker', 1), [])
+
+        Task.objects.update(run_at=timezone.now())
+        task, = claim_tasks('worker', 1)
+
+        self.assertEqual(run_task(task), Task.FAILED)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    @override_settings(TASKS_LOCK_TIMEOUT=60)
+    def test_release_stale_tasks(self):
+        self.queue(remember, 1)
+        self.queue(remember, 2)
+        stale, running = claim_tasks('worker', 2)
+        Task.objects.filter(pk=stale.pk).update(
+            locked_at=timezone.now() - timedelta(minutes=2)
+        )
+
+        self.assertEqual(release_stale_tasks(), 1)
+        self.assertEqual(claim_tasks('other', 5), [stale])
+        running.refresh_from_db()
+        self.assertEqual(running.locked_by, 'worker')
+
+    @override_settings(
+        TASKS_DONE_RETENTION=3600, TASKS_FAILED_RETENTION=7200
+    )
+    def test_delete_finished_tasks(self):
+        now = timezone.now()
+        kept = [
+            self.queue(remember, 1),
+            self.queue(remember, 2, status=Task.DONE, finished_at=now),
+            self.queue(
+                fail, status=Task.FAILED, finished_at=now - timedelta(hours=1)
+            ),
+        ]
+        self.queue(
+            remember, 3,
+            status=Task.DONE, finished_at=now - timedelta(hours=2),
+        )
+        self.queue(
+            fail, status=Task.FAILED, finished_at=now - timedelta(hours=3)
+        )
+
+        self.assertEqual(delete_finished_tasks(), 2)
+        self.assertCountEqual(Task.objects.all(), kept)
+
+
+class WorkerTest(TransactionTestCase):
+    """The worker closes connections, so its test commits."""
+
+    @override_settings(TASKS_MAINTENANCE_INTERVAL=3600)
+    def test_worker_maintains_queue_on_interval(self):
+        calls.clear()
+
+        for value in range(3):
+            remember.delay(value)
+
+        # The worker's signal handlers would replace the test runner's.
+        with mock.patch(
+            'tasks.management.commands.run_worker.signal'
+        ), mock.patch(
+            'tasks.management.commands.run_worker.release_stale_tasks'
+        ) as release, mock.patch(
+            'tasks.management.commands.run_worker.delete_finished_tasks'
+        ) as delete:
+            call_command(
+                'run_worker', once=True, poll_interval=0, stdout=mock.Mock()
+            )
+
+        self.assertCountEqual(calls, [0, 1, 2])
+        self.assertEqual(
+            set(Task.objects.values_list('status', flat=True)), {Task.DONE}
+        )
+        release.assert_called_once_with()
+        delete.assert_called_once_with()
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from users.models import FoodgramUser
+from recipes.models import Recipe
+from users.models import FoodgramUser, Subscriptions
 
 admin.site.unregister(Group)
 
@@ -30,12 +33,36 @@ class FoodgramUserAdmin(UserAdmin):
         'first_name',
         'last_name',
     )
+    list_filter = UserAdmin.list_filter + ('is_hidden',)
     readonly_fields = ('all_recipes', 'all_subscribers')
 
-    @admin.display(description='Количество рецептов')
+    @staticmethod
+    def count_related(model, field):
+        """Count rows of the model pointing to the user with the field."""
+        return Coalesce(
+            Subquery(
+                model.objects.filter(
+                    **{field: OuterRef('pk')}
+                ).order_by().values(field).annotate(
+                    count=Count('pk')
+                ).values('count'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=self.count_related(Recipe, 'author'),
+            subscribers_count=self.count_related(Subscriptions, 'author'),
+        )
+
+    @admin.display(description='Количество рецептов', ordering='recipes_count')
     def all_recipes(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
-    @admin.display(description='Количество подписчиков')
+    @admin.display(
+        description='Количество подписчиков', ordering='subscribers_count'
+    )
     def all_subscribers(self, obj):
-        return obj.subscriptions_to_author.count()
+        return obj.subscribers_count
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20240209_0037'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыт'),
+        ),
+    ]
@@ -22,6 +22,7 @@ class FoodgramUser(AbstractUser):
     )
     first_name = models.CharField('Имя', max_length=MAX_CHARFIELD_LENGTH)
     last_name = models.CharField('Фамилия', max_length=MAX_CHARFIELD_LENGTH)
+    is_hidden = models.BooleanField('Скрыт', default=False)
 
     class Meta:
         ordering = ('email',)